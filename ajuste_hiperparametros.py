@@ -0,0 +1,128 @@
+# coding=utf-8
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import pandas as pd
+import numpy as np
+import json
+import time
+import os
+
+from catboost import CatBoostRegressor
+
+from instrumentacao import medicao, registra_busca
+from folds_cv import PreparacaoFolds
+
+# Busca de hiperparâmetros do CatBoost com n_estimators como orçamento de early stopping (não como eixo do grid):
+# cada configuração é avaliada uma vez por fold, com parada antecipada no fold de validação, e a quantidade de
+# árvores recomendada é a média das melhores iterações. Folds executados em processos (thread_count repartido entre eles)
+# sobre os Pools quantizados uma única vez por fold (folds_cv.PreparacaoFolds).
+# Resultados por configuração/fold/orçamento gravados em cache (JSON-lines): reexecuções reaproveitam os já avaliados.
+ARQ_CACHE_BUSCA = os.path.join('cache', 'busca_catboost.jsonl')
+PARAMETROS_FIXOS = {'loss_function': 'MAE'}
+
+
+def busca_catboost(X, y, grid, n_estimators=1100, cv=5, workers=None, parada=50, halving=False, fator=3,
+                   fixos=PARAMETROS_FIXOS, arquivo_cache=ARQ_CACHE_BUSCA, folds=None):
+    '''
+        Busca das configurações do grid (ex.: {'max_depth': [3, ..., 10]}) por validação cruzada (KFold, como no GridSearchCV).
+        n_estimators -> orçamento máximo de árvores por ajuste (early stopping com parada iterações sem melhora);
+        workers      -> processos (padrão: CPUs); cada ajuste usa thread_count = CPUs / workers;
+        halving      -> successive halving: todas as configurações com orçamento n_estimators / fator^k, mantendo
+                        1/fator das melhores a cada rodada até o orçamento completo;
+        arquivo_cache-> resultados já avaliados (mesmos dados, folds e parâmetros) não são reajustados; None desativa;
+        folds        -> folds preparados (PreparacaoFolds) compartilhados com os demais modelos; None prepara a partir de X e y.
+        Retorna a tabela das configurações avaliadas no maior orçamento (MAE médio, desvio, árvores e tempo),
+        ordenada pelo MAE, e os melhores parâmetros (com n_estimators = média das melhores iterações).
+    '''
+    folds = folds or PreparacaoFolds(X, y, cv)
+    folds.prepara_catboost()
+    cv = folds.cv
+    workers = workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    chave_dados = folds.chave
+    configuracoes = [dict(zip(grid, valores)) for valores in product(*grid.values())]
+
+    if halving:
+        rodadas = max(1, int(np.floor(np.log(len(configuracoes)) / np.log(fator))) + 1)
+        orcamentos = [max(1, int(n_estimators / fator ** (rodadas - 1 - rodada))) for rodada in range(rodadas)]
+    else:
+        orcamentos = [n_estimators]
+
+    avaliados = carrega_cache(arquivo_cache)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for rodada, orcamento in enumerate(orcamentos):
+            tarefas = [(configuracao, fold, orcamento) for configuracao in configuracoes for fold in range(cv)]
+            pendentes = [tarefa for tarefa in tarefas if chave_tarefa(chave_dados, fixos, parada, *tarefa) not in avaliados]
+            print('Rodada', rodada + 1, 'de', len(orcamentos), '- orçamento', orcamento, 'árvores:',
+                  len(configuracoes), 'configurações,', len(tarefas) - len(pendentes), 'ajustes do cache,',
+                  len(pendentes), 'a executar')
+            futuros = [executor.submit(ajusta_fold, folds, fold, dict(fixos, **configuracao), orcamento, parada, threads)
+                       for configuracao, fold, orcamento in pendentes]
+            for tarefa, futuro in zip(pendentes, futuros):
+                resultado = dict(futuro.result(), configuracao=tarefa[0], fold=tarefa[1], orcamento=orcamento)
+                chave = chave_tarefa(chave_dados, fixos, parada, *tarefa)
+                avaliados[chave] = resultado
+                grava_cache(arquivo_cache, chave, resultado)
+
+            tabela = resume_busca([avaliados[chave_tarefa(chave_dados, fixos, parada, *tarefa)] for tarefa in tarefas], grid)
+            registra_busca('busca_catboost', tabela, list(grid), rodada=rodada + 1, orcamento=orcamento)
+            if rodada < len(orcamentos) - 1:
+                mantidas = max(1, int(np.ceil(len(configuracoes) / fator)))
+                configuracoes = [dict(zip(grid, linha)) for linha in tabela[list(grid)].head(mantidas).itertuples(index=False)]
+
+    melhores_parametros = {parametro: valor_python(tabela[parametro].iloc[0]) for parametro in grid}
+    melhores_parametros['n_estimators'] = int(round(tabela['n_estimators'].iloc[0]))
+    return tabela, melhores_parametros
+
+
+def ajusta_fold(folds, fold, parametros, orcamento, parada, threads):
+    # Ajuste de uma configuração em um fold com early stopping no fold de validação (executado em processo separado)
+    treino, validacao = folds.pool_catboost(fold)
+    _, _, X_validacao, y_validacao = folds.fold(fold)
+    inicio = time.perf_counter()
+    with medicao('busca_catboost:fold', linhas=treino.num_row(), orcamento=orcamento):
+        modelo = CatBoostRegressor(n_estimators=orcamento, thread_count=threads, verbose=False, **parametros)
+        modelo.fit(treino, eval_set=validacao, early_stopping_rounds=parada, use_best_model=True)
+    erro = float(np.mean(np.abs(modelo.predict(np.asarray(X_validacao)) - y_validacao)))
+    return {'mae': erro, 'melhor_iteracao': int(modelo.get_best_iteration()) + 1,
+            'tempo': round(time.perf_counter() - inicio, 6)}
+
+
+def resume_busca(resultados, grid):
+    # Média por configuração dos folds avaliados: MAE, desvio, árvores (melhores iterações) e tempo total
+    linhas = pd.DataFrame([dict(resultado['configuracao'], mae=resultado['mae'], n_estimators=resultado['melhor_iteracao'],
+                                tempo=resultado['tempo']) for resultado in resultados])
+    tabela = linhas.groupby(list(grid), sort=False).agg(mae=('mae', 'mean'), mae_desvio=('mae', 'std'),
+                                                        n_estimators=('n_estimators', 'mean'), tempo=('tempo', 'sum'))
+    return tabela.sort_values(by='mae', kind='stable').reset_index()
+
+
+def chave_tarefa(chave_dados, fixos, parada, configuracao, fold, orcamento):
+    return json.dumps([chave_dados, fixos, parada, configuracao, fold, orcamento], sort_keys=True, default=valor_python)
+
+
+def carrega_cache(arquivo):
+    avaliados = {}
+    if arquivo and os.path.exists(arquivo):
+        with open(arquivo, encoding='utf-8') as entrada:
+            for linha in entrada:
+                registro = json.loads(linha)
+                avaliados[registro['chave']] = registro['resultado']
+    return avaliados
+
+
+def grava_cache(arquivo, chave, resultado):
+    # Um resultado por linha, gravado ao término de cada ajuste (busca interrompida é retomada do ponto em que parou)
+    if not arquivo:
+        return
+    pasta = os.path.dirname(arquivo)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(arquivo, 'a', encoding='utf-8') as saida:
+        saida.write(json.dumps({'chave': chave, 'resultado': resultado}, ensure_ascii=False, default=valor_python) + '\n')
+
+
+def valor_python(valor):
+    # Tipos numpy -> tipos nativos (JSON e parâmetros do CatBoost)
+    return valor.item() if isinstance(valor, np.generic) else valor
@@ -0,0 +1,108 @@
+# coding=utf-8
+
+from datetime import datetime
+import glob
+import os
+import re
+
+from cache_excel import feather, hashes_planilhas, le_metadados, grava_metadados
+
+VERSAO_MANIFESTO = 2                                    # Alterar sempre que a normalização das planilhas mudar
+DIR_INAD = os.path.join('cache', 'inad')                # Planilhas mensais normalizadas e totais anuais
+ARQ_MANIFESTO = os.path.join(DIR_INAD, 'manifesto.json')
+PADRAO_ARQUIVO = 'InadimplenciaMEI*.xlsx'               # Arquivos mensais publicados pela RFB (ex.: InadimplenciaMEI102022.xlsx)
+
+
+def arquivo_inad(padrao=PADRAO_ARQUIVO):
+    '''
+        Arquivo de Inadimplência mais recente: maior mês/ano (mmaaaa) no nome dos arquivos publicados pela RFB.
+        Retorna None se não houver arquivo no diretório.
+    '''
+    arquivos = []
+    for arquivo in glob.glob(padrao):
+        m = re.search(r'(\d{2})(\d{4})', os.path.basename(arquivo))
+        if m:
+            arquivos.append(((int(m.group(2)), int(m.group(1))), arquivo))
+    return max(arquivos)[1] if arquivos else None
+
+
+def disponivel():
+    # A atualização incremental depende do formato colunar (pyarrow)
+    return feather is not None
+
+
+def carrega_manifesto():
+    '''
+        Manifesto das planilhas mensais já ingeridas (arquivo de origem, hash do conteúdo da planilha, ano e data da carga)
+        e das planilhas que compõem cada total anual gravado. Versão diferente -> manifesto vazio (recarga total).
+    '''
+    manifesto = le_metadados(ARQ_MANIFESTO)
+    if manifesto is None or manifesto.get('versao') != VERSAO_MANIFESTO:
+        return {'versao': VERSAO_MANIFESTO, 'planilhas': {}, 'totais': {}}
+    return manifesto
+
+
+def grava_manifesto(manifesto):
+    grava_metadados(ARQ_MANIFESTO, manifesto)
+
+
+def planilhas_pendentes(manifesto, planilhas, arquivo):
+    '''
+        Planilhas a ingerir: ainda não ingeridas, com conteúdo diferente do ingerido (hash da planilha divergente do
+        manifesto) ou com o arquivo normalizado ausente do diretório de cache. Planilhas inalteradas são reaproveitadas
+        mesmo que publicadas em outro arquivo (cada publicação mensal da RFB traz todos os meses).
+    '''
+    hashes = hashes_planilhas(arquivo)
+    return [planilha for planilha in planilhas
+            if manifesto['planilhas'].get(planilha, {}).get('hash_planilha') != hashes[planilha]
+            or not os.path.exists(caminho_planilha(planilha))]
+
+
+def registra_planilha(manifesto, arquivo, planilha, normalizada, blocos):
+    '''
+        Grava a planilha normalizada e os blocos de Estado em formato colunar e registra a planilha no manifesto.
+        A planilha é identificada pelo nome (ex.: Janeiro_2020) e pelo hash do seu conteúdo (cache_excel.hashes_planilhas);
+        o total anual gravado do seu ano é descartado (totalizado novamente com a planilha atualizada).
+    '''
+    os.makedirs(DIR_INAD, exist_ok=True)
+    feather.write_feather(normalizada.reset_index(drop=True), caminho_planilha(planilha))
+    feather.write_feather(blocos.reset_index(names='linha'), caminho_planilha(planilha, 'blocos'))
+    manifesto['planilhas'][planilha] = {'arquivo': arquivo, 'hash_planilha': hashes_planilhas(arquivo)[planilha],
+                                        'ano': ano_planilha(planilha), 'linhas': len(normalizada),
+                                        'carga': datetime.now().isoformat(timespec='seconds')}
+    manifesto['totais'].pop(str(ano_planilha(planilha)), None)
+
+
+def carrega_planilha(planilha):
+    # Planilha normalizada e blocos de Estado gravados por registra_planilha
+    normalizada = feather.read_table(caminho_planilha(planilha), memory_map=True).to_pandas()
+    blocos = feather.read_table(caminho_planilha(planilha, 'blocos')).to_pandas().set_index('linha')
+    blocos.index.name = None
+    return normalizada, blocos
+
+
+def total_anual(manifesto, ano, planilhas):
+    # Total anual gravado (DAS e Optantes por Município) se composto exatamente pelas mesmas planilhas
+    registro = manifesto['totais'].get(str(ano))
+    if registro is None or registro['planilhas'] != list(planilhas) or not os.path.exists(caminho_total(ano)):
+        return None
+    return feather.read_table(caminho_total(ano)).to_pandas()
+
+
+def registra_total(manifesto, ano, planilhas, total):
+    os.makedirs(DIR_INAD, exist_ok=True)
+    feather.write_feather(total.reset_index(drop=True), caminho_total(ano))
+    manifesto['totais'][str(ano)] = {'planilhas': list(planilhas), 'carga': datetime.now().isoformat(timespec='seconds')}
+
+
+def ano_planilha(planilha):
+    return int(re.search(r'(20[0-9][0-9])', planilha).group(1))
+
+
+def caminho_planilha(planilha, sufixo='dados'):
+    nome = re.sub(r'[^0-9A-Za-z]+', '_', planilha).strip('_')
+    return os.path.join(DIR_INAD, nome + '-' + sufixo + '.feather')
+
+
+def caminho_total(ano):
+    return os.path.join(DIR_INAD, 'total_' + str(ano) + '.feather')
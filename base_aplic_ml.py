@@ -40,6 +40,7 @@ print('---***'*60)
 
 import numpy as np
 import pandas as pd
+import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -50,25 +51,39 @@ from sklearn.neighbors import KNeighborsRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error
 from sklearn.metrics import r2_score, mean_squared_error
-from sklearn.model_selection import GridSearchCV
-from sklearn.model_selection import RandomizedSearchCV
 
 from google.colab import files
 
+from instrumentacao import medicao
+from preprocessamento import PreProcessamento, grava_preprocessamento, COLUNAS_REMOVIDAS
+from ajuste_hiperparametros import busca_catboost
+from folds_cv import PreparacaoFolds, avalia_modelos
+from registro_modelos import ajusta_registrado, tabela_registro, chaves_execucao
+
+# Seleção automática de atributos (TCC_SELECAO_AUTOMATICA=1) em vez da lista manual COLUNAS_REMOVIDAS; altera as variáveis do modelo
+selecao_automatica = os.environ.get('TCC_SELECAO_AUTOMATICA', '') == '1'
+
 pd.set_option('display.precision', 3)
 pd.set_option('display.max_columns', 500)
 pd.set_option('display.width', 1000)
 
-"""## 1.3) Carga da Base Final para aplicação dos modelos de Machine Learning(Arquivo Excel)
+"""## 1.3) Carga da Base Consolidada e Pré-processamento para aplicação dos modelos de Machine Learning
 
 Base contém os dados conjuntos de Arrecadação, PIB e Inadimplência
-*   Carga do arquivo base_final_ml.xlsx para Dataframe base
+*   Carga do arquivo base_consolidada.xlsx (colunas pelo nome);
+*   Pré-processamento em memória (preprocessamento.PreProcessamento): outliers, One-Hot-Encoding, log10 e remoção dos atributos
+    da seleção manual (COLUNAS_REMOVIDAS; seleção automática somente com TCC_SELECAO_AUTOMATICA=1, altera as variáveis do modelo);
+*   Pré-processamento ajustado uma única vez, aqui, e gravado em preprocessamento.joblib com o modelo (seção 8.2).
 """
 
 arq_base = files.upload()
-colunas = 'B:AG'
 
-base = pd.read_excel(arq_base['base_final_ml.xlsx'], usecols=colunas)
+with medicao('aplic_ml:leitura') as registro:
+    base_consolidada = pd.read_excel(arq_base['base_consolidada.xlsx'], index_col=0)
+    preprocessamento = PreProcessamento(remover='automatico' if selecao_automatica else COLUNAS_REMOVIDAS)
+    X_base, y_base = preprocessamento.fit_transform(base_consolidada)
+    base = X_base.join(y_base).reset_index(drop=True)
+    registro['linhas'] = base.shape[0]
 
 """## 1.5) Estatística Descritiva dos Dados
 
@@ -175,12 +190,16 @@ def graf_dispersao(real, predicao):
     plt.ylabel('Inadimplência predita de 2020')
     plt.show()
 
-"""## 3.2) Nearest Neighbors Regression"""
+"""## 3.2) Nearest Neighbors Regression
 
-modelo_knn = KNeighborsRegressor()
-modelo_knn.fit(X_treinamento, y_treinamento)
+Modelos ajustados pelo registro (registro_modelos.py): mesmos dados, variáveis e hiperparâmetros são carregados sem retreinar.
+"""
 
-pred_knn = modelo_knn.predict(X_teste)
+with medicao('aplic_ml:knn', linhas=X_treinamento.shape[0]):
+    modelo_knn, registro_knn = ajusta_registrado(KNeighborsRegressor(), X_treinamento, y_treinamento,
+                                                 'Nearest Neighbors Regression', X_avaliacao=X_teste, y_avaliacao=y_teste)
+
+    pred_knn = modelo_knn.predict(X_teste)
 
 resultados(y_teste, pred_knn, 'Nearest Neighbors Regression')
 label_real = y_teste.to_numpy()
@@ -188,10 +207,11 @@ graf_dispersao(label_real, pred_knn)
 
 """## 3.3) XGBoost"""
 
-modelo_xgboost = XGBRegressor()
-modelo_xgboost.fit(X_treinamento, y_treinamento)
+with medicao('aplic_ml:xgboost', linhas=X_treinamento.shape[0]):
+    modelo_xgboost, registro_xgboost = ajusta_registrado(XGBRegressor(), X_treinamento, y_treinamento, 'XGBoost',
+                                                         X_avaliacao=X_teste, y_avaliacao=y_teste)
 
-pred_xgboost = modelo_xgboost.predict(X_teste)
+    pred_xgboost = modelo_xgboost.predict(X_teste)
 
 resultados(y_teste, pred_xgboost, 'XGBoost')
 lbl_real_xgb = y_teste.to_numpy()
@@ -202,24 +222,43 @@ graf_dispersao(lbl_real_xgb, pred_xgboost)
 treinamento_pool = Pool(X_treinamento, y_treinamento)
 teste_pool = Pool(X_teste, y_teste)
 
-modelo_catboost = CatBoostRegressor(loss_function='MAE')
-modelo_catboost.fit(treinamento_pool)
+with medicao('aplic_ml:catboost', linhas=X_treinamento.shape[0]):
+    modelo_catboost, registro_catboost = ajusta_registrado(CatBoostRegressor(loss_function='MAE'), X_treinamento, y_treinamento,
+                                                           'Catboost', dados_fit=(treinamento_pool,),
+                                                           X_avaliacao=X_teste, y_avaliacao=y_teste)
 
-pred_catboost = modelo_catboost.predict(teste_pool)
+    pred_catboost = modelo_catboost.predict(teste_pool)
 
 resultados(y_teste, pred_catboost, 'Catboost')
 lbl_real_cb = y_teste.to_numpy()
 graf_dispersao(lbl_real_cb, pred_catboost)
 
+"""## 3.5) Comparação dos Modelos por Validação Cruzada
+
+Folds preparados uma única vez (folds_cv.PreparacaoFolds): matrizes em memória mapeada, Pools do CatBoost quantizados
+e QuantileDMatrix do XGBoost reutilizados pelos modelos, pela análise de resíduos e pela busca de hiperparâmetros.
+"""
+
+folds = PreparacaoFolds(X, y, cv=5)
+
+with medicao('aplic_ml:comparacao_cv', linhas=X.shape[0]):
+    comparacao_cv = avalia_modelos({'Nearest Neighbors Regression': KNeighborsRegressor(),
+                                    'XGBoost': XGBRegressor(),
+                                    'Catboost': CatBoostRegressor(loss_function='MAE', verbose=False)}, folds)
+
+for nome_modelo, resultado in comparacao_cv.items():
+    print(nome_modelo, '- MAE: ', resultado['mae'], '+/-', resultado['mae_desvio'])
+
 """# 4) Análise de Resíduos
 
 ## 4.1) Análise de Resíduos para o Modelo de Melhor Performance ==>> CatBoost
 """
 
-ar_pool = Pool(X, y)
+ar_pool, _ = folds.pool_catboost()
 
-ar_modelo_catboost = CatBoostRegressor(loss_function='MAE')
-ar_modelo_catboost.fit(ar_pool)
+with medicao('aplic_ml:catboost_residuos', linhas=X.shape[0]):
+    ar_modelo_catboost, _ = ajusta_registrado(CatBoostRegressor(loss_function='MAE'), X, y, 'Catboost - Análise de Resíduos',
+                                              dados_fit=(ar_pool,))
 
 ar_pred_catboost = ar_modelo_catboost.predict(ar_pool)
 
@@ -249,48 +288,64 @@ plota_box(X_an_res,'residuo')
 
 X_an_res.hist(column='residuo', figsize=(9,6), bins=5)
 
-"""# 8) Hiperparâmetros e Cross Validation"""
-
-modelo_cv = CatBoostRegressor(loss_function='MAE')
+"""# 8) Hiperparâmetros e Cross Validation
 
-grid = {'max_depth': [3,4,5,6,7,8,9,10],'n_estimators':[100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 1100]}
+Busca com early stopping (ajuste_hiperparametros.busca_catboost): n_estimators deixa de ser eixo do grid e passa a ser
+o orçamento máximo de árvores, com parada antecipada no fold de validação (8 profundidades x 5 folds, em vez de 440 ajustes).
+Os folds são executados em processos paralelos e os resultados ficam em cache (reexecuções não reajustam).
+"""
 
-gscv = GridSearchCV (estimator = modelo_cv, param_grid = grid, scoring ='neg_mean_absolute_error', cv = 5)
+grid = {'max_depth': [3,4,5,6,7,8,9,10]}
 
-gscv.fit(X, y)
+with medicao('aplic_ml:busca_catboost', linhas=X.shape[0]):
+    tabela_busca, melhores_parametros = busca_catboost(X, y, grid, n_estimators=1100, folds=folds)
 
-print(gscv.best_estimator_)
-print(gscv.best_score_)
-print(gscv.best_params_)
+print(tabela_busca)
+print(melhores_parametros)
 
 """## 8.2) Aplicação do Cross Validation e Hiperparâmetros"""
 
-cv_hp_pool = Pool(X, y)
-modelo_cv_hp = CatBoostRegressor(loss_function='MAE', max_depth=7, n_estimators=1100)
+cv_hp_pool = ar_pool
 
-modelo_cv_hp.fit(cv_hp_pool)
+with medicao('aplic_ml:catboost_grid_hp', linhas=X.shape[0]):
+    modelo_cv_hp, _ = ajusta_registrado(CatBoostRegressor(loss_function='MAE', **melhores_parametros), X, y,
+                                        'Catboost - Grid Search CV e HP', dados_fit=(cv_hp_pool,))
 
 cv_hp_pred_catboost = modelo_cv_hp.predict(cv_hp_pool)
 
+# Modelo e pré-processamento ajustado (seção 1.3) gravados juntos para a predição de novas bases sem retreinar (pontuacao.py)
+modelo_cv_hp.save_model('modelo_catboost.cbm')
+grava_preprocessamento(preprocessamento, 'preprocessamento.joblib')
+files.download('modelo_catboost.cbm')
+files.download('preprocessamento.joblib')
+
 resultados(y, cv_hp_pred_catboost, 'Catboost - Grid Search CV e HP')
 
-modelo_cv_rs = CatBoostRegressor(loss_function='MAE')
+"""## 8.3) Successive Halving
 
-param_dist = {'max_depth': [3,4,5,6,7,8,9,10],'n_estimators':[100, 200, 300, 400, 500, 600, 700, 800, 900, 1000, 1100]}
+Todas as profundidades avaliadas com orçamento reduzido de árvores; a cada rodada 1/3 das melhores seguem com orçamento 3x maior.
+"""
+
+with medicao('aplic_ml:busca_halving', linhas=X.shape[0]):
+    tabela_halving, melhores_parametros_halving = busca_catboost(X, y, grid, n_estimators=1100, folds=folds, halving=True, fator=3)
 
-rscv = RandomizedSearchCV(modelo_cv_rs, param_dist, scoring ='neg_mean_absolute_error', cv = 5)
+print(tabela_halving)
+print(melhores_parametros_halving)
 
-rscv.fit(X, y)
+sh_cv_hp_pool = ar_pool
 
-print(rscv.best_estimator_)
-print(rscv.best_score_)
-print(rscv.best_params_)
+with medicao('aplic_ml:catboost_halving_hp', linhas=X.shape[0]):
+    modelo_sh_cv_hp, _ = ajusta_registrado(CatBoostRegressor(loss_function='MAE', **melhores_parametros_halving), X, y,
+                                           'Catboost - Successive Halving', dados_fit=(sh_cv_hp_pool,))
 
-rs_cv_hp_pool = Pool(X, y)
-modelo_rs_cv_hp = CatBoostRegressor(loss_function='MAE', max_depth=10, n_estimators=500)
+sh_cv_hp_pred_catboost = modelo_sh_cv_hp.predict(sh_cv_hp_pool)
 
-modelo_rs_cv_hp.fit(rs_cv_hp_pool)
+resultados(y, sh_cv_hp_pred_catboost, 'Catboost - Successive Halving - CV e HP')
 
-rs_cv_hp_pred_catboost = modelo_rs_cv_hp.predict(rs_cv_hp_pool)
+"""## 8.4) Modelos Registrados
+
+MAE, MAPE, R² e RMSE (base de teste nos modelos da seção 3 e base completa nos demais) e tempo de ajuste
+dos modelos ajustados ou carregados nesta execução.
+"""
 
-resultados(y, rs_cv_hp_pred_catboost, 'Catboost - Random Search - CV e HP')
\ No newline at end of file
+print(tabela_registro(chaves=chaves_execucao))
@@ -15,11 +15,24 @@ Original file is located at
 
 import numpy as np
 import pandas as pd
+import shutil
+import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 from google.colab import files
 
+from instrumentacao import medicao
+from preprocessamento import TransformacaoLog10, CodificacaoEstados, COLUNAS_REMOVIDAS
+from filtro_outliers import RegraLimite, RegraTrocaDasOptantes, filtra_outliers
+from selecao_variaveis import SelecaoVariaveis, matriz_correlacao, pares_colineares
+from relatorio import gera_relatorio, figuras_eda
+
+# Modo relatório (TCC_RELATORIO=1): gráficos não são exibidos um a um e sim gravados no relatório estático da seção 5
+modo_relatorio = os.environ.get('TCC_RELATORIO', '') == '1'
+# Seleção automática de atributos (TCC_SELECAO_AUTOMATICA=1) em vez da lista manual da seção 4.3; altera as variáveis do modelo
+selecao_automatica = os.environ.get('TCC_SELECAO_AUTOMATICA', '') == '1'
+
 pd.set_option('display.precision', 2)
 pd.set_option('display.max_columns', 500)
 pd.set_option('display.width', 1000)
@@ -38,7 +51,9 @@ Carga do arquivo base_consolidada.xlsx para DataFrame base.
 arq_base = files.upload()
 colunas = 'B:N'
 
-base = pd.read_excel(arq_base['base_consolidada.xlsx'], usecols=colunas)
+with medicao('proc_tratam:leitura') as registro:
+    base = pd.read_excel(arq_base['base_consolidada.xlsx'], usecols=colunas)
+    registro['linhas'] = base.shape[0]
 
 """## 1.3) Estatística Descritiva dos Dados
 
@@ -77,17 +92,19 @@ Após análise dos dados e da realidade dos demais 5567 municípios, por defini
 Serão mantidos todos apresentam inadimplência abaixo de 0,99.
 
 Uma possível assunção seria a troca dos dados nas colunas DAS Pagos e Optantes do Simples - MEI.
+
+Regras aplicadas em uma única máscara (filtro_outliers.py); os Municípios eliminados e os motivos são gravados em quarentena_outliers.csv.
 """
 
 print('*' * 71)
 print('Municípios com Inadimplência maior que 0,99:')
 print('-' * 71)
-outliers_inad = pd.DataFrame
-outliers_inad = base.loc[(base['inad_2020'] >= 1)]
-print(outliers_inad.iloc[:, 0:5])
-for indice in (base.loc[(base['inad_2020'] >= 1)]).index:
-    base.drop(indice, inplace=True)
-base.reset_index(drop=True, inplace=True)
+with medicao('proc_tratam:outliers') as registro:
+    regras = [RegraLimite('inad_2020', maximo=1), RegraTrocaDasOptantes('inad_2020')]
+    base, outliers_inad = filtra_outliers(base, regras, 'quarentena_outliers.csv')
+    print(outliers_inad[list(outliers_inad.columns[0:5]) + ['motivo']])
+    base = base.reset_index(drop=True)
+    registro['linhas'] = base.shape[0]
 print('*' * 71)
 print('-' * 87)
 print('Descrição dos dados, após eliminação 3 dos Municípios com Inadimplência maior que 0,99:')
@@ -101,12 +118,13 @@ print(base.iloc[[4061,1925,1252,3019,5130]])
 
 """## 2.2) One-Hot-Enconding para a Sigla dos Estados
 Utilidade da diferenciação regional nas análises.
+
+Vocabulário fixo dos 27 Estados (preprocessamento.CodificacaoEstados): as colunas Est_AC ... Est_TO são sempre as mesmas.
 """
 
-siglas = pd.get_dummies(base.Sigla, prefix='Est')
-base_processamento = pd.DataFrame()
-base_processamento = pd.concat([base,siglas],axis=1)
-base_processamento.drop(columns=['Sigla', 'Estado', 'Municipio'], inplace=True)
+with medicao('proc_tratam:one_hot') as registro:
+    base_processamento = CodificacaoEstados().fit_transform(base)
+    registro['linhas'] = base_processamento.shape[0]
 print('*' * 62)
 print('Colunas da base_processamento - aplicação do One_Hot_Enconding')
 print('-' * 62)
@@ -122,16 +140,17 @@ print('Base após processamento de one-hot-enconding para os Estados:')
 print('-' * 61)
 print(base_processamento)
 
-"""## 2.3) Transformando as variáveis float64 para base log10"""
+"""## 2.3) Transformando as variáveis float64 para base log10
 
-colunas_float = base_processamento.dtypes[base_processamento.dtypes == 'float64'].index
-colunas_float = colunas_float.drop(['inad_2020'])
+Transformação vetorizada (preprocessamento.TransformacaoLog10): colunas float64 exceto o Label, log10 do valor absoluto e -10 para os zeros.
+O objeto ajustado guarda as colunas transformadas e é reaplicado na predição.
+"""
 
-base_process_log10 = pd.DataFrame
-base_process_log10 = base_processamento.copy()
+transformacao_log10 = TransformacaoLog10(excluir=['inad_2020'], sentinela_zero=-10)
 
-for coluna in colunas_float:
-    base_process_log10[coluna] = base_process_log10[coluna].apply(lambda x: np.log10(abs(x)) if x!= 0 else -10).astype(float)
+with medicao('proc_tratam:log10') as registro:
+    base_process_log10 = transformacao_log10.fit_transform(base_processamento)
+    registro['linhas'] = base_process_log10.shape[0]
 
 print('*' * 370)
 print('Base após Transformação para base em log10 da variáveis float64:')
@@ -168,6 +187,8 @@ print('*' * 370)
 """## 3.2) Histogramas das colunas dos dados originais"""
 
 def plota_histogramas (dados):
+    if modo_relatorio:
+        return
     colunas = list(dados.keys())
     atrib_categ = list(dados.dtypes[dados.dtypes != 'float64'].index)
     for coluna in colunas:
@@ -188,7 +209,8 @@ Outliers são valores que distoam da média dos valores constantes de uma série
 """
 
 def plota_box (dados, coluna, municip, qtd):
-    dados.boxplot(column=coluna, figsize=(9,9))
+    if not modo_relatorio:
+        dados.boxplot(column=coluna, figsize=(9,9))
     if municip:
         maiores = dados.nlargest(qtd, coluna)
         maiores.reset_index(drop=False, inplace=True)
@@ -291,18 +313,23 @@ Matriz de dispersão da base em escala logatítmica base 10
 """
 
 col_flt = list(base_process_log10.dtypes[base_process_log10.dtypes == 'float64'].index)
-sns.pairplot(base_process_log10[col_flt], corner=True)
+if not modo_relatorio:
+    sns.pairplot(base_process_log10[col_flt], corner=True)
 
 """Matriz de dispersão da base com dados em seus valores originais"""
 
 col_flt_bp = list(base_processamento.dtypes[base_processamento.dtypes == 'float64'].index)
-sns.pairplot(base_processamento[col_flt_bp], corner=True)
+if not modo_relatorio:
+    sns.pairplot(base_processamento[col_flt_bp], corner=True)
+
+"""## 4.2) Detecção do Coeficiente de Correlação de Pearson entre as variáveis e o Label.
 
-"""## 4.2) Detecção do Coeficiente de Correlação de Pearson entre as variáveis e o Label."""
+Matriz de correlação calculada uma única vez (selecao_variaveis.matriz_correlacao, em cache pelo hash dos dados)
+e reutilizada no Label, no mapa de calor e nos pares colineares.
+"""
 
-campos = base_process_log10.dtypes[base_process_log10.dtypes != 'object'].index
-base_correlacao = np.corrcoef(base_process_log10[campos].transpose())
-correlacao = pd.DataFrame(data=base_correlacao, index=campos, columns=campos)
+with medicao('proc_tratam:correlacao'):
+    correlacao = matriz_correlacao(base_process_log10)
 
 # Baixas correlações com o Label - inad_2020
 correl_label = pd.DataFrame()
@@ -316,61 +343,80 @@ print(correl_label)
 col_flt = list(base_process_log10.dtypes[base_process_log10.dtypes == 'float64'].index)
 
 # Criando máscara
-mascara = np.triu(np.ones_like(base_process_log10[col_flt].corr(), dtype=bool))
+mascara = np.triu(np.ones((len(col_flt), len(col_flt)), dtype=bool))
 np.fill_diagonal(mascara, False)
 
 # Parâmetros para criação do palette
 cmap = sns.diverging_palette(100, 7, s=75, l=40, n=5, center="light", as_cmap=True)
 
 # Tamanho do mapa de calor e criação do mesmo
-plt.figure(figsize=(10, 6))
-sns.heatmap(base_process_log10[col_flt].corr(), mask=mascara, center=0, annot=True, fmt='.2f', square=True, cmap=cmap)
+if not modo_relatorio:
+    plt.figure(figsize=(10, 6))
+    sns.heatmap(correlacao.loc[col_flt, col_flt], mask=mascara, center=0, annot=True, fmt='.2f', square=True, cmap=cmap)
 
-# Apresenta o het map só com o triângulo inferior da matriz definida pela mascara e palette
-plt.show()
+    # Apresenta o het map só com o triângulo inferior da matriz definida pela mascara e palette
+    plt.show()
 
-# nova coluna indice para preparação da tabela pivot e cria tabela pivot
-correlacao ['ind_pivot'] = correlacao.index
-corr_pivot = correlacao.melt(id_vars='ind_pivot').copy()
-
-# Filtro para correlaçãoes maiores que 0.93
-aux_corr_pivot = corr_pivot[abs(corr_pivot['value']>0.93)].sort_values('ind_pivot')
+# Pares do triângulo superior com correlação acima de 0.93 (absoluto), sem o Label
 print('*' * 62)
 print('Correlação entre variáveis preditoras acima de 0,93 (absoluto)')
 print('*' * 62)
-print(aux_corr_pivot[aux_corr_pivot['ind_pivot'] != aux_corr_pivot['variable']])
+print(pares_colineares(correlacao, 0.93, excluir=['inad_2020']))
 
 """## 4.3) Eliminação de atributos:
 
-*   Baixa Colinearidade com o Label
-
-                        Est_GO
-
-
-
-*   Alta Colinearidade entre atributos (Exceto Label)
-
-                       Valor_ab_indu
-
-                       Valor_ab_serv
-
-                       Valor_abt
-
-                       Impostos
-
+Seleção manual (preprocessamento.COLUNAS_REMOVIDAS), a partir da correlação da seção 4.2:
 
+*   Baixa Colinearidade com o Label: Est_GO;
 
+*   Alta Colinearidade entre atributos (Exceto Label): Valor_ab_indu, Valor_ab_serv, Valor_abt e Impostos.
 
+Opcional (TCC_SELECAO_AUTOMATICA=1): seleção automática (selecao_variaveis.SelecaoVariaveis) em ordem decrescente de
+correlação com o Label, mantendo entre as variáveis colineares (acima de 0,93) a mais correlacionada com o Label.
+Na base consolidada ela elimina PIB e mantém Valor_abt, ao contrário da lista manual: as variáveis do modelo mudam.
 """
 
-base_process_log10.drop(columns=['Est_GO','Valor_ab_indu', 'Valor_ab_serv', 'Valor_abt','Impostos'], inplace=True)
+base_log10_completa = base_process_log10
+if selecao_automatica:
+    selecao = SelecaoVariaveis('inad_2020', limite=0.93).fit(base_process_log10)
+    motivos = selecao.motivos_
+    base_process_log10 = selecao.transform(base_process_log10)
+else:
+    motivos = {coluna: 'seleção manual' for coluna in COLUNAS_REMOVIDAS}
+    base_process_log10 = base_process_log10.drop(columns=COLUNAS_REMOVIDAS)
+print('*' * 62)
+print('Atributos eliminados')
+print('-' * 62)
+for coluna, motivo in motivos.items():
+    print(coluna, ':', motivo)
 print('*' * 281)
 print('Base Final para aplicação dos Modelos de Machine Learning')
 print('-' * 75)
 print(base_process_log10)
 print('*' * 281)
 
-"""## 4.4) Gravação da base final em formato Excel"""
+"""## 4.4) Gravação da base final em formato Excel
+
+O pré-processamento usado pelos modelos (eliminação dos outliers, One-Hot-Encoding, log10 e remoção dos atributos) é
+ajustado pelo base_aplic_ml.py diretamente sobre a base consolidada e gravado em preprocessamento.joblib junto com o
+modelo (modelo_catboost.cbm), de onde é carregado para a predição (pontuacao.py).
+"""
+
+with medicao('proc_tratam:gravacao'):
+    base_process_log10.to_excel('base_final_ml.xlsx')
+files.download('base_final_ml.xlsx')
+
+"""# 5) Relatório estático da análise exploratória
+
+Histogramas, boxplots, matrizes de dispersão e mapa de calor gravados em relatorio/ (index.html e figuras PNG),
+renderizados com o backend Agg em processos paralelos; figuras de dados inalterados são reaproveitadas do cache.
+Matrizes de dispersão de bases grandes são amostradas ou apresentadas em hexbin.
+"""
 
-base_process_log10.to_excel('base_final_ml.xlsx')
-files.download('base_final_ml.xlsx')
\ No newline at end of file
+if modo_relatorio:
+    with medicao('proc_tratam:relatorio'):
+        figuras = figuras_eda(base, base_processamento, base_log10_completa, correlacao)
+        gera_relatorio(figuras, 'relatorio', 'Análise exploratória - Inadimplência, Arrecadação e PIB',
+                       {'Descrição dos dados': base.describe(), 'Correlação com o Label': correl_label.to_frame()})
+    shutil.make_archive('relatorio', 'zip', 'relatorio')
+    files.download('relatorio.zip')
@@ -0,0 +1,190 @@
+# coding=utf-8
+
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import subprocess
+import argparse
+import platform
+import shutil
+import json
+import time
+import os
+import io
+import contextlib
+
+import dados_sinteticos
+import carga
+from instrumentacao import rss_pico
+
+# Benchmark das cargas e da conciliação/consolidação (carga.py) sobre planilhas sintéticas (dados_sinteticos.py).
+# Cada execução acrescenta uma linha por função ao arquivo de resultados, identificada pelo commit do repositório,
+# para comparação entre versões (--comparar) e bloqueio de regressões de desempenho (--limite).
+DIR_DADOS = os.path.join('cache', 'benchmark')
+ARQ_RESULTADOS = os.path.join('benchmarks', 'resultados.jsonl')
+ARQUIVOS_REFERENCIA = ['estados_br.csv', 'ajustes_municipios.csv']     # Tabelas do projeto lidas pelas cargas
+
+
+def prepara_dados(municipios, meses, diretorio=DIR_DADOS):
+    '''
+        Gera as planilhas sintéticas no diretório <diretorio>/<municipios>_<meses>, reaproveitando as já geradas
+        para os mesmos parâmetros. Retorna o diretório dos dados.
+    '''
+    destino = os.path.abspath(os.path.join(diretorio, str(municipios) + '_' + str(meses)))
+    controle = os.path.join(destino, 'parametros.json')
+    parametros = {'municipios': municipios, 'meses': meses}
+    if os.path.exists(controle):
+        with open(controle, encoding='utf-8') as arquivo:
+            if json.load(arquivo) == parametros:
+                return destino
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.makedirs(destino)
+    inicio = time.perf_counter()
+    tabela = dados_sinteticos.gera_municipios(municipios)
+    dados_sinteticos.gera_dtb(destino, tabela)
+    dados_sinteticos.gera_mei(destino, tabela)
+    dados_sinteticos.gera_pib(destino, tabela)
+    dados_sinteticos.gera_inad(destino, tabela, meses)
+    for arquivo in ARQUIVOS_REFERENCIA:
+        shutil.copy(arquivo, destino)
+    with open(controle, 'w', encoding='utf-8') as arquivo:
+        json.dump(parametros, arquivo)
+    print('Dados sintéticos gerados em', round(time.perf_counter() - inicio, 1), 's:', destino)
+    return destino
+
+
+def mede(funcao, repeticoes, prepara=None):
+    '''
+        Tempos de execução da função: primeira execução (fria: leitura do Excel e gravação dos caches)
+        e melhor/mediana das demais (quente). prepara() fornece os argumentos de cada execução, fora da medição.
+    '''
+    tempos = []
+    for _ in range(repeticoes + 1):
+        argumentos = prepara() if prepara else ()
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultado = funcao(*argumentos)
+            tempos.append(time.perf_counter() - inicio)
+    quentes = tempos[1:] or tempos
+    return {'frio': round(tempos[0], 6), 'quente_min': round(min(quentes), 6),
+            'quente_mediana': round(float(np.median(quentes)), 6)}, resultado
+
+
+def executa_benchmark(municipios=5570, meses=12, repeticoes=3, workers=1):
+    '''
+        Mede carga_inad, carga_mei, carga_pib, consist_munic_ibge e consolida_axi sobre os dados sintéticos.
+        As cargas são executadas no diretório dos dados (nomes de arquivo fixos em carga.py) com caches próprios.
+    '''
+    diretorio = prepara_dados(municipios, meses)
+    origem = os.getcwd()
+    os.chdir(diretorio)
+    shutil.rmtree('cache', ignore_errors=True)
+    try:
+        periodo = ['2020']     # Ano da Arrecadação e do PIB sintéticos; a Inadimplência é carregada com todos os meses
+        pib = ('PIB dos Municípios - base de dados 2010-2020.xls', 0, [0,4,5,6,7,32,33,34,35,36,37,38,39])
+        with contextlib.redirect_stdout(io.StringIO()):
+            estados = carga.carga_estados()
+            municip = carga.carga_municipios()
+            carga.insere_sigla_est_munic(estados, municip)
+
+        medidas = {}
+        medidas['carga_inad'], inadimplencia = mede(lambda: carga.carga_inad(estados, None, workers), repeticoes)
+        medidas['carga_mei'], arrecadacao = mede(lambda: carga.carga_mei(periodo), repeticoes)
+        medidas['carga_pib'], base_pib = mede(lambda: carga.carga_pib(*pib, periodo), repeticoes)
+
+        inadimplencia = carga.insere_est_inad(estados, inadimplencia)
+        medidas['consist_munic_ibge'], _ = mede(lambda base: carga.consist_munic_ibge(municip, base, 'Arrecadacao'),
+                                                repeticoes, lambda: (arrecadacao.copy(),))
+
+        # Consolidação pelas chaves do código do IBGE, como em carga.main
+        with contextlib.redirect_stdout(io.StringIO()):
+            carga.consist_munic_ibge(municip, arrecadacao, 'Arrecadacao')
+            carga.consist_munic_ibge(municip, inadimplencia, 'Inadimplencia')
+            codigos = carga.tabela_codigos_ibge(municip)
+            carga.atribui_codigo_ibge(arrecadacao, codigos)
+            carga.atribui_codigo_ibge(inadimplencia, codigos)
+        chaves = (carga.chave_axi(arrecadacao, ['Codigo_IBGE']), carga.chave_axi(inadimplencia, ['Codigo_IBGE']))
+        medidas['consolida_axi'], _ = mede(lambda: carga.consolida_axi(arrecadacao, inadimplencia, chaves), repeticoes)
+    finally:
+        os.chdir(origem)
+
+    execucao = {'data': datetime.now().isoformat(timespec='seconds'), 'commit': commit_atual(),
+                'municipios': municipios, 'meses': meses, 'repeticoes': repeticoes, 'workers': workers,
+                'python': platform.python_version(), 'pandas': pd.__version__, 'rss_pico_mb': rss_pico()}
+    return [dict(execucao, funcao=funcao, **tempos) for funcao, tempos in medidas.items()]
+
+
+def grava_resultados(resultados, arquivo=ARQ_RESULTADOS):
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    with open(arquivo, 'a', encoding='utf-8') as saida:
+        for resultado in resultados:
+            saida.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+
+
+def compara_resultados(resultados, referencia=None, arquivo=ARQ_RESULTADOS):
+    '''
+        Comparação com a última execução registrada de outro commit (ou do commit de referência) com os mesmos
+        parâmetros (municípios, meses e workers). Retorna a tabela com a razão atual / referência do tempo quente.
+    '''
+    if not os.path.exists(arquivo):
+        return None
+    historico = pd.read_json(arquivo, lines=True, dtype={'commit': str})
+    atual = pd.DataFrame(resultados)
+    parametros = atual.iloc[0]
+    historico = historico[(historico['municipios'] == parametros['municipios']) & (historico['meses'] == parametros['meses'])
+                          & (historico['workers'] == parametros['workers'])]
+    if referencia:
+        historico = historico[historico['commit'].str.startswith(referencia)]
+    else:
+        historico = historico[historico['commit'] != parametros['commit']]
+    if historico.empty:
+        return None
+    anterior = historico.drop_duplicates(subset='funcao', keep='last').set_index('funcao')
+    tabela = atual.set_index('funcao')[['frio', 'quente_min']].join(
+        anterior[['commit', 'frio', 'quente_min']], rsuffix='_referencia', how='inner')
+    tabela['razao'] = tabela['quente_min'] / tabela['quente_min_referencia']
+    return tabela
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark das cargas de carga.py com planilhas sintéticas.')
+    parser.add_argument('--municipios', type=int, default=5570, help='Quantidade de Municípios (linhas) por planilha (padrão: 5570)')
+    parser.add_argument('--meses', type=int, default=12, help='Quantidade de planilhas mensais de Inadimplência (padrão: 12)')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções medidas após a primeira (padrão: 3)')
+    parser.add_argument('--workers', type=int, default=1, help='Processos para leitura das planilhas de Inadimplência (padrão: 1)')
+    parser.add_argument('--comparar', metavar='COMMIT', nargs='?', const='',
+                        help='Compara com o commit informado (padrão: última execução de outro commit)')
+    parser.add_argument('--limite', type=float, default=None,
+                        help='Razão máxima de tempo em relação à referência; acima dela o benchmark termina com erro')
+    parser.add_argument('--nao-gravar', action='store_true', help='Não acrescenta os resultados ao arquivo de resultados')
+    argumentos = parser.parse_args()
+
+    resultados = executa_benchmark(argumentos.municipios, argumentos.meses, argumentos.repeticoes, argumentos.workers)
+    print(pd.DataFrame(resultados).set_index('funcao')[['frio', 'quente_min', 'quente_mediana']])
+
+    regressao = False
+    if argumentos.comparar is not None or argumentos.limite is not None:
+        comparacao = compara_resultados(resultados, argumentos.comparar)
+        if comparacao is None:
+            print('Sem execução de referência para comparação.')
+        else:
+            print(comparacao.to_string())
+            if argumentos.limite is not None:
+                acima = comparacao[comparacao['razao'] > argumentos.limite]
+                if not acima.empty:
+                    print('*** Atenção **** Regressão de desempenho acima de', argumentos.limite, 'x:', ', '.join(acima.index))
+                    regressao = True
+
+    if not argumentos.nao_gravar:
+        grava_resultados(resultados)
+    if regressao:
+        exit(1)
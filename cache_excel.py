@@ -0,0 +1,188 @@
+# coding=utf-8
+
+from xml.etree import ElementTree
+import pandas as pd
+import posixpath
+import zipfile
+import hashlib
+import json
+import os
+import re
+
+from instrumentacao import instrumenta
+
+try:
+    from pyarrow import feather
+except ImportError:     # Sem pyarrow as planilhas são lidas diretamente do Excel, sem cache
+    feather = None
+
+DIR_CACHE = os.path.join('cache', 'excel')  # Diretório das planilhas convertidas para formato colunar
+
+hashes_arquivos = {}    # (arquivo, tamanho, data de modificação) -> hash do conteúdo, calculado uma vez por execução
+hashes_planilhas_arquivos = {}  # hash do conteúdo do arquivo -> hash do conteúdo de cada planilha
+
+NS_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_RELACAO = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+@instrumenta()
+def le_excel(arquivo, sheet_name=0, header=0, usecols=None, hash_arquivo=None):
+    '''
+        Leitura de planilhas Excel com cache colunar (Feather/Arrow) em disco.
+        Cada planilha é convertida uma única vez e a entrada do cache é identificada pelo arquivo,
+        nome da planilha e parâmetros header/usecols; o hash do conteúdo do arquivo é validado a cada leitura.
+        Alteração no arquivo de origem invalida somente as entradas daquele arquivo.
+        Parâmetros e retorno equivalentes ao pd.read_excel (lista de planilhas -> dicionário de DataFrames).
+        hash_arquivo -> hash do conteúdo já calculado (ex.: pelo processo principal, para leituras em processos separados).
+    '''
+    lista = isinstance(sheet_name, (list, tuple))
+    planilhas = list(sheet_name) if lista else [sheet_name]
+
+    if feather is None:
+        return pd.read_excel(arquivo, sheet_name=sheet_name, header=header, usecols=usecols)
+
+    hash_arquivo = hash_arquivo or hash_conteudo(arquivo)
+    resultado = {}
+    pendentes = []
+    for planilha in planilhas:
+        dados = carrega_entrada(arquivo, planilha, header, usecols, hash_arquivo)
+        if dados is None:
+            pendentes.append(planilha)
+        else:
+            resultado[planilha] = dados
+
+    # Planilhas fora do cache são lidas do Excel em uma única abertura do arquivo
+    if pendentes:
+        lidas = pd.read_excel(arquivo, sheet_name=pendentes, header=header, usecols=usecols)
+        for planilha in pendentes:
+            grava_entrada(lidas[planilha], arquivo, planilha, header, usecols, hash_arquivo)
+            resultado[planilha] = lidas[planilha]
+
+    if lista:
+        return {planilha: resultado[planilha] for planilha in planilhas}
+    return resultado[sheet_name]
+
+
+def nomes_planilhas(arquivo):
+    '''
+        Relação dos nomes das planilhas do arquivo Excel, reaproveitada do cache enquanto o arquivo não mudar.
+    '''
+    if feather is None:
+        return pd.ExcelFile(arquivo).sheet_names
+
+    hash_arquivo = hash_conteudo(arquivo)
+    caminho = caminho_entrada(arquivo, 'planilhas') + '.json'
+    metadados = le_metadados(caminho)
+    if metadados is not None and metadados['hash_arquivo'] == hash_arquivo:
+        return metadados['planilhas']
+
+    planilhas = pd.ExcelFile(arquivo).sheet_names
+    grava_metadados(caminho, {'arquivo': arquivo, 'hash_arquivo': hash_arquivo, 'planilhas': planilhas})
+    return planilhas
+
+
+def hash_conteudo(arquivo):
+    # Hash SHA-256 do conteúdo do arquivo, lido em blocos de 1 MB
+    estado = os.stat(arquivo)
+    chave = (os.path.abspath(arquivo), estado.st_size, estado.st_mtime_ns)
+    if chave not in hashes_arquivos:
+        sha = hashlib.sha256()
+        with open(arquivo, 'rb') as conteudo:
+            for bloco in iter(lambda: conteudo.read(1 << 20), b''):
+                sha.update(bloco)
+        hashes_arquivos[chave] = sha.hexdigest()
+    return hashes_arquivos[chave]
+
+
+def hashes_planilhas(arquivo):
+    '''
+        Hash do conteúdo de cada planilha do arquivo ({nome da planilha: hash}), sem leitura pelo pandas.
+        xlsx: XML da planilha no pacote zip (xl/worksheets/sheetN.xml), com os textos compartilhados (sharedStrings)
+        substituídos pelo próprio texto, de modo que a mesma planilha em outro arquivo tem o mesmo hash;
+        demais formatos: hash do arquivo inteiro para todas as planilhas.
+    '''
+    hash_arquivo = hash_conteudo(arquivo)
+    if hash_arquivo not in hashes_planilhas_arquivos:
+        if zipfile.is_zipfile(arquivo):
+            with zipfile.ZipFile(arquivo) as pacote:
+                hashes = hashes_planilhas_xlsx(pacote)
+        else:
+            hashes = {planilha: hash_arquivo for planilha in nomes_planilhas(arquivo)}
+        hashes_planilhas_arquivos[hash_arquivo] = hashes
+    return hashes_planilhas_arquivos[hash_arquivo]
+
+
+def hashes_planilhas_xlsx(pacote):
+    # Planilhas do workbook.xml associadas aos arquivos XML pelas relações (workbook.xml.rels)
+    relacoes = {relacao.get('Id'): relacao.get('Target')
+                for relacao in ElementTree.fromstring(pacote.read('xl/_rels/workbook.xml.rels'))}
+    textos = []
+    if 'xl/sharedStrings.xml' in pacote.namelist():
+        textos = [''.join(texto.text or '' for texto in item.iter(NS_PLANILHA + 't'))
+                  for item in ElementTree.fromstring(pacote.read('xl/sharedStrings.xml'))]
+
+    def texto_compartilhado(celula):
+        return celula.group(1) + b'<v>' + textos[int(celula.group(2))].encode('utf-8') + b'</v>'
+
+    hashes = {}
+    for planilha in ElementTree.fromstring(pacote.read('xl/workbook.xml')).iter(NS_PLANILHA + 'sheet'):
+        destino = relacoes[planilha.get(NS_RELACAO + 'id')]
+        membro = destino.lstrip('/') if destino.startswith('/') else posixpath.normpath(posixpath.join('xl', destino))
+        conteudo = re.sub(rb'(<c\b[^>]*\bt="s"[^>]*>)\s*<v>(\d+)</v>', texto_compartilhado, pacote.read(membro))
+        hashes[planilha.get('name')] = hashlib.sha256(conteudo).hexdigest()
+    return hashes
+
+
+def caminho_entrada(arquivo, *parametros):
+    # Nome da entrada: nome do arquivo de origem + resumo dos parâmetros de leitura
+    base = re.sub(r'[^0-9A-Za-z]+', '_', os.path.basename(arquivo)).strip('_')
+    resumo = hashlib.sha1(json.dumps([str(p) for p in parametros]).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(DIR_CACHE, base + '-' + resumo)
+
+
+def carrega_entrada(arquivo, planilha, header, usecols, hash_arquivo):
+    # Retorna o DataFrame do cache (memory-mapped) ou None se ausente ou desatualizado
+    caminho = caminho_entrada(arquivo, planilha, header, usecols)
+    metadados = le_metadados(caminho + '.json')
+    if metadados is None or metadados['hash_arquivo'] != hash_arquivo or not os.path.exists(caminho + '.feather'):
+        return None
+
+    dados = feather.read_table(caminho + '.feather', memory_map=True).to_pandas()
+    colunas = [tuple(coluna) if isinstance(coluna, list) else coluna for coluna in metadados['colunas']]
+    if colunas and all(isinstance(coluna, tuple) for coluna in colunas):
+        dados.columns = pd.MultiIndex.from_tuples(colunas)
+    else:
+        dados.columns = colunas
+    return dados
+
+
+def grava_entrada(dados, arquivo, planilha, header, usecols, hash_arquivo):
+    # Colunas gravadas por posição; os nomes originais (inclusive multi-cabeçalho) ficam nos metadados
+    caminho = caminho_entrada(arquivo, planilha, header, usecols)
+    colunas = [list(coluna) if isinstance(coluna, tuple) else coluna for coluna in dados.columns]
+    tabela = dados.set_axis(['c' + str(posicao) for posicao in range(dados.shape[1])], axis=1).reset_index(drop=True)
+    try:
+        os.makedirs(DIR_CACHE, exist_ok=True)
+        feather.write_feather(tabela, caminho + '.feather')
+    except (TypeError, ValueError) as erro:
+        # Colunas com tipos mistos não convertidos pelo Arrow: a planilha segue sem cache
+        print('*** Atenção **** Planilha', planilha, 'de', arquivo, 'não armazenada em cache:', erro)
+        return
+    grava_metadados(caminho + '.json', {'arquivo': arquivo, 'planilha': str(planilha), 'header': header,
+                                        'usecols': usecols, 'hash_arquivo': hash_arquivo, 'colunas': colunas})
+
+
+def le_metadados(caminho):
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def grava_metadados(caminho, metadados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo, ensure_ascii=False, default=str)
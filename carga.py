@@ -1,127 +1,183 @@
 # coding=utf-8
 
-from requests_html import HTMLSession
 from operator import index
-from thefuzz import fuzz
+from rapidfuzz import fuzz, process
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
 import numpy as np
-import unidecode
+import argparse
 import re
 
-def main():
-    periodo = ['2020']
-    arq_pib = 'PIB dos Municípios - base de dados 2010-2020.xls'
-    cab_pib = 0
-    col_pib = [0,4,5,7,32,33,34,35,36,37,38,39]
+from normalizacao import normaliza_municipios, aplica_ajustes, ARQ_AJUSTES
+from cache_excel import le_excel, nomes_planilhas, hash_conteudo
+from registro_estados import registro_estados, ARQ_ESTADOS
+from perfil import perfil_df, tabela_perfil, configura_perfil, configuracao
+from esquema import aplica_esquema, tipo_coluna, inclui_categorias, unifica_categorias
+import atualizacao_inad
+from etapas import executa_etapas
+from instrumentacao import instrumenta
 
-    # Carga dos 27 Estados - fonte: ISO
-    estados_df = carga_estados()
+ARQ_MUNICIPIOS = 'RELATORIO_DTB_BRASIL_MUNICIPIO.xls'                  # Municípios do IBGE
+ARQ_MEI = 'arrecadacao-do-mei-por-municipio-2015-a-2020.xlsx'          # Arrecadação dos MEI (RFB)
+ARQ_INAD = 'InadimplenciaMEI102022.xlsx'                               # Inadimplência: arquivo padrão se não houver outro publicado
+
+def main(workers=1, incremental=False, inicio=None, somente=None, paralelo=True):
+    '''
+        Carga e consolidação executadas como etapas com dependências (etapas.py):
+        estados -> municipios e inad; mei e pib independentes; reconcile após as cargas; consolidate ao final.
+        A saída de cada etapa é gravada em checkpoint; inicio/somente reaproveitam os checkpoints das anteriores.
+    '''
+    parametros = {
+        'periodo': ['2020'],
+        'fonte_estados': 'tabela',    # tabela (versionada, offline), dtb (arquivo do IBGE) ou iso (sítio da ISO)
+        'arq_pib': 'PIB dos Municípios - base de dados 2010-2020.xls',
+        'cab_pib': 0,
+        'col_pib': [0,4,5,6,7,32,33,34,35,36,37,38,39],
+    }
+    opcoes = {'workers': workers, 'incremental': incremental}
+    # Configuração do perfil (--silencioso, --perfil) reaplicada nos processos das etapas
+    inicializacao = (configura_perfil, (configuracao['silencioso'], configuracao['diretorio']))
+    return executa_etapas(ETAPAS, parametros, opcoes, inicio, somente, paralelo, arquivos_etapas(parametros), inicializacao)
+
+
+def etapa_estados(entradas, parametros, opcoes):
+    # Carga dos 27 Estados - fonte: tabela versionada, IBGE ou ISO
+    estados_df = carga_estados(parametros['fonte_estados'])
     if estados_df.empty:
-        print('Erro na carga de Estados a partir da Internet!')
+        print('Erro na carga de Estados!')
         exit()
+    return {'estados': estados_df}
+
 
+def etapa_municipios(entradas, parametros, opcoes):
     # Carga dos 5570 Municípios - fonte: IBGE
     municip = carga_municipios()
 
     # Insere a sigla do Estado nos DataFrames de Municípios
-    insere_sigla_est_munic(estados_df, municip)
+    insere_sigla_est_munic(entradas['estados']['estados'], municip)
     descreve_df(municip, 'Município')
+    return {'municipios': municip}
 
+
+def etapa_mei(entradas, parametros, opcoes):
     # Arrecadação dos MEI dos 5570 Municípios - fonte: RFB
-    arrecadacao = carga_mei(periodo)
+    arrecadacao = carga_mei(parametros['periodo'])
     descreve_df(arrecadacao, 'Arrecadação')
+    return {'arrecadacao': arrecadacao}
+
 
+def etapa_inad(entradas, parametros, opcoes):
     # Inadimplência dos MEI dos 5570 Municípios - fonte RFB / Simples Nacional
-    inadimplencia = carga_inad(estados_df)  
+    estados_df = entradas['estados']['estados']
+    inadimplencia = carga_inad(estados_df, parametros['periodo'], opcoes['workers'], opcoes['incremental'])
 
     # Insere a sigla do Estado no DataFrame de Inadimplência
     inadimplencia = insere_est_inad(estados_df, inadimplencia)
     descreve_df(inadimplencia, 'Inadimplência')
+    return {'inadimplencia': inadimplencia}
+
 
+def etapa_pib(entradas, parametros, opcoes):
     # PIB dos 5570 Municípios - fonte: IBGE
-    pib = carga_pib(arq_pib, cab_pib, col_pib, periodo)
+    pib = carga_pib(parametros['arq_pib'], parametros['cab_pib'], parametros['col_pib'], parametros['periodo'])
     descreve_df(pib, 'PIB')
+    return {'pib': pib}
+
+
+def etapa_reconcile(entradas, parametros, opcoes):
+    municip = entradas['municipios']['municipios']
+    arrecadacao = entradas['mei']['arrecadacao'].copy()
+    inadimplencia = entradas['inad']['inadimplencia'].copy()
+    pib = entradas['pib']['pib']
 
     # Ajuste do nome dos Municípios de acordo com a base de Municípios do IBGE
-    consist_munic_ibge(municip, pib, 'PIB')
+    # (o PIB já traz o código do IBGE e dispensa o ajuste)
     consist_munic_ibge(municip, arrecadacao, 'Arrecadacao')
     consist_munic_ibge(municip, inadimplencia, 'Inadimplencia')
 
-    # Consistência da posição indexada dos Municípios nos Dataframes de Arrecadação e Inadimplência
-    consist_axi(municip, arrecadacao, inadimplencia, pib)
+    # Código do IBGE na Arrecadação e Inadimplência a partir da tabela de resolução nome -> código
+    codigos = tabela_codigos_ibge(municip)
+    atribui_codigo_ibge(arrecadacao, codigos)
+    atribui_codigo_ibge(inadimplencia, codigos)
+
+    # Consistência por chave (código do IBGE) dos Municípios nos Dataframes de Arrecadação, Inadimplência e PIB
+    consistencia = consist_axi(municip, arrecadacao, inadimplencia, pib, chaves=['Codigo_IBGE'])
+    return {'arrecadacao': arrecadacao, 'inadimplencia': inadimplencia, 'relatorio': consistencia['relatorio']}
+
 
-    # Merge dos Dataframes Arrecadação e Inadimplência
-    base_axi = consolida_axi(arrecadacao, inadimplencia)
-    base_final = consolida_axi(base_axi, pib)
+def etapa_consolidate(entradas, parametros, opcoes):
+    arrecadacao = entradas['reconcile']['arrecadacao']
+    inadimplencia = entradas['reconcile']['inadimplencia']
+    pib = entradas['pib']['pib']
+
+    # Merge dos Dataframes Arrecadação, Inadimplência e PIB pela chave (código do IBGE) usada na consistência
+    chaves = {nome: chave_axi(base, ['Codigo_IBGE']) for nome, base in
+              [('Arrecadacao', arrecadacao), ('Inadimplencia', inadimplencia), ('PIB', pib)]}
+    base_axi = consolida_axi(arrecadacao, inadimplencia, (chaves['Arrecadacao'], chaves['Inadimplencia']))
+    base_final = consolida_axi(base_axi, pib, (base_axi.index, chaves['PIB']))
+    aplica_esquema(base_final, 'Base Final Consolidada')
+    base_final.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
+
+    # Código do IBGE como última coluna, preservando a posição das colunas já utilizadas pelas análises
+    base_final = base_final[[coluna for coluna in base_final.columns if coluna != 'Codigo_IBGE'] + ['Codigo_IBGE']]
     descreve_df(base_final, 'Base Final Consolidada')
 
     base_final.to_excel('base_consolidada.xlsx')
+    return {'base_final': base_final}
 
 
 def descreve_df(df, tema):
+    '''
+        Descrição e consistência de qualidade do DataFrame a partir do perfil calculado por perfil_df:
+        registros duplicados, valores NaN e Strings vazias (interrompe a carga) e resumo por coluna.
+        No modo silencioso a amostra e o resumo por coluna não são impressos.
+    '''
+    relatorio = perfil_df(df, tema)
+    silencioso = configuracao['silencioso']
+
     print('-' * 60)
     print('Dataframe: ', tema)
     print('-' * 60)
-    print('Registros: ', df.shape[0], 'Colunas: ', df.shape[1])
-    print('-' * 60)
-    print('Amostra (5 primeiras linhas):')
-    print('-' * 60)
-    print(df.head())
+    print('Registros: ', relatorio['registros'], 'Colunas: ', relatorio['colunas'])
     print('-' * 60)
+    if not silencioso:
+        print('Amostra (5 primeiras linhas):')
+        print('-' * 60)
+        print(df.head())
+        print('-' * 60)
     # Verifica se há duplicatas no DataFrame
-    duplicados = df[df.duplicated()]
-    if duplicados.empty:
+    if relatorio['duplicados'] == 0:
         print('Não há registros duplicados.')
     else:
-        print('Registros duplicados: ', duplicados.shape[0])
+        print('Registros duplicados: ', relatorio['duplicados'])
     print('-' * 60)
     # Verifica colunas com valor ausente e strings vazias
-    posicoes_NaN = np.where(pd.isnull(df))
-    vazio_NaN = (np.any(posicoes_NaN[0])) and (np.any(posicoes_NaN[1]))
-
-    posicoes_string_vazias = np.where(df.applymap(lambda x: x == ''))
-    vazio_str_vz = (np.any(posicoes_string_vazias[0])) and (np.any(posicoes_string_vazias[1]))
-
-    if (vazio_NaN == False) and (vazio_str_vz == False):
+    if relatorio['nulos'] == 0 and relatorio['vazios'] == 0:
         print('Não há valores vazios (NaN ou Strings vazias).')
     else:
-        if vazio_NaN:
-            print('Alerta - Verifique, há valores NaN!')
-        if vazio_str_vz:
-            print('Alerta - Verifique, há Strings vazias!')
+        if relatorio['nulos']:
+            print('Alerta - Verifique, há valores NaN!', relatorio['nulos'])
+        if relatorio['vazios']:
+            print('Alerta - Verifique, há Strings vazias!', relatorio['vazios'])
+        print(tabela_perfil(relatorio)[['nulos', 'vazios']])
         exit()
-    print('-' * 60)
-    print(df.describe())
+    if not silencioso:
+        print('-' * 60)
+        print(tabela_perfil(relatorio))
+    return relatorio
 
 
-def carga_estados():
+@instrumenta()
+def carga_estados(fonte='tabela', atualizar=False):
     '''
-        Carga dos Estados a partir do sítio da ISO.
-        Tratamento da Sigla BR-XX.
+        Carga dos Estados a partir do registro de Estados (registro_estados.py).
+        Fonte padrão: tabela versionada estados_br.csv (sem acesso à Internet).
+        Fontes alternativas com cache em disco: 'dtb' (arquivo do IBGE) e 'iso' (sítio da ISO).
         Tratamento de duplicidade.
     '''
-    sitio = 'https://www.iso.org/obp/ui/#iso:code:3166:BR'
-    session = HTMLSession()
-
-    pagina = session.get(sitio)
-    pagina.html.render(sleep=2, timeout=45)
-
-    # Testa se a carga da página web ocorreu com sucesso, caso contrário avisa o usuário e retorna sem dados.
-    if pagina.status_code != 200:
-        print(f'Erro ao carregar a página da ISO, código {pagina.status_code}')
-        estados_vazio = pd.DataFrame()
-        return estados_vazio
-    
-    # Carrega a tabela html, pandas executa a leitura e os campos de Sigla e nome do Estado são renomeados.
-    tabela = pagina.html.find('.tablesorter', first=True).html
-    estados_cheia = pd.read_html(tabela)
-    estados_cheia[0].rename({'3166-2 code':'Sigla', 'Subdivision name':'Estado'}, axis=1, inplace=True)
-
-    # Copia o nome de Estado e a Sigla, converte para string e retira a entrada BR- da Sigla
-    estados = estados_cheia[0][['Estado', 'Sigla']].copy()
-    estados = estados.convert_dtypes()
-    estados["Sigla"] = estados["Sigla"].str.slice(3,5)
-    estados["Estado"] = estados["Estado"].str.upper()
+    estados = registro_estados(fonte, atualizar)[['Estado', 'Sigla']].copy()
+    aplica_esquema(estados, 'Estados')
 
     # Descreve o DataFrame estados
     descreve_df(estados, 'Estados')
@@ -133,21 +189,24 @@ def carga_estados():
     return estados
 
 
+@instrumenta()
 def carga_municipios():
     '''
         Carga dos Municípios a partir de arquivo do sítio do IBGE.
-        Renomeio das colunas.
+        Renomeio das colunas; o código do Município (7 dígitos) é mantido como inteiro em Codigo_IBGE.
         Tratamento de duplicidade.
         Ajuste da grafia de Municípios ('-' e RN)
+        Tipos das colunas conforme o esquema (esquema.py).
     '''        
     # Variáveis que definem o nome do arquivo a ser carregado e as colunas que serão selecionadas.
-    arquivo = "RELATORIO_DTB_BRASIL_MUNICIPIO.xls"
-    colunas = [1,12]
+    arquivo = ARQ_MUNICIPIOS
+    colunas = [1,11,12]
     cabecalho = 6
 
-    # Executa a leitura do arquivo Excel, renomeia colunas Estado e Nome do Município e as coloca em caixa alta
-    municipios = pd.read_excel(arquivo, usecols=colunas, header=cabecalho)
-    municipios.rename({'Nome_UF':'Estado', 'Nome_Município':'Municipio'}, axis=1, inplace=True)
+    # Executa a leitura do arquivo Excel (ou do cache colunar), renomeia colunas Estado e Nome do Município e as coloca em caixa alta
+    municipios = le_excel(arquivo, usecols=colunas, header=cabecalho)
+    municipios.rename({'Nome_UF':'Estado', 'Código Município Completo':'Codigo_IBGE', 'Nome_Município':'Municipio'}, axis=1, inplace=True)
+    municipios['Codigo_IBGE'] = municipios['Codigo_IBGE'].astype('int64')
     municipios["Estado"] = municipios["Estado"].str.upper()
     municipios["Municipio"] = municipios["Municipio"].str.upper()
 
@@ -156,6 +215,7 @@ def carga_municipios():
 
     # Ajuste dos Municípios
     ajuste_municipios(municipios)
+    aplica_esquema(municipios, 'Município')
 
     # Retorna os Municípios sem duplicidade.
     return(municipios)
@@ -169,97 +229,167 @@ def limpa_duplicados(df):
     return df
 
 
+@instrumenta()
 def carga_mei(periodo):
-    ''''
-        Carga da Arrecadação de 2020 a partir da planilha do sítio Simples Nacional.
-        Definição dos parâmetros a serem carregados da planilha.
-        Carga da planilha a partir dos parâmetros para Dataframe mei.
-        Cópia dos dados relevantes para novo dataframe arrecadação e conversão para string dos campos texto.
-        Consolidação dos impostos municipais, estaduais e federais em uma única coluna.
-    '''
-    # Definição do DataFrame arrecadação que será retornado.
-    arrecadacao = pd.DataFrame()
-
-    # Dados a serem carregados, carga e conversão do tipo objeto para string
-    arquivo="arrecadacao-do-mei-por-municipio-2015-a-2020.xlsx"
-    planilha="2018-2020"
-    cabecalhos=[2,3]
-    
-    mei = pd.read_excel(arquivo, sheet_name=planilha, header=cabecalhos)
-    mei = mei.convert_dtypes()
+    '''
+        Carga da Arrecadação dos anos do período a partir da planilha do sítio Simples Nacional.
+        Retorna uma coluna arrec_<ano> por ano do período (formato da base consolidada).
+    '''
+    painel = painel_mei(periodo)
+    arrecadacao = pivota_painel(painel, ['Estado', 'Sigla', 'Municipio'])
+    aplica_esquema(arrecadacao, 'Arrecadação')
+    arrecadacao.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
+    return arrecadacao
+
+
+def painel_mei(periodo):
+    '''
+        Painel longo (Município x Ano x Métrica) da Arrecadação dos MEI.
+        Seleção das planilhas que contêm os anos do período (2015-2017 e/ou 2018-2020), lidas uma única vez.
+        Consolidação dos impostos municipais, estaduais e federais (ICMS, ISS e INSS) na métrica arrec,
+        para todos os anos em uma única passagem vetorizada por planilha.
+    '''
+    # Dados a serem carregados
+    arquivo = ARQ_MEI
+    cabecalhos = [2,3]
+    tributos = ['ICMS - Simples Nacional - MEI', 'ISS - Simples Nacional - MEI', 'INSS - SImples Nacional - MEI']
+    anos = [str(ano) for ano in periodo]
+
+    # Planilhas nomeadas pela faixa de anos (ex.: 2018-2020) que contêm algum ano do período
+    planilhas_selecionadas = []
+    for planilha in nomes_planilhas(arquivo):
+        m = re.fullmatch(r'(\d{4})-(\d{4})', planilha)
+        if m and any(int(m.group(1)) <= int(ano) <= int(m.group(2)) for ano in anos):
+            planilhas_selecionadas.append(planilha)
+    planilhas = le_excel(arquivo, sheet_name=planilhas_selecionadas, header=cabecalhos)
+
+    partes = []
+    for mei in planilhas.values():
+        anos_planilha = [ano for ano in anos if ano in mei.columns.get_level_values(0)]
+        if not anos_planilha:
+            continue
+        # Soma dos tributos de cada ano (ausência de qualquer tributo resulta em valor ausente)
+        valores = mei.loc[:, pd.IndexSlice[anos_planilha, tributos]].astype('float64')
+        totais = valores.T.groupby(level=0, sort=False).sum(min_count=len(tributos)).T
+        totais[['Estado', 'Sigla', 'Municipio']] = mei[['ESTADO', 'UF', 'MUNICÍPIO']].to_numpy()
+        partes.append(totais.melt(id_vars=['Estado', 'Sigla', 'Municipio'], var_name='Ano', value_name='Valor'))
+    painel = pd.concat(partes, ignore_index=True)
+    painel['Ano'] = painel['Ano'].astype('int64')
+    painel['Metrica'] = 'arrec'
 
     # Tratamento para remover a Sigla do Estado do campo Município e convertê-lo para Caixa Alta.
-    arrecadacao[['Estado', 'Sigla', 'Municipio']] = mei[['ESTADO', 'UF', 'MUNICÍPIO']]
-    arrecadacao["Municipio"] = arrecadacao["Municipio"].str.slice(0, -5)
-    arrecadacao["Municipio"] = arrecadacao["Municipio"].str.upper()
+    painel["Municipio"] = painel["Municipio"].str.slice(0, -5).str.upper()
 
     # Ajuste dos nomes dos Municípios
-    ajuste_municipios(arrecadacao)
-    
-    # Consolidação dos impostos
-    for ano in periodo:
-        arrecadacao['arrec_' + ano] = mei[ano]["ICMS - Simples Nacional - MEI"] + mei[ano]["ISS - Simples Nacional - MEI"] + mei[ano]["INSS - SImples Nacional - MEI"]
-    arrecadacao.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
-    return arrecadacao
+    ajuste_municipios(painel)
+    return painel[['Estado', 'Sigla', 'Municipio', 'Ano', 'Metrica', 'Valor']]
 
 
+@instrumenta()
 def carga_pib(arquivo_pib, cabecalho, colunas, periodo):
-    ''''
+    '''
         Carga dos dados do PIB definido pelo período a partir da planilha do sítio do IBGE.
         Parâmetros a serem carregados da planilha são passados na função.
-        Cópia dos dados relevantes para novo dataframe pib e conversão para string dos campos objeto.
+        Período de um ano mantém os nomes das colunas (PIB, PIB_pc, ...); vários anos -> <coluna>_<ano>.
+    '''
+    painel = painel_pib(arquivo_pib, cabecalho, colunas, periodo)
+    pib = pivota_painel(painel, ['Sigla', 'Estado', 'Municipio', 'Codigo_IBGE'], sufixo_ano=len(periodo) > 1)
+    aplica_esquema(pib, 'PIB')
+    return pib
+
+
+def painel_pib(arquivo_pib, cabecalho, colunas, periodo):
+    '''
+        Painel longo (Município x Ano x Métrica) do PIB dos Municípios.
+        A planilha é lida uma única vez e os anos do período são filtrados em uma única operação (isin).
     '''
-    # Definição do DataFrame do PIB que será retornado.
+    metricas = ['Valor_ab_agro', 'Valor_ab_indu', 'Valor_ab_serv', 'Valor_ab_publ','Valor_abt', 'Impostos', 'PIB', 'PIB_pc']
+
+    pib_plan = le_excel(arquivo_pib, sheet_name=0, header=cabecalho, usecols=colunas)
+
+    # Mantém somente os anos do parâmetro período
+    pib_plan = pib_plan[pib_plan['Ano'].isin([int(ano) for ano in periodo])]
+
+    # Renomear as colunas
     pib = pd.DataFrame()
+    pib[['Ano', 'Sigla', 'Estado', 'Codigo_IBGE', 'Municipio'] + metricas] = pib_plan[['Ano', 'Sigla da Unidade da Federação', 'Nome da Unidade da Federação', 'Código do Município', 'Nome do Município', 'Valor adicionado bruto da Agropecuária, \na preços correntes\n(R$ 1.000)', 'Valor adicionado bruto da Indústria,\na preços correntes\n(R$ 1.000)', 'Valor adicionado bruto dos Serviços,\na preços correntes \n- exceto Administração, defesa, educação e saúde públicas e seguridade social\n(R$ 1.000)', 'Valor adicionado bruto da Administração, defesa, educação e saúde públicas e seguridade social, \na preços correntes\n(R$ 1.000)', 'Valor adicionado bruto total, \na preços correntes\n(R$ 1.000)', 'Impostos, líquidos de subsídios, sobre produtos, \na preços correntes\n(R$ 1.000)', 'Produto Interno Bruto, \na preços correntes\n(R$ 1.000)', 'Produto Interno Bruto per capita, \na preços correntes\n(R$ 1,00)']].to_numpy()
 
-    pib_plan = pd.read_excel(arquivo_pib, sheet_name=0, header=cabecalho, usecols=colunas)
-
-    # Elimina os anos diferentes do parâmetro período, elimina a coluna Ano
-    for ano in periodo:
-        pib_plan.drop(pib_plan[pib_plan['Ano'] != int(ano)].index, inplace = True)
-    pib_plan.drop(columns=['Ano'])
-    pib_plan.reset_index(drop=True, inplace=True)
-    
-    # Renomear as colunas e conversão de objetos para tipos de dados
-    pib[['Sigla', 'Estado', 'Municipio', 'Valor_ab_agro', 'Valor_ab_indu', 'Valor_ab_serv', 'Valor_ab_publ','Valor_abt', 'Impostos', 'PIB', 'PIB_pc']] = pib_plan[['Sigla da Unidade da Federação', 'Nome da Unidade da Federação', 'Nome do Município', 'Valor adicionado bruto da Agropecuária, \na preços correntes\n(R$ 1.000)', 'Valor adicionado bruto da Indústria,\na preços correntes\n(R$ 1.000)', 'Valor adicionado bruto dos Serviços,\na preços correntes \n- exceto Administração, defesa, educação e saúde públicas e seguridade social\n(R$ 1.000)', 'Valor adicionado bruto da Administração, defesa, educação e saúde públicas e seguridade social, \na preços correntes\n(R$ 1.000)', 'Valor adicionado bruto total, \na preços correntes\n(R$ 1.000)', 'Impostos, líquidos de subsídios, sobre produtos, \na preços correntes\n(R$ 1.000)', 'Produto Interno Bruto, \na preços correntes\n(R$ 1.000)', 'Produto Interno Bruto per capita, \na preços correntes\n(R$ 1,00)']]
-    pib = pib.convert_dtypes()
-    
-    # Colunas Estado e Município convertidas em caixa alta
+    # Colunas Estado e Município convertidas em caixa alta, código do Município como inteiro
+    pib['Codigo_IBGE'] = pib['Codigo_IBGE'].astype('int64')
     pib["Estado"] = pib["Estado"].str.upper()
     pib["Municipio"] = pib["Municipio"].str.upper()
 
-    # Ajuste de valor nas colunas 'Valor_abt', 'Impostos', 'PIB' (x 1000) - retorna a unidade R$ 1,00
-    pib['Valor_ab_agro'] = pib['Valor_ab_agro'] * 1000
-    pib['Valor_ab_indu'] = pib['Valor_ab_indu'] * 1000
-    pib['Valor_ab_serv'] = pib['Valor_ab_serv'] * 1000
-    pib['Valor_ab_publ'] = pib['Valor_ab_publ'] * 1000
-    pib['Valor_abt'] = pib['Valor_abt'] * 1000
-    pib['Impostos'] = pib['Impostos'] * 1000
-    pib['PIB'] = pib['PIB'] * 1000
+    # Ajuste de valor nas colunas em R$ 1.000 (x 1000) - retorna a unidade R$ 1,00 (PIB_pc já está em R$ 1,00)
+    pib[metricas] = pib[metricas].astype('float64')
+    pib[metricas[:-1]] = pib[metricas[:-1]] * 1000
 
     # Ajuste dos nomes dos Municípios -> Acentuação, traço, de, da(s), do(s) e 2 municípios do RN:
     ajuste_municipios(pib)
 
-    return pib
+    painel = pib.melt(id_vars=['Sigla', 'Estado', 'Municipio', 'Codigo_IBGE', 'Ano'], value_vars=metricas, var_name='Metrica', value_name='Valor')
+    painel['Ano'] = painel['Ano'].astype('int64')
+    return painel[['Sigla', 'Estado', 'Municipio', 'Codigo_IBGE', 'Ano', 'Metrica', 'Valor']]
 
 
-def carga_inad(estados):
+def pivota_painel(painel, colunas_id, sufixo_ano=True):
+    '''
+        Conversão do painel longo (Município x Ano x Métrica) para o formato da base consolidada:
+        uma linha por Município e uma coluna <Metrica>_<Ano> (ex.: arrec_2020, inad_2020),
+        ou somente <Metrica> se sufixo_ano=False (período de um único ano).
+        As colunas seguem a ordem das métricas no painel e a ordem crescente dos anos.
+    '''
+    metricas = list(pd.unique(painel['Metrica']))
+    anos = sorted(pd.unique(painel['Ano']))
+
+    largo = painel.set_index(colunas_id + ['Metrica', 'Ano'])['Valor'].unstack(['Metrica', 'Ano'])
+    largo = largo.reindex(columns=pd.MultiIndex.from_product([metricas, anos]))
+    if sufixo_ano:
+        largo.columns = [metrica + '_' + str(ano) for metrica, ano in largo.columns]
+    else:
+        largo.columns = largo.columns.get_level_values(0)
+    largo.reset_index(inplace=True)
+    largo.columns.name = None
+    return largo
+
+
+@instrumenta()
+def carga_inad(estados, periodo=None, workers=1, incremental=False):
     '''
         Carga das planilhas de Inadimplência.
-        Ano de 2020, meses de Janeiro a Dezembro, totalizando 12 planilhas.
+        Anos do período (todos os anos disponíveis se None), meses de Janeiro a Dezembro de cada ano.
+        Leitura paralela das planilhas mensais com workers > 1 processos.
+        Modo incremental: somente as planilhas mensais ainda não ingeridas (ou com conteúdo alterado) são lidas (atualizacao_inad.py).
         Consistência de quantidade e posição indexada de Estados e Municípios.
+        Retorna uma coluna inad_<ano> por ano fiscal (formato da base consolidada).
     '''
-    # Dados a serem carregados
+    painel = painel_inad(estados, periodo, workers, incremental)
+    totalizacao = pivota_painel(painel[painel['Metrica'] == 'inad'], ['Municipio', 'Sigla'])
+    aplica_esquema(totalizacao, 'Inadimplência')
+    return totalizacao
+
+
+def painel_inad(estados, periodo=None, workers=1, incremental=False):
+    '''
+        Painel longo (Município x Ano x Métrica) da Inadimplência: DAS, Optantes e inad (DAS / Optantes).
+        Planilhas mensais dos anos selecionados normalizadas uma a uma (em paralelo se workers > 1,
+        com resultado na ordem das planilhas) e empilhadas para a totalização anual em uma única operação (groupby).
+        No modo incremental as planilhas já ingeridas e os totais dos anos sem planilhas novas são
+        reaproveitados do manifesto; somente os anos afetados são totalizados novamente.
+    '''
+    # Dados a serem carregados: arquivo mensal mais recente publicado pela RFB
     # arquivo = 'Índice Inadimplência MEI  10.2022.ods'
-    # anos = '(.*)(20[1][8-9]|2020)' # Variável a ser usada como Expressão Regular para seleção dos anos.
-    arquivo = 'InadimplenciaMEI102022.xlsx'
-    anos = '(.*)2020'               # Variável a ser usada como Expressão Regular para seleção dos anos.
-    planilhas = pd.DataFrame        # Dicionário de DataFrames carregados dos anos selecionados.
+    arquivo = atualizacao_inad.arquivo_inad() or ARQ_INAD
+    planilhas = {}                  # Dicionário de DataFrames normalizados dos anos selecionados.
     cabecalho = 1                   # Título das colunas encontra-se na linha 2 de cada planilha.
     colunas = "A:C"                 # Municípios/UF, DAS Pagos xx/yyyy e Optantes xx/yyyy.
-    planilhas_selecionadas = []     # Relação dos nomes das planilhas selecionadas para carga (jan/2018 a dez/2020).
+    planilhas_selecionadas = []     # Relação dos nomes das planilhas selecionadas para carga (ex.: jan/2018 a dez/2020).
     est_brasileiros = 27            # Quantidade de estados brasileiros, uso para consistência da quantidade de estados.
-    plan_cons = 'Janeiro_2020'      # Planilha usada como base para consistência
+
+    # Expressão Regular para seleção dos anos (ex.: Janeiro_2020); sem período, todos os anos disponíveis
+    if periodo:
+        anos = '(.*)(' + '|'.join(str(ano) for ano in periodo) + ')'
+    else:
+        anos = '(.*)(20[0-9][0-9])'
 
     # Consistência da quantidade de Estados
     qtd_estados = len(estados)
@@ -268,280 +398,360 @@ def carga_inad(estados):
     if not (qtd_estados == est_brasileiros and est_unicos == est_brasileiros):
         print('*** Atenção **** Base de Estados está inconsistente!!')
 
-    # Carga das planilhas de Inadimplência dos anos selecionados por regex
-    planilhas_excel = pd.ExcelFile(arquivo)
-    for planilha in planilhas_excel.sheet_names:
+    # Seleção das planilhas de Inadimplência dos anos selecionados por regex
+    for planilha in nomes_planilhas(arquivo):
         m = re.compile('%s' % (anos)).search(planilha)
         if (m):
             planilhas_selecionadas.append(planilha)
-    planilhas = pd.read_excel(arquivo, sheet_name=planilhas_selecionadas, header=cabecalho, usecols=colunas)
-
-    # Filtrar somente os Estados das planilhas mensais de Inadimplência da coluna Municípios/UF
-    estados_filtrados = {}
+    plan_cons = planilhas_selecionadas[0]   # Planilha usada como base para consistência
+    siglas = list(estados['Sigla'])
+
+    if incremental and not atualizacao_inad.disponivel():
+        print('*** Atenção **** Carga incremental indisponível sem pyarrow, todas as planilhas serão lidas.')
+        incremental = False
+
+    # Leitura e normalização das planilhas (no modo incremental, somente as ainda não ingeridas)
+    if incremental:
+        manifesto = atualizacao_inad.carrega_manifesto()
+        pendentes = atualizacao_inad.planilhas_pendentes(manifesto, planilhas_selecionadas, arquivo)
+        print('Inadimplência - planilhas novas ou alteradas:', len(pendentes), 'de', len(planilhas_selecionadas))
+        for planilha, (normalizada, blocos) in zip(pendentes, le_planilhas_inad(arquivo, pendentes, cabecalho, colunas, siglas, workers)):
+            atualizacao_inad.registra_planilha(manifesto, arquivo, planilha, normalizada, blocos)
+        atualizacao_inad.grava_manifesto(manifesto)
+        resultados = [atualizacao_inad.carrega_planilha(planilha) for planilha in planilhas_selecionadas]
+    else:
+        resultados = le_planilhas_inad(arquivo, planilhas_selecionadas, cabecalho, colunas, siglas, workers)
 
-    for planilha in planilhas.keys():
-        planilha_analisada = planilhas.get(planilha)
-        resultado = pd.DataFrame(columns=(planilha_analisada.columns))
-        for sigla in estados['Sigla']:
-            resultado = pd.concat([resultado, (planilha_analisada[planilha_analisada['Municípios/UF'].str.fullmatch(sigla)])])
-        resultado.rename({'Municípios/UF':'Sigla'}, axis=1, inplace=True)
-        coluna_selecionada = resultado[['Sigla']]
-        est_ordenado = coluna_selecionada.sort_index()
-        estados_filtrados[planilha] = est_ordenado
+    # Blocos de Estado (linha de cabeçalho, início e fim dos Municípios) detectados na normalização de cada planilha
+    blocos_estados = {}
+    for planilha, (normalizada, blocos) in zip(planilhas_selecionadas, resultados):
+        planilhas[planilha] = normalizada
+        blocos_estados[planilha] = blocos
 
     # Consistência da quantidade de estados das planilhas carregadas
     divergencias = {}   # Armazena as divergências que as planilhas podem apresentar.
 
-    for planilha in estados_filtrados.keys():
-        plan_analisada = estados_filtrados.get(planilha)
-        qtd_plan = len(plan_analisada)
-        est_uni_plan = plan_analisada['Sigla'].nunique()
-        if qtd_plan != est_brasileiros or est_uni_plan != est_brasileiros:
-            if qtd_plan != est_brasileiros:
-                divergencias[planilha] = [planilha, ('Nº de estados não conforme: ' + str(qtd_plan))]
-            if est_uni_plan != est_brasileiros:
-                divergencias[planilha + 'unique'] = [planilha, ('Nº de estados não únicos: ' + str(est_uni_plan))]
+    for planilha, blocos in blocos_estados.items():
+        qtd_plan = len(blocos)
+        est_uni_plan = blocos['Sigla'].nunique()
+        if qtd_plan != est_brasileiros:
+            divergencias[planilha] = [planilha, ('Nº de estados não conforme: ' + str(qtd_plan))]
+        if est_uni_plan != est_brasileiros:
+            divergencias[planilha + 'unique'] = [planilha, ('Nº de estados não únicos: ' + str(est_uni_plan))]
     if bool(divergencias):
         print('*** Atenção **** Base de Inadimplência está inconsistente pela quantidade de estados!!')
         print(divergencias)
 
-    # Consistência da posição indexada de Estados nas planilhas de Inadimplência
+    # Consistência da posição indexada de Estados (linha e tamanho de cada bloco) nas planilhas de Inadimplência
     est_consistencia = {}
-    for planilha in estados_filtrados.keys():
-        if not (estados_filtrados[plan_cons].compare(estados_filtrados[planilha]).empty):
+    for planilha, blocos in blocos_estados.items():
+        if not blocos_estados[plan_cons].equals(blocos):
             est_consistencia[planilha] = 'Inconsistente'
     if bool(est_consistencia):
         print('*** Atenção **** Há divergência na posição indexada de Estados nas planilhas de inadimplência!!')
         print(est_consistencia)
 
-    # Insere a coluna Sigla em cada planilha mensal para preenchimento da sigla do respectivo Estado
-    for planilha in planilhas.keys():
-        planilhas[planilha]['Sigla'] = None
-        planilhas[planilha].rename({'Municípios/UF':'Municipio'}, axis=1, inplace=True)
-        for indice in planilhas[planilha].index:
-            if planilhas[planilha]['Municipio'][indice] in estados['Sigla'].values:
-                sigla_preenche = planilhas[planilha]['Municipio'][indice]
-            planilhas[planilha].loc[indice, 'Sigla'] = sigla_preenche
-
-    # Eliminando as linhas totalizadoras por Estado, Total Geral e os campos vazios (importados como NaN)
-    # Renomeando as colunas DAS mmaa e Optantes mmaa para DAS e Optantes e convertendo-os para o tipo int
-    lista_estados = list(estados_filtrados[plan_cons].index.values.tolist())
-    lista_estados.append(planilhas[plan_cons].last_valid_index()) # Total Geral
-
-    for planilha in planilhas.keys():
-        planilhas[planilha].drop(index=lista_estados, inplace=True)
-        planilhas[planilha] = planilhas[planilha].fillna(0) # campos vazios (importados como NaN), inserindo 0
-        for coluna in planilhas[planilha].columns:
-            m = re.compile('%s' % ('DAS')).search(coluna)
-            if (m):
-                planilhas[planilha].rename({coluna:'DAS'}, axis=1, inplace=True)
-                planilhas[planilha]['DAS'] = planilhas[planilha]['DAS'].astype('int64')
-            m = re.compile('%s' % ('Optantes')).search(coluna)
-            if (m):
-                planilhas[planilha].rename({coluna:'Optantes'}, axis=1, inplace=True)
-                planilhas[planilha]['Optantes'] = planilhas[planilha]['Optantes'].astype('int64')
-
     # Consistência da posição indexada de Municípios nas planilhas de Inadimplência
+    # (blocos de Estado divergentes já indicam Municípios fora de posição)
     cidades_base = planilhas[plan_cons]['Municipio']
-    plan_consist_munic = []
-    plan_inconsist_munic = {}
-    indices_inconsist_munic = []
 
     for planilha in planilhas.keys():
         cidades_comparar = planilhas[planilha]['Municipio']
-        cid_nconf = cidades_base.compare(cidades_comparar)
-        if (cid_nconf.empty):
-            plan_consist_munic.append(planilha)
-        else:
-            plan_inconsist_munic[planilha] = cid_nconf
-            indices_inconsist_munic.extend(cid_nconf.index.values.tolist())
-            print('Inconsistência no índice de Municípios!')
+        if planilha in est_consistencia or not cidades_base.equals(cidades_comparar):
+            print('Inconsistência no índice de Municípios!', planilha)
             break
 
-    # Totalização por ano e Município
-    anos_fiscais = [2020] # Faixa de anos para consolidação de DAS Pagos, Optantes e cálculo de inadimplência
-    df_temp = pd.DataFrame
-    totalizacao = pd.DataFrame
-
-    # Carga inicial do Dataframe consolidadas
-    df_temp = planilhas[plan_cons][['Municipio', 'Sigla']]
-    totalizacao = df_temp.copy()
-
-    for ano in anos_fiscais:
-        das_ano = 'DAS' + str(ano)
-        optante_ano = 'Optante' + str(ano)
-        inad_ano = 'inad_' + str(ano)
+    # Totalização por ano e Município: DAS Pagos e Optantes de todos os meses do ano e cálculo da inadimplência
+    if incremental:
+        totais = []
+        planilhas_ano = {}
+        for planilha in planilhas:
+            planilhas_ano.setdefault(atualizacao_inad.ano_planilha(planilha), []).append(planilha)
+        for ano, nomes in planilhas_ano.items():
+            total = atualizacao_inad.total_anual(manifesto, ano, nomes)
+            if total is None:
+                # Ano afetado por planilhas novas (ou composição diferente): totalizado novamente
+                total = totaliza_inad({planilha: planilhas[planilha] for planilha in nomes})
+                atualizacao_inad.registra_total(manifesto, ano, nomes, total)
+            totais.append(total)
+        atualizacao_inad.grava_manifesto(manifesto)
+        totalizacao = pd.concat(totais, ignore_index=True)
+    else:
+        totalizacao = totaliza_inad(planilhas)
+    totalizacao['inad'] = totalizacao['DAS'] / totalizacao['Optantes']
 
-        consolida_das = pd.DataFrame    # Captura cada mês e provê o somatório dos DAS pagos no ano
-        consolida_opt = pd.DataFrame    # Captura cada mês e provê o somatório dos Optantes pelo Simples no ano
-        total_das = pd.DataFrame
-        total_opt = pd.DataFrame
+    # Ajuste de nomes de Municípios e remove acentos
+    # Inclui Passo de Camaragibe - AC (AL) -> Santa Rosa do Purus (AC) - Erro da base original
+    ajuste_municipios(totalizacao)
 
-        consolida_das = df_temp.copy()
-        consolida_opt = df_temp.copy()
+    painel = totalizacao.melt(id_vars=['Sigla', 'Municipio', 'Ano'], value_vars=['DAS', 'Optantes', 'inad'], var_name='Metrica', value_name='Valor')
+    return painel[['Sigla', 'Municipio', 'Ano', 'Metrica', 'Valor']]
 
-        for planilha in planilhas.keys():
-            m = re.compile('%s' % (ano)).search(planilha)
-            if (m):
-                df_plan_temp = pd.DataFrame
 
-                df_plan_temp = planilhas[planilha]['DAS']
-                df_plan_temp = df_plan_temp.to_frame(planilha)
-                consolida_das = consolida_das.join(df_plan_temp)
+def le_planilhas_inad(arquivo, planilhas, cabecalho, colunas, siglas, workers=1):
+    # Leitura e normalização das planilhas: um processo por planilha (workers > 1) ou leitura única do arquivo
+    if not planilhas:
+        return []
+    if workers > 1:
+        # Hash do arquivo calculado uma única vez aqui e repassado aos processos (cache de cada planilha)
+        hash_arquivo = hash_conteudo(arquivo)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(le_planilha_inad, repeat(arquivo), planilhas,
+                                     repeat(cabecalho), repeat(colunas), repeat(siglas), repeat(hash_arquivo)))
+    lidas = le_excel(arquivo, sheet_name=planilhas, header=cabecalho, usecols=colunas)
+    return [normaliza_planilha_inad(lidas[planilha], siglas) for planilha in planilhas]
 
-                df_plan_temp = planilhas[planilha]['Optantes']
-                df_plan_temp = df_plan_temp.to_frame(planilha)
-                consolida_opt = consolida_opt.join(df_plan_temp)
 
-        consolida_das[das_ano] = consolida_das.sum(axis=1, numeric_only=True)
-        total_das = consolida_das[das_ano]
-        total_das = total_das.to_frame(das_ano)
+def totaliza_inad(planilhas):
+    # Soma de DAS Pagos e Optantes por Sigla, Município e Ano das planilhas mensais normalizadas
+    mensal = pd.concat(planilhas, names=['Planilha', 'indice'])
+    mensal.reset_index(level='Planilha', inplace=True)
+    mensal['Ano'] = mensal['Planilha'].str.extract(r'(20[0-9][0-9])', expand=False).astype('int64')
+    mensal['Sigla'] = mensal['Sigla'].astype(str)
 
-        consolida_opt[optante_ano] = consolida_opt.sum(axis=1, numeric_only=True)
-        total_opt = consolida_opt[optante_ano]
-        total_opt = total_opt.to_frame(optante_ano)
+    totalizacao = mensal.groupby(['Sigla', 'Municipio', 'Ano'], sort=False)[['DAS', 'Optantes']].sum()
+    return totalizacao.reset_index()
 
-        totalizacao[inad_ano] = total_das[das_ano] / total_opt[optante_ano]
 
-    # Altera a entrada de Passo de Camaragibe - AC (AL) para Santa Rosa do Purus (AC) - Erro da base original
-    totalizacao.loc[(totalizacao['Municipio'] == 'PASSO DE CAMARAGIBE') & (totalizacao['Sigla'] == 'AC'), 'Municipio'] = 'SANTA ROSA DO PURUS'
-
-    # Ajuste de nomes de Municípios e remove acentos
-    ajuste_municipios(totalizacao)
-    return(totalizacao)
+def le_planilha_inad(arquivo, planilha, cabecalho, colunas, siglas, hash_arquivo=None):
+    # Leitura e normalização de uma planilha mensal (executada em processo separado no modo paralelo)
+    dados = le_excel(arquivo, sheet_name=planilha, header=cabecalho, usecols=colunas, hash_arquivo=hash_arquivo)
+    return normaliza_planilha_inad(dados, siglas)
 
 
-def consist_axi(municipios, arrec, inadi, pib):
+@instrumenta()
+def normaliza_planilha_inad(dados, siglas):
     '''
-        Função destinada a consistir as posições das cidades nas tabelas de Arrecadação, Inadimplência
-        e PIB contra a tabela de Municípios do IBGE.
+        Normalização de uma planilha mensal de Inadimplência.
+        Preenchimento vetorizado da Sigla (forward-fill a partir da linha de cabeçalho de cada Estado) e
+        eliminação das linhas totalizadoras por Estado, Total Geral e dos campos vazios (importados como NaN).
+        Renomeio das colunas DAS mmaa e Optantes mmaa para DAS e Optantes (int32, conforme o esquema).
+        Retorna a planilha compacta (Municipio, Sigla, DAS, Optantes) e os blocos de Estado da planilha.
     '''
-    munic_aux = pd.DataFrame
-    arrec_aux = pd.DataFrame
-    inadi_aux = pd.DataFrame
-    pib_aux = pd.DataFrame
-
-    munic_fil = pd.DataFrame
-    arrec_fil = pd.DataFrame
-    inadi_fil = pd.DataFrame
-    pib_fil = pd.DataFrame
-    
-    arrec_nao_conf = pd.DataFrame
-    inadi_nao_conf = pd.DataFrame
-    pib_nao_conf = pd.DataFrame
-    axi_nao_conf = pd.DataFrame
+    dados = dados.rename({'Municípios/UF':'Municipio'}, axis=1)
+    mascara, blocos, pos_total = detecta_cabecalhos(dados['Municipio'], siglas)
+
+    # Propaga a Sigla da linha de cabeçalho para os Municípios de cada bloco
+    dados['Sigla'] = dados['Municipio'].where(mascara).ffill()
+
+    # Mantém somente as linhas de Municípios: preenchidas, fora dos cabeçalhos de Estado e antes do Total Geral
+    municipios = (~mascara.to_numpy() & (np.arange(len(dados)) < pos_total)
+                  & dados['Municipio'].notna().to_numpy() & dados['Sigla'].notna().to_numpy())
+    dados = dados[municipios]
+    dados = dados.fillna(0) # campos vazios (importados como NaN), inserindo 0
+    for coluna in dados.columns:
+        m = re.compile('%s' % ('DAS')).search(coluna)
+        if (m):
+            dados = dados.rename({coluna:'DAS'}, axis=1)
+            dados['DAS'] = dados['DAS'].astype(tipo_coluna('DAS'))
+        m = re.compile('%s' % ('Optantes')).search(coluna)
+        if (m):
+            dados = dados.rename({coluna:'Optantes'}, axis=1)
+            dados['Optantes'] = dados['Optantes'].astype(tipo_coluna('Optantes'))
 
-    # Coloca os Municípios em ordem crescente por Sigla e Município    
-    municipios.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
-    arrec.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
-    inadi.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
-    pib.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
+    normalizada = dados[['Municipio', 'Sigla', 'DAS', 'Optantes']].copy()
+    normalizada['Sigla'] = normalizada['Sigla'].astype('category')
+    return normalizada, blocos
 
-    munic_aux = municipios[['Municipio']]
-    arrec_aux = arrec[['Municipio']]
-    inadi_aux = inadi[['Municipio']]
-    pib_aux = pib[['Municipio']]
-    
-    munic_fil = munic_aux.copy()
-    arrec_fil = arrec_aux.copy()
-    inadi_fil = inadi_aux.copy()
-    pib_fil = pib_aux.copy()
 
-    # Encontra a diferença entre o dataframe mestre do IBGE e os demais (Arrecadação, Inadimplência e PIB)
-    arrec_nao_conf = munic_fil.compare(arrec_fil)
-    if not arrec_nao_conf.empty:
-        print('Atenção  --- Não Conforme - Municípios da Arrecadação divergentes em posição da base do IBGE!')
+def detecta_cabecalhos(municipios, siglas):
+    '''
+        Detecção das linhas de cabeçalho de Estado de uma planilha mensal em uma única passagem (isin).
+        Retorna:
+            mascara   -> Series booleana das linhas de Estado;
+            blocos    -> DataFrame indexado pela linha do Estado com Sigla, posição inicial e final dos
+                         Municípios do bloco e quantidade de Municípios;
+            pos_total -> posição da linha Total Geral (última linha preenchida, se o texto não for encontrado).
+    '''
+    mascara = municipios.isin(siglas)
 
-    inadi_nao_conf = munic_fil.compare(inadi_fil)
-    if not inadi_nao_conf.empty:
-        print('Atenção  --- Não Conforme - Municípios da Inadimplência divergentes da base do IBGE!')
+    total_geral = np.flatnonzero(municipios.astype(str).str.strip().str.upper().to_numpy() == 'TOTAL GERAL')
+    if len(total_geral):
+        pos_total = int(total_geral[-1])
+    else:
+        ultima = municipios.last_valid_index()
+        pos_total = municipios.index.get_loc(ultima) if ultima is not None else len(municipios)
 
-    pib_nao_conf = munic_fil.compare(pib_fil)
-    if not pib_nao_conf.empty:
-        print('Atenção  --- Não Conforme - Municípios do PIB divergentes da base do IBGE!')
+    # Blocos: do cabeçalho do Estado até a linha anterior ao próximo cabeçalho (ou ao Total Geral)
+    posicoes = np.flatnonzero(mascara.to_numpy())
+    inicio = posicoes + 1
+    fim = np.append(posicoes[1:], pos_total) - 1
+    blocos = pd.DataFrame({'Sigla': municipios.to_numpy()[posicoes], 'inicio': inicio, 'fim': fim,
+                           'qtd_municipios': fim - inicio + 1}, index=municipios.index[posicoes])
+    return mascara, blocos, pos_total
 
-    axi_nao_conf = arrec_fil.compare(inadi_fil)
-    if not axi_nao_conf.empty:
-        print('Atenção  --- Não Conforme - Municípios da Inadimplência divergentes da base de Arrecadação!')
 
-    return ()
+@instrumenta()
+def consist_axi(municipios, arrec, inadi, pib, chaves=('Sigla', 'Municipio')):
+    '''
+        Função destinada a consistir as cidades nas tabelas de Arrecadação, Inadimplência e PIB contra a
+        tabela de Municípios do IBGE, por chave e não por posição (as bases não são ordenadas nem alteradas).
+        Cada base é indexada pelo hash das colunas-chave (Sigla e Município ou o código do IBGE) e comparada
+        com o IBGE por anti-join em O(n): Municípios ausentes na base, extras na base e chaves duplicadas.
+        Retorna o relatório de divergências e as chaves calculadas, reaproveitadas por consolida_axi.
+    '''
+    chaves = list(chaves)
+    bases = {'Municipios': municipios, 'Arrecadacao': arrec, 'Inadimplencia': inadi, 'PIB': pib}
+    mensagens = {'Arrecadacao': 'Municípios da Arrecadação divergentes da base do IBGE!',
+                 'Inadimplencia': 'Municípios da Inadimplência divergentes da base do IBGE!',
+                 'PIB': 'Municípios do PIB divergentes da base do IBGE!'}
+
+    chaves_bases = {nome: chave_axi(base, chaves) for nome, base in bases.items()}
+    indice_ibge = pd.Index(chaves_bases['Municipios'])
+
+    partes = []
+    for nome, base in bases.items():
+        indice = pd.Index(chaves_bases[nome])
+        duplicados = base[indice.duplicated(keep=False)]
+        partes.append(duplicados[chaves].assign(base=nome, tipo='duplicado'))
+        if nome == 'Municipios':
+            continue
+
+        # Anti-join nos dois sentidos: ausentes na base e extras na base em relação ao IBGE
+        ausentes = municipios[~indice_ibge.isin(indice)]
+        extras = base[~indice.isin(indice_ibge)]
+        partes.append(ausentes[chaves].assign(base=nome, tipo='ausente'))
+        partes.append(extras[chaves].assign(base=nome, tipo='extra'))
+
+        if not (ausentes.empty and extras.empty and duplicados.empty):
+            print('Atenção  --- Não Conforme -', mensagens[nome], 'Ausentes:', len(ausentes),
+                  'Extras:', len(extras), 'Duplicados:', len(duplicados))
+
+    relatorio = pd.concat(partes)
+    relatorio.index.name = 'indice'
+    relatorio.reset_index(inplace=True)
+    relatorio = relatorio[['base', 'tipo', 'indice'] + chaves]
+
+    if not relatorio[relatorio['base'] == 'Municipios'].empty:
+        print('Atenção  --- Não Conforme - Municípios duplicados na base do IBGE!')
+
+    return {'relatorio': relatorio, 'chaves': chaves_bases}
+
+
+def chave_axi(df, chaves=('Sigla', 'Municipio')):
+    # Chave inteira de cada linha, alinhada ao índice do DataFrame: o próprio código do IBGE
+    # (todos resolvidos: código ausente encerra a execução) ou o hash de 64 bits das colunas-chave
+    chaves = list(chaves)
+    if chaves == ['Codigo_IBGE']:
+        ausentes = df['Codigo_IBGE'].isna()
+        if ausentes.any():
+            print('*** Atenção **** Municípios sem código do IBGE na chave:', ausentes.sum())
+            print(df.loc[ausentes, [coluna for coluna in ['Sigla', 'Municipio'] if coluna in df.columns]])
+            exit()
+        return pd.Series(df['Codigo_IBGE'].to_numpy(dtype='int64'), index=df.index, name='chave_axi')
+    valores = df[chaves].astype(str)
+    return pd.Series(pd.util.hash_pandas_object(valores, index=False).to_numpy(), index=df.index, name='chave_axi')
 
 
+@instrumenta()
 def consist_munic_ibge(mun, base_comp, base):
     '''
         DataFrame mun -> IBGE
         DataFrame base para comparação -> geralmente, RFB
-        Atualização dos Municípios divergentes no DataFrame comparado
+        Atualização dos Municípios divergentes no DataFrame comparado a partir da tabela de
+        correspondências retornada por concilia_municipios (uma única atribuição vetorizada).
     '''
-    diverg = pd.DataFrame
-    diverg_aux = pd.DataFrame
+    correspondencias, diverg = concilia_municipios(mun, base_comp)
 
-    df_temp_mun = pd.DataFrame
-    mun_red = pd.DataFrame
-    
-    df_temp_base_comp = pd.DataFrame
-    base_comp_red = pd.DataFrame
+    if not correspondencias.empty:
+        # Coluna categórica: os nomes do IBGE são incluídos nas categorias antes da atribuição
+        base_comp['Municipio'] = inclui_categorias(base_comp['Municipio'], correspondencias['Municipio_ibge'])
+        base_comp.loc[correspondencias['indice'], 'Municipio'] = correspondencias['Municipio_ibge'].values
+        aplica_esquema(base_comp)
 
-    df_temp_mun = mun[['Sigla', 'Estado', 'Municipio']]
-    mun_red = df_temp_mun.copy()
-    df_temp_base_comp = base_comp[['Sigla', 'Estado', 'Municipio']]
-    base_comp_red = df_temp_base_comp.copy()
+    if not diverg.empty:
+        print('Verifique, ainda há divergências entre os Municípios do IBGE e', base)
+        print(diverg)
+        exit()
+    return correspondencias
 
-    diverg = pd.concat([mun_red, base_comp_red], keys=['ibge','compara'], names=['base', 'indice']).drop_duplicates(keep=False)
 
-    if not diverg.empty:
-        diverg.reset_index(drop=False, inplace=True)
-        diverg.drop_duplicates(keep=False, inplace=True)
-
-        diverg_aux = diverg.copy()
-        diverg_aux['Analisada'] = False
-
-        for ind in diverg_aux.index:
-            auxiliar = pd.DataFrame
-            auxiliar = diverg_aux.copy()
-            auxiliar.drop(ind, inplace=True)
-            for aux_ind in auxiliar.index:
-                if((diverg_aux['Analisada'][ind] == False) & (diverg_aux['base'][ind] == 'ibge')):
-                    if ((diverg_aux['Sigla'][ind] == (auxiliar['Sigla'][aux_ind]))):
-                        aproxim = fuzz.ratio(diverg_aux['Municipio'][ind], auxiliar['Municipio'][aux_ind])
-                        if aproxim >= 83:
-                            diverg.drop(ind, inplace=True)
-                            diverg.drop(aux_ind, inplace=True)
-                            diverg_aux.at[ind, 'Analisada'] = True
-                            diverg_aux.at[aux_ind, 'Analisada'] = True
-                            mun_ibge = diverg_aux.iloc[ind]['Municipio']
-                            indice_destino = diverg_aux.iloc[aux_ind]['indice']
-                            base_comp.at[indice_destino, 'Municipio'] = mun_ibge
-                        else:
-                            aproxim_parcial = fuzz.partial_ratio(diverg_aux['Municipio'][ind], auxiliar['Municipio'][aux_ind])
-                            if aproxim_parcial == 100:
-                                diverg.drop(ind, inplace=True)
-                                diverg.drop(aux_ind, inplace=True)
-                                diverg_aux.at[ind, 'Analisada'] = True
-                                diverg_aux.at[aux_ind, 'Analisada'] = True
-                                mun_ibge = diverg_aux.iloc[ind]['Municipio']
-                                indice_destino = diverg_aux.iloc[aux_ind]['indice']
-                                base_comp.at[indice_destino, 'Municipio'] = mun_ibge
-        if not diverg.empty:
-            print('Verifique, ainda há divergências entre os Municípios do IBGE e', base)
-            print(diverg)
-            exit()
-    return()
+@instrumenta()
+def concilia_municipios(mun, base_comp, limiar=83):
+    '''
+        Conciliação dos Municípios divergentes entre o IBGE (mun) e a base comparada, sem alterá-las.
+        Os candidatos são agrupados por Sigla (blocking): em cada Estado, o índice dos nomes do IBGE
+        divergentes é consultado pela chave ordenada do nome e os demais são pontuados em lote
+        (ratio >= limiar ou partial_ratio = 100), com no máximo uma correspondência por Município.
+        Retorna a tabela de correspondências com as pontuações e as divergências remanescentes.
+    '''
+    colunas = ['Sigla', 'Estado', 'Municipio']
+    colunas_corresp = ['Sigla', 'indice', 'Municipio', 'Municipio_ibge', 'ratio', 'partial_ratio']
+
+    # Registros presentes em apenas uma das bases (IBGE ou comparada)
+    mun_red = mun[colunas].drop_duplicates()
+    base_comp_red = base_comp[colunas]
+    chaves_mun = pd.MultiIndex.from_frame(mun_red.astype(object))
+    chaves_comp = pd.MultiIndex.from_frame(base_comp_red.astype(object))
+    diverg_ibge = mun_red[~chaves_mun.isin(chaves_comp)]
+    diverg_comp = base_comp_red[~chaves_comp.isin(chaves_mun)]
+
+    # Índice por Estado dos nomes do IBGE divergentes
+    indice_ibge = {}
+    for sigla, grupo in diverg_ibge.groupby('Sigla', sort=False, observed=True):
+        nomes = grupo['Municipio'].tolist()
+        indice_ibge[sigla] = (nomes, {chave_municipio(nome): nome for nome in nomes})
+
+    correspondencias = []
+    for sigla, grupo in diverg_comp.groupby('Sigla', sort=False, observed=True):
+        if sigla not in indice_ibge:
+            continue
+        nomes_ibge, chaves_ibge = indice_ibge[sigla]
+        nomes_comp = grupo['Municipio'].tolist()
+
+        # Pontuação em lote de todos os pares do bloco (arredondada como no thefuzz)
+        ratio = np.rint(process.cdist(nomes_comp, nomes_ibge, scorer=fuzz.ratio))
+        parcial = np.rint(process.cdist(nomes_comp, nomes_ibge, scorer=fuzz.partial_ratio))
+
+        # Mesma chave ordenada (ex.: palavras em outra ordem) tem prioridade máxima
+        for pos, nome in enumerate(nomes_comp):
+            nome_ibge = chaves_ibge.get(chave_municipio(nome))
+            if nome_ibge is not None:
+                ratio[pos, nomes_ibge.index(nome_ibge)] = 100
+
+        aceitos = (ratio >= limiar) | (parcial == 100)
+        pos_comp, pos_ibge = np.nonzero(aceitos)
+        correspondencias.append(pd.DataFrame({
+            'Sigla': sigla,
+            'indice': grupo.index.values[pos_comp],
+            'Municipio': np.array(nomes_comp, dtype=object)[pos_comp],
+            'Municipio_ibge': np.array(nomes_ibge, dtype=object)[pos_ibge],
+            'ratio': ratio[pos_comp, pos_ibge],
+            'partial_ratio': parcial[pos_comp, pos_ibge],
+        }))
+
+    if correspondencias:
+        # Correspondência única: melhor pontuação primeiro, um par por Município de cada base
+        tabela = pd.concat(correspondencias, ignore_index=True)
+        tabela.sort_values(by=['ratio', 'partial_ratio'], ascending=False, kind='stable', inplace=True)
+        tabela.drop_duplicates(subset='indice', inplace=True)
+        tabela.drop_duplicates(subset=['Sigla', 'Municipio_ibge'], inplace=True)
+        tabela.reset_index(drop=True, inplace=True)
+    else:
+        tabela = pd.DataFrame(columns=colunas_corresp)
 
+    # Divergências remanescentes, no formato base (ibge/compara) e índice de origem
+    conciliados_ibge = pd.MultiIndex.from_frame(tabela[['Sigla', 'Municipio_ibge']].astype(object))
+    chaves_diverg_ibge = pd.MultiIndex.from_frame(diverg_ibge[['Sigla', 'Municipio']].astype(object))
+    restantes_ibge = diverg_ibge[~chaves_diverg_ibge.isin(conciliados_ibge)]
+    restantes_comp = diverg_comp[~diverg_comp.index.isin(tabela['indice'])]
+    diverg = pd.concat([restantes_ibge, restantes_comp], keys=['ibge','compara'], names=['base', 'indice'])
+    diverg.reset_index(drop=False, inplace=True)
 
-def ajuste_municipios(tabela):
-    # Eliminação dos acentos, traços e substituição de DE DA DO por DE
-    tabela['Municipio'] = tabela['Municipio'].apply(remove_acentos)
-    tabela['Municipio'].replace(to_replace=r'-', value=r' ', inplace=True, regex=True)
-    tabela['Municipio'].replace(to_replace=r' D[AEO]S? ', value=r' DE ', inplace=True, regex=True)
+    return tabela, diverg
 
-    # Ajuste nome/grafia de Municípios
-    tabela.loc[tabela['Municipio'] == 'ASSU', 'Municipio'] = 'ACU'
-    tabela.loc[tabela['Municipio'] == 'BOA SAUDE', 'Municipio'] = 'JANUARIO CICCO'
 
+def chave_municipio(nome):
+    # Chave ordenada do nome do Município: palavras em ordem alfabética, sem espaços extras
+    return ' '.join(sorted(str(nome).split()))
+
+
+def ajuste_municipios(tabela):
+    # Eliminação dos acentos, traços e substituição de DE DA DO por DE (uma vez por nome distinto, com cache)
+    tabela['Municipio'] = normaliza_municipios(tabela['Municipio'])
 
-def remove_acentos(a):
-    return unidecode.unidecode(a)
+    # Ajuste nome/grafia de Municípios conforme a tabela ajustes_municipios.csv
+    aplica_ajustes(tabela)
 
 
 def insere_sigla_est_munic(estados, municipios):
@@ -554,9 +764,32 @@ def insere_sigla_est_munic(estados, municipios):
     '''
     est_dic = dict(estados.values)
     municipios['Sigla'] = municipios['Estado'].map(est_dic)
+    aplica_esquema(municipios)
     return municipios
 
 
+def tabela_codigos_ibge(municipios):
+    '''
+        Tabela de resolução Sigla + nome do Município (já normalizado) -> código do IBGE.
+        Montada uma única vez a partir da base de Municípios do IBGE e aplicada às bases sem código.
+    '''
+    codigos = municipios[['Sigla', 'Municipio', 'Codigo_IBGE']].drop_duplicates(subset=['Sigla', 'Municipio'])
+    codigos = codigos.astype({'Sigla': object, 'Municipio': object})
+    return codigos.set_index(['Sigla', 'Municipio'])['Codigo_IBGE']
+
+
+def atribui_codigo_ibge(base, codigos):
+    # Insere a coluna Codigo_IBGE (Int32) a partir da tabela de resolução; Município não resolvido encerra a execução
+    chaves = pd.MultiIndex.from_frame(base[['Sigla', 'Municipio']].astype(object))
+    base['Codigo_IBGE'] = pd.array(codigos.reindex(chaves).to_numpy(), dtype=tipo_coluna('Codigo_IBGE'))
+    nao_resolvidos = base['Codigo_IBGE'].isna()
+    if nao_resolvidos.any():
+        print('*** Atenção **** Municípios sem código do IBGE:', nao_resolvidos.sum())
+        print(base.loc[nao_resolvidos, ['Sigla', 'Municipio']])
+        exit()
+    return base
+
+
 def insere_est_inad(estados, inad):
     '''
         Para cada município, compara a sigla do Estado do DataFrame Estados com a sigla do DataFrame
@@ -570,16 +803,83 @@ def insere_est_inad(estados, inad):
     estados_inv = estados_aux.copy()
     est_dic = dict(estados_inv.values)
     inad['Estado'] = inad['Sigla'].map(est_dic)
-    inad_final = inad[['Estado','Sigla','Municipio','inad_2020']].copy()
+    colunas_inad = [coluna for coluna in inad.columns if coluna.startswith('inad_')]
+    inad_final = inad[['Estado','Sigla','Municipio'] + colunas_inad].copy()
+    aplica_esquema(inad_final)
     inad_final.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
     return inad_final
 
 
-def consolida_axi(arrec_cons, inad_cons):
-    lista_colunas = ['Estado', 'Sigla', 'Municipio']
-    outer_join_df = pd.merge(arrec_cons, inad_cons, on=lista_colunas, how='outer')
+@instrumenta()
+def consolida_axi(arrec_cons, inad_cons, chaves=None):
+    '''
+        Junção (outer join) de duas bases por Estado, Sigla e Município (e código do IBGE, se presente).
+        Com chaves = (chave da primeira base, chave da segunda base), calculadas por consist_axi, a junção
+        é feita pela chave inteira, sem recomparar as colunas texto; o resultado fica indexado pela chave,
+        permitindo encadear novas junções com (resultado.index, chave da próxima base).
+        As chaves de cada base devem ser únicas (junção um para um): chave duplicada encerra a consolidação.
+    '''
+    lista_colunas = [coluna for coluna in ['Estado', 'Sigla', 'Municipio', 'Codigo_IBGE']
+                     if coluna in arrec_cons.columns and coluna in inad_cons.columns]
+    if chaves is None:
+        outer_join_df = pd.merge(arrec_cons, inad_cons, on=lista_colunas, how='outer')
+        return outer_join_df
+
+    esquerda = arrec_cons.set_axis(pd.Index(chaves[0], name='chave_axi'))
+    direita = inad_cons.set_axis(pd.Index(chaves[1], name='chave_axi'))
+    for lado in (esquerda, direita):
+        if not lado.index.is_unique:
+            duplicados = lado[lado.index.duplicated(keep=False)]
+            print('*** Atenção **** Chaves duplicadas na consolidação das bases (junção um para um):', len(duplicados))
+            print(duplicados[lista_colunas])
+            exit()
+    unifica_categorias(esquerda, direita, lista_colunas)
+    outer_join_df = esquerda.join(direita.drop(columns=lista_colunas), how='outer')
+
+    # Municípios presentes somente na segunda base recebem Estado, Sigla e Município da própria base
+    identificacao = direita[lista_colunas]
+    outer_join_df[lista_colunas] = outer_join_df[lista_colunas].combine_first(identificacao)
     return outer_join_df
 
 
+# Etapas da carga: nome -> (dependências, função)
+ETAPAS = {
+    'estados': ([], etapa_estados),
+    'municipios': (['estados'], etapa_municipios),
+    'mei': ([], etapa_mei),
+    'inad': (['estados'], etapa_inad),
+    'pib': ([], etapa_pib),
+    'reconcile': (['municipios', 'mei', 'inad', 'pib'], etapa_reconcile),
+    'consolidate': (['reconcile', 'pib'], etapa_consolidate),
+}
+
+
+def arquivos_etapas(parametros):
+    # Arquivos de entrada lidos por cada etapa (hash do conteúdo gravado com o checkpoint da etapa)
+    estados = [ARQ_ESTADOS] + ([ARQ_MUNICIPIOS] if parametros['fonte_estados'] == 'dtb' else [])
+    return {'estados': estados,
+            'municipios': [ARQ_MUNICIPIOS, ARQ_AJUSTES],
+            'mei': [ARQ_MEI, ARQ_AJUSTES],
+            'inad': [atualizacao_inad.arquivo_inad() or ARQ_INAD, ARQ_AJUSTES],
+            'pib': [parametros['arq_pib'], ARQ_AJUSTES]}
+
+
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Carga e consolidação das bases de Arrecadação, Inadimplência e PIB dos MEI.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Quantidade de processos para leitura das planilhas mensais de Inadimplência (padrão: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Lê somente as planilhas mensais de Inadimplência ainda não ingeridas (manifesto em cache/inad)')
+    parser.add_argument('--silencioso', action='store_true',
+                        help='Não imprime a amostra e o resumo por coluna dos DataFrames (somente consistências)')
+    parser.add_argument('--perfil', metavar='DIRETORIO',
+                        help='Grava o perfil de qualidade (JSON) de cada DataFrame no diretório informado')
+    parser.add_argument('--from-stage', dest='inicio', choices=list(ETAPAS),
+                        help='Reexecuta a etapa e as posteriores, reaproveitando os checkpoints das anteriores')
+    parser.add_argument('--only', dest='somente', choices=list(ETAPAS),
+                        help='Executa somente a etapa, com as dependências lidas dos checkpoints')
+    parser.add_argument('--sequencial', action='store_true',
+                        help='Executa as etapas independentes uma após a outra, no mesmo processo')
+    argumentos = parser.parse_args()
+    configura_perfil(argumentos.silencioso, argumentos.perfil)
+    main(argumentos.workers, argumentos.incremental, argumentos.inicio, argumentos.somente, not argumentos.sequencial)
@@ -0,0 +1,191 @@
+# coding=utf-8
+
+import pandas as pd
+import numpy as np
+import os
+
+from registro_estados import estados_tabela
+
+# Geradores de planilhas sintéticas no leiaute das fontes reais (RFB e IBGE), usadas pelo benchmark.py.
+# Os nomes dos arquivos são os mesmos lidos por carga.py, gerados no diretório indicado.
+ARQ_DTB = 'RELATORIO_DTB_BRASIL_MUNICIPIO.xls'
+ARQ_MEI = 'arrecadacao-do-mei-por-municipio-2015-a-2020.xlsx'
+ARQ_PIB = 'PIB dos Municípios - base de dados 2010-2020.xls'
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+TRIBUTOS = ['ICMS - Simples Nacional - MEI', 'ISS - Simples Nacional - MEI', 'INSS - SImples Nacional - MEI']
+COLUNAS_PIB = {0: 'Ano', 4: 'Sigla da Unidade da Federação', 5: 'Nome da Unidade da Federação', 6: 'Código do Município',
+               7: 'Nome do Município',
+               32: 'Valor adicionado bruto da Agropecuária, \na preços correntes\n(R$ 1.000)',
+               33: 'Valor adicionado bruto da Indústria,\na preços correntes\n(R$ 1.000)',
+               34: 'Valor adicionado bruto dos Serviços,\na preços correntes \n- exceto Administração, defesa, educação e saúde públicas e seguridade social\n(R$ 1.000)',
+               35: 'Valor adicionado bruto da Administração, defesa, educação e saúde públicas e seguridade social, \na preços correntes\n(R$ 1.000)',
+               36: 'Valor adicionado bruto total, \na preços correntes\n(R$ 1.000)',
+               37: 'Impostos, líquidos de subsídios, sobre produtos, \na preços correntes\n(R$ 1.000)',
+               38: 'Produto Interno Bruto, \na preços correntes\n(R$ 1.000)',
+               39: 'Produto Interno Bruto per capita, \na preços correntes\n(R$ 1,00)'}
+SILABAS = ['BA', 'BE', 'BO', 'CA', 'CO', 'CU', 'DA', 'DO', 'FA', 'FE', 'GA', 'GO', 'GUA', 'JA', 'JU', 'LA', 'LI', 'LU',
+           'MA', 'ME', 'MI', 'MO', 'NA', 'NE', 'NO', 'PA', 'PE', 'PI', 'PO', 'RA', 'RE', 'RI', 'RO', 'SA', 'SE', 'SO',
+           'TA', 'TE', 'TI', 'TU', 'VA', 'VI', 'XA', 'ZA', 'ITA', 'IRA', 'ARA', 'UBA', 'POR', 'TAN', 'CAR', 'SAN']
+
+
+def gera_municipios(quantidade=5570, semente=0):
+    '''
+        Tabela sintética de Municípios (Estado, Sigla, Codigo_IBGE e Municipio), distribuídos entre os 27 Estados.
+        Nomes em caixa alta, sem acentos, únicos por Estado e com ao menos 12 caracteres.
+    '''
+    rng = np.random.default_rng(semente)
+    estados = estados_tabela()
+    posicao_estado = np.arange(quantidade) % len(estados)
+
+    nomes = []
+    existentes = set()
+    for posicao in posicao_estado:
+        while True:
+            palavras = [''.join(rng.choice(SILABAS, size=rng.integers(2, 5))) for _ in range(rng.integers(2, 4))]
+            nome = ' '.join(palavras)
+            if len(nome) >= 12 and (posicao, nome) not in existentes:
+                break
+        existentes.add((posicao, nome))
+        nomes.append(nome)
+
+    municipios = pd.DataFrame({'Estado': estados['Estado'].to_numpy()[posicao_estado],
+                               'Sigla': estados['Sigla'].to_numpy()[posicao_estado],
+                               'Codigo_UF': estados['Codigo_UF'].to_numpy()[posicao_estado],
+                               'Municipio': nomes})
+    municipios.sort_values(by=['Sigla', 'Municipio'], inplace=True, ignore_index=True)
+    sequencia = municipios.groupby('Sigla').cumcount() + 1
+    municipios['Codigo_IBGE'] = municipios['Codigo_UF'].astype('int64') * 100000 + sequencia
+    return municipios[['Estado', 'Sigla', 'Codigo_IBGE', 'Municipio']]
+
+
+def grafia_divergente(municipios, fracao=0.005, semente=1):
+    # Nomes da base comparada com uma letra a menos em uma fração dos Municípios (conciliados por consist_munic_ibge)
+    rng = np.random.default_rng(semente)
+    nomes = municipios['Municipio'].to_numpy(dtype=object).copy()
+    for posicao in rng.choice(len(nomes), size=int(len(nomes) * fracao), replace=False):
+        corte = int(rng.integers(1, len(nomes[posicao]) - 1))
+        nomes[posicao] = nomes[posicao][:corte] + nomes[posicao][corte + 1:]
+    return nomes
+
+
+def gera_dtb(diretorio, municipios):
+    # Relatório DTB do IBGE: cabeçalho na linha 7, Nome_UF, Código Município Completo e Nome_Município nas colunas B, L e M
+    linhas = [['TÍTULO : BET - BANCO DE ESTRUTURAS TERRITORIAIS'] + [None] * 12] + [[None] * 13] * 5
+    linhas.append(['UF', 'Nome_UF', 'Região Geográfica Intermediária', 'Nome Região Geográfica Intermediária',
+                   'Região Geográfica Imediata', 'Nome Região Geográfica Imediata', 'Mesorregião Geográfica',
+                   'Nome_Mesorregião', 'Microrregião Geográfica', 'Nome_Microrregião', 'Município',
+                   'Código Município Completo', 'Nome_Município'])
+    dados = pd.DataFrame(None, index=range(len(municipios)), columns=range(13), dtype=object)
+    dados[0] = municipios['Codigo_IBGE'] // 100000
+    dados[1] = municipios['Estado'].str.title()
+    dados[11] = municipios['Codigo_IBGE']
+    dados[12] = municipios['Municipio'].str.title()
+    grava_planilhas(os.path.join(diretorio, ARQ_DTB), {'DTB': pd.concat([pd.DataFrame(linhas), dados], ignore_index=True)})
+
+
+def gera_mei(diretorio, municipios, anos=(2018, 2019, 2020), semente=2):
+    '''
+        Arrecadação dos MEI: uma planilha por faixa de anos (ex.: 2018-2020), título nas linhas 1 e 2,
+        cabeçalho em duas linhas (ano / tributo) e Município no formato "Nome - UF".
+    '''
+    rng = np.random.default_rng(semente)
+    nomes = grafia_divergente(municipios)
+    anos = sorted(anos, reverse=True)
+    cabecalho_ano = ['ESTADO', 'UF', 'MUNICÍPIO']
+    cabecalho_tributo = [None, None, None]
+    for ano in anos:
+        cabecalho_ano += [str(ano), None, None]
+        cabecalho_tributo += TRIBUTOS
+    linhas = pd.DataFrame([['ARRECADAÇÃO DO MEI (MICROEMPREENDEDOR INDIVIDUAL) POR MUNICÍPIO'] + [None] * (len(cabecalho_ano) - 1),
+                           ['UNIDADE: R$ 1,00'] + [None] * (len(cabecalho_ano) - 1), cabecalho_ano, cabecalho_tributo])
+
+    dados = pd.DataFrame({0: municipios['Estado'], 1: municipios['Sigla'],
+                          2: pd.Series(nomes).str.title() + ' - ' + municipios['Sigla']})
+    valores = rng.uniform(100, 500000, size=(len(municipios), 3 * len(anos))).round(2)
+    dados = pd.concat([dados, pd.DataFrame(valores, columns=range(3, 3 + valores.shape[1]))], axis=1)
+    planilha = str(min(anos)) + '-' + str(max(anos))
+    grava_planilhas(os.path.join(diretorio, ARQ_MEI), {planilha: pd.concat([linhas, dados], ignore_index=True)})
+
+
+def gera_inad(diretorio, municipios, meses=12, ano_inicial=2020, semente=3):
+    '''
+        Inadimplência dos MEI: uma planilha por mês (ex.: Janeiro_2020), título na linha 1, cabeçalho na linha 2
+        (Municípios/UF, DAS Pagos mm/aaaa, Optantes mm/aaaa), linha de cabeçalho de cada Estado (Sigla) seguida
+        dos seus Municípios (caixa alta) e linha Total Geral ao final. Retorna o nome do arquivo (InadimplenciaMEImmaaaa.xlsx).
+    '''
+    rng = np.random.default_rng(semente)
+    nomes = grafia_divergente(municipios, semente=semente)
+
+    # Ordem das linhas (igual em todos os meses): Sigla seguida dos Municípios do Estado
+    ordem = []
+    for sigla, grupo in municipios.groupby('Sigla', sort=True):
+        ordem.append((sigla, None))
+        ordem.extend((sigla, posicao) for posicao in grupo.index)
+
+    planilhas = {}
+    for mes in range(meses):
+        ano, numero = ano_inicial + mes // 12, mes % 12 + 1
+        optantes = rng.integers(10, 5000, size=len(municipios))
+        das = (optantes * rng.uniform(0.2, 0.9, size=len(municipios))).astype('int64')
+        estados = municipios.assign(DAS=das, Optantes=optantes).groupby('Sigla')[['DAS', 'Optantes']].sum()
+        linhas = [[sigla, estados.at[sigla, 'DAS'], estados.at[sigla, 'Optantes']] if posicao is None
+                  else [nomes[posicao], das[posicao], optantes[posicao]] for sigla, posicao in ordem]
+        linhas.append(['Total Geral', int(das.sum()), int(optantes.sum())])
+        periodo = '%02d/%d' % (numero, ano)
+        planilha = pd.DataFrame([['Índice de Inadimplência MEI', None, None], ['Municípios/UF', 'DAS Pagos ' + periodo, 'Optantes ' + periodo]] + linhas)
+        planilhas[MESES[numero - 1] + '_' + str(ano)] = planilha
+
+    arquivo = 'InadimplenciaMEI%02d%d.xlsx' % (numero, ano)
+    grava_planilhas(os.path.join(diretorio, arquivo), planilhas)
+    return arquivo
+
+
+def gera_pib(diretorio, municipios, anos=(2019, 2020), semente=4):
+    # PIB dos Municípios: uma linha por Município e ano, 40 colunas com as utilizadas nas posições da planilha do IBGE
+    rng = np.random.default_rng(semente)
+    partes = []
+    for ano in anos:
+        dados = pd.DataFrame({posicao: ('coluna ' + str(posicao)) for posicao in range(40)}, index=municipios.index)
+        dados[0] = ano
+        dados[4] = municipios['Sigla']
+        dados[5] = municipios['Estado'].str.title()
+        dados[6] = municipios['Codigo_IBGE']
+        dados[7] = municipios['Municipio'].str.title()
+        for posicao in range(32, 40):
+            dados[posicao] = rng.uniform(1e3, 1e7, size=len(municipios)).round(2)
+        partes.append(dados)
+    pib = pd.concat(partes, ignore_index=True)
+    cabecalho = pd.DataFrame([[COLUNAS_PIB.get(posicao, 'Coluna ' + str(posicao)) for posicao in range(40)]])
+    grava_planilhas(os.path.join(diretorio, ARQ_PIB), {'PIB': pd.concat([cabecalho, pib], ignore_index=True)})
+
+
+def gera_base_consolidada(quantidade=5570, semente=5):
+    '''
+        Base no leiaute da base consolidada (carga.py): Estado, Sigla, Municipio, arrec_2020, inad_2020 e colunas do PIB.
+        Usada para o teste de carga da predição (pontuacao.py) com qualquer quantidade de linhas (ex.: 1 milhão).
+    '''
+    rng = np.random.default_rng(semente)
+    estados = estados_tabela()
+    posicao_estado = rng.integers(0, len(estados), size=quantidade)
+    base = pd.DataFrame({'Estado': estados['Estado'].to_numpy()[posicao_estado],
+                         'Sigla': estados['Sigla'].to_numpy()[posicao_estado],
+                         'Municipio': ['MUNICIPIO ' + str(numero) for numero in range(quantidade)],
+                         'arrec_2020': rng.lognormal(11, 1.5, size=quantidade).round(2),
+                         'inad_2020': rng.uniform(0.1, 0.99, size=quantidade)})
+    valores = rng.lognormal(18, 1.5, size=(quantidade, 4))
+    for posicao, coluna in enumerate(['Valor_ab_agro', 'Valor_ab_indu', 'Valor_ab_serv', 'Valor_ab_publ']):
+        base[coluna] = valores[:, posicao].round()
+    base['Valor_abt'] = valores.sum(axis=1).round()
+    base['Impostos'] = (base['Valor_abt'] * rng.uniform(0.02, 0.2, size=quantidade)).round()
+    base['PIB'] = base['Valor_abt'] + base['Impostos']
+    base['PIB_pc'] = (base['PIB'] / rng.integers(1000, 500000, size=quantidade)).round(2)
+    return base
+
+
+def grava_planilhas(arquivo, planilhas):
+    # Gravação em formato xlsx (também para os nomes .xls das fontes do IBGE: o leitor identifica o formato pelo conteúdo)
+    temporario = arquivo + '.tmp.xlsx'
+    with pd.ExcelWriter(temporario) as escritor:
+        for nome, dados in planilhas.items():
+            dados.to_excel(escritor, sheet_name=nome, header=False, index=False)
+    os.replace(temporario, arquivo)
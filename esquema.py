@@ -0,0 +1,76 @@
+# coding=utf-8
+
+import pandas as pd
+import re
+
+# Esquema de tipos das bases carregadas (declarado uma única vez e aplicado por todas as cargas)
+# Nome da coluna ou expressão regular (colunas por ano, ex.: arrec_2020) -> dtype
+ESQUEMA = {
+    'Estado': 'category',
+    'Sigla': 'category',
+    'Municipio': 'category',
+    'Codigo_IBGE': 'Int32',     # 7 dígitos; nulo enquanto o Município não for resolvido
+    'DAS': 'int32',
+    'Optantes': 'int32',
+    r'arrec(_\d{4})?': 'float64',
+    r'inad(_\d{4})?': 'float64',
+    # Colunas monetárias do PIB em R$ 1,00
+    r'(Valor_ab_agro|Valor_ab_indu|Valor_ab_serv|Valor_ab_publ|Valor_abt|Impostos|PIB|PIB_pc)(_\d{4})?': 'float64',
+}
+
+
+def tipo_coluna(coluna):
+    # dtype declarado no esquema para a coluna (None se a coluna não faz parte do esquema)
+    for padrao, tipo in ESQUEMA.items():
+        if re.fullmatch(padrao, str(coluna)):
+            return tipo
+    return None
+
+
+def aplica_esquema(df, tema=None):
+    '''
+        Conversão das colunas do DataFrame para os tipos do esquema (alteração no próprio DataFrame).
+        Colunas texto viram categóricas com categorias em ordem alfabética, preservando a ordenação por valor.
+        Com tema informado, imprime a memória ocupada antes e depois da conversão.
+    '''
+    antes = df.memory_usage(deep=True).sum()
+    for coluna in df.columns:
+        tipo = tipo_coluna(coluna)
+        if tipo == 'category':
+            df[coluna] = categoriza(df[coluna])
+        elif tipo is not None and df[coluna].dtype != tipo:
+            df[coluna] = df[coluna].astype(tipo)
+
+    if tema:
+        depois = df.memory_usage(deep=True).sum()
+        print('Memória', tema + ':', megabytes(antes), 'MB ->', megabytes(depois), 'MB')
+    return df
+
+
+def categoriza(serie):
+    # Categórica de valores object (str), independente do dtype de origem (object, string ou categórica)
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        if serie.cat.categories.is_monotonic_increasing:
+            return serie
+        return serie.cat.set_categories(serie.cat.categories.sort_values())
+    return serie.astype(object).where(serie.notna(), None).astype('category')
+
+
+def inclui_categorias(serie, valores):
+    # Inclui novos valores nas categorias, mantendo a ordem alfabética (atribuição de valores fora das categorias)
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    categorias = serie.cat.categories.union(pd.Index(valores, dtype=object).dropna())
+    return serie.cat.set_categories(categorias.sort_values())
+
+
+def unifica_categorias(esquerda, direita, colunas):
+    # Mesmas categorias nas colunas categóricas das duas bases, para junção sem conversão para object
+    for coluna in colunas:
+        if isinstance(esquerda[coluna].dtype, pd.CategoricalDtype) and isinstance(direita[coluna].dtype, pd.CategoricalDtype):
+            esquerda[coluna] = inclui_categorias(esquerda[coluna], direita[coluna].cat.categories)
+            direita[coluna] = inclui_categorias(direita[coluna], esquerda[coluna].cat.categories)
+
+
+def megabytes(memoria):
+    return round(memoria / 2 ** 20, 2)
@@ -0,0 +1,198 @@
+# coding=utf-8
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import hashlib
+import time
+import os
+
+from cache_excel import feather, hash_conteudo, le_metadados, grava_metadados
+from instrumentacao import medicao, conta_linhas
+
+DIR_ETAPAS = os.path.join('cache', 'etapas')    # Checkpoints (Feather) das saídas de cada etapa
+
+
+def executa_etapas(etapas, parametros, opcoes=None, inicio=None, somente=None, paralelo=True, arquivos=None,
+                   inicializacao=None):
+    '''
+        Execução das etapas (grafo de dependências) de uma carga.
+        etapas     -> dicionário nome -> (dependências, função); a função recebe as saídas das dependências
+                      ({etapa: {nome: DataFrame}}), os parâmetros e as opções e retorna um dicionário de DataFrames;
+        parametros -> parâmetros da carga, gravados com os checkpoints (checkpoint de outros parâmetros é descartado);
+        opcoes     -> opções de execução que não alteram o resultado (ex.: quantidade de processos);
+        inicio     -> reexecuta a etapa e as posteriores, reaproveitando os checkpoints das anteriores;
+        somente    -> executa apenas a etapa, com as dependências lidas dos checkpoints;
+        paralelo   -> etapas independentes executadas simultaneamente em processos separados;
+        arquivos   -> arquivos de entrada de cada etapa ({etapa: [arquivos]}): o hash do conteúdo é gravado com o
+                      checkpoint e checkpoint de arquivos alterados é descartado;
+        inicializacao -> (função, argumentos) executada em cada processo antes das etapas (ex.: configuração do
+                      perfil), pois processos iniciados por spawn não herdam o estado do processo principal.
+        A saída de cada etapa executada é gravada em checkpoint, com a identidade dos checkpoints das dependências:
+        checkpoint de etapa cuja dependência (direta ou indireta) mudou ou não é válida é descartado.
+        Retorna as saídas de todas as etapas necessárias.
+    '''
+    arquivos = arquivos or {}
+    for nome in (inicio, somente):
+        if nome is not None and nome not in etapas:
+            raise ValueError('Etapa desconhecida: ' + nome + ' (etapas: ' + ', '.join(etapas) + ')')
+
+    # Etapas a executar: todas, a etapa inicial e as posteriores ou somente a etapa indicada
+    if somente is not None:
+        executar = {somente}
+    elif inicio is not None:
+        executar = {inicio} | posteriores(etapas, inicio)
+    else:
+        executar = set(etapas)
+
+    # Dependências fora da execução são lidas dos checkpoints; sem checkpoint válido, são executadas também
+    # (ordem topológica inversa: as dependentes de cada etapa já estão definidas quando ela é avaliada)
+    saidas = {}
+    pendentes = set(executar)
+    validos = {}
+
+    def valido(nome):
+        # Checkpoint da etapa e das anteriores gravados com os parâmetros, arquivos e dependências atuais
+        if nome not in validos:
+            validos[nome] = (metadados_validos(nome, parametros, arquivos.get(nome, ()), etapas[nome][0])
+                             and all(valido(dependencia) for dependencia in etapas[nome][0]))
+        return validos[nome]
+
+    for nome in reversed(ordem_topologica(etapas)):
+        if nome in pendentes or not any(nome in etapas[outra][0] for outra in pendentes):
+            continue
+        checkpoint = carrega_checkpoint(nome, parametros, arquivos.get(nome, ()), etapas[nome][0]) if valido(nome) else None
+        if checkpoint is None:
+            print('Etapa', nome, 'sem checkpoint válido, será executada.')
+            pendentes.add(nome)
+        else:
+            print('Etapa', nome, 'carregada do checkpoint.')
+            saidas[nome] = checkpoint
+
+    opcoes = opcoes or {}
+    if paralelo:
+        inicializador, argumentos = inicializacao or (None, ())
+        with ProcessPoolExecutor(max_workers=max(1, len(pendentes)), initializer=inicializador, initargs=argumentos) as executor:
+            executa_grafo(etapas, parametros, opcoes, pendentes, saidas, executor, arquivos)
+    else:
+        executa_grafo(etapas, parametros, opcoes, pendentes, saidas, None, arquivos)
+    return saidas
+
+
+def executa_grafo(etapas, parametros, opcoes, pendentes, saidas, executor, arquivos):
+    # Submete cada etapa assim que todas as suas dependências estiverem concluídas
+    em_execucao = {}
+    while pendentes or em_execucao:
+        prontas = [nome for nome in ordem_topologica(etapas)
+                   if nome in pendentes and all(dependencia in saidas for dependencia in etapas[nome][0])]
+        for nome in prontas:
+            pendentes.discard(nome)
+            entradas = {dependencia: saidas[dependencia] for dependencia in etapas[nome][0]}
+            # Checkpoints das dependências já gravados (executadas antes) ou lidos nesta execução
+            dependencias = {dependencia: identidade_checkpoint(dependencia) for dependencia in etapas[nome][0]}
+            if executor is None:
+                saidas[nome] = executa_etapa(nome, etapas[nome][1], entradas, parametros, opcoes, arquivos.get(nome, ()),
+                                             dependencias)
+            else:
+                em_execucao[executor.submit(executa_etapa, nome, etapas[nome][1], entradas, parametros, opcoes,
+                                            arquivos.get(nome, ()), dependencias)] = nome
+        if not em_execucao:
+            if pendentes and not prontas:
+                raise ValueError('Dependência circular entre as etapas: ' + ', '.join(sorted(pendentes)))
+            continue
+        concluidas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+        for futuro in concluidas:
+            saidas[em_execucao.pop(futuro)] = futuro.result()
+
+
+def executa_etapa(nome, funcao, entradas, parametros, opcoes, arquivos=(), dependencias=None):
+    # Execução de uma etapa e gravação do checkpoint da saída (executada em processo separado no modo paralelo)
+    inicio = time.perf_counter()
+    hashes = hashes_entrada(arquivos)     # Conteúdo dos arquivos antes da leitura pela etapa
+    with medicao('etapa:' + nome) as registro:
+        saida = funcao(entradas, parametros, opcoes)
+        registro['linhas'] = conta_linhas(saida)
+    grava_checkpoint(nome, saida, parametros, hashes, dependencias)
+    print('Etapa', nome, 'concluída em', round(time.perf_counter() - inicio, 2), 's')
+    return saida
+
+
+def ordem_topologica(etapas):
+    ordem = []
+    visitadas = set()
+
+    def visita(nome):
+        if nome in visitadas:
+            return
+        visitadas.add(nome)
+        for dependencia in etapas[nome][0]:
+            visita(dependencia)
+        ordem.append(nome)
+
+    for nome in etapas:
+        visita(nome)
+    return ordem
+
+
+def posteriores(etapas, nome):
+    # Etapas que dependem, direta ou indiretamente, da etapa
+    resultado = set()
+    for outra in ordem_topologica(etapas):
+        if nome in etapas[outra][0] or resultado & set(etapas[outra][0]):
+            resultado.add(outra)
+    return resultado
+
+
+def caminho_checkpoint(nome, saida=None):
+    return os.path.join(DIR_ETAPAS, nome + ('-' + saida + '.feather' if saida else '.json'))
+
+
+def grava_checkpoint(nome, saida, parametros, hashes=None, dependencias=None):
+    # Cada DataFrame da saída em um arquivo Feather (índice e tipos preservados); metadados com os parâmetros,
+    # o hash do conteúdo dos arquivos de entrada e a identidade dos checkpoints das dependências da etapa
+    if feather is None:
+        return
+    os.makedirs(DIR_ETAPAS, exist_ok=True)
+    for nome_saida, dados in saida.items():
+        feather.write_feather(dados, caminho_checkpoint(nome, nome_saida))
+    grava_metadados(caminho_checkpoint(nome), {'etapa': nome, 'parametros': parametros, 'saidas': list(saida),
+                                               'arquivos': hashes or {}, 'dependencias': dependencias or {}})
+
+
+def carrega_checkpoint(nome, parametros, arquivos=(), dependencias=()):
+    # Saída gravada da etapa ou None se ausente ou com metadados divergentes (metadados_validos)
+    if not metadados_validos(nome, parametros, arquivos, dependencias):
+        return None
+    metadados = le_metadados(caminho_checkpoint(nome))
+    caminhos = {nome_saida: caminho_checkpoint(nome, nome_saida) for nome_saida in metadados['saidas']}
+    if not all(os.path.exists(caminho) for caminho in caminhos.values()):
+        return None
+    return {nome_saida: feather.read_table(caminho).to_pandas() for nome_saida, caminho in caminhos.items()}
+
+
+def metadados_validos(nome, parametros, arquivos=(), dependencias=()):
+    # Checkpoint gravado com os mesmos parâmetros, arquivos de entrada e checkpoints das dependências
+    if feather is None:
+        return False
+    metadados = le_metadados(caminho_checkpoint(nome))
+    return (metadados is not None and metadados['parametros'] == parametros_json(parametros)
+            and metadados.get('arquivos', {}) == hashes_entrada(arquivos)
+            and metadados.get('dependencias', {}) == {dependencia: identidade_checkpoint(dependencia)
+                                                      for dependencia in dependencias})
+
+
+def identidade_checkpoint(nome):
+    # Hash dos metadados do checkpoint (parâmetros, arquivos e dependências da gravação); None se ausente
+    caminho = caminho_checkpoint(nome)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+
+def parametros_json(parametros):
+    # Parâmetros como gravados no JSON (tuplas -> listas), para comparação com os metadados
+    return {chave: list(valor) if isinstance(valor, tuple) else valor for chave, valor in parametros.items()}
+
+
+def hashes_entrada(arquivos):
+    # Hash do conteúdo de cada arquivo de entrada (None se o arquivo não existir)
+    return {arquivo: hash_conteudo(arquivo) if os.path.exists(arquivo) else None for arquivo in arquivos}
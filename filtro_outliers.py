@@ -0,0 +1,126 @@
+# coding=utf-8
+
+import pandas as pd
+import numpy as np
+import os
+
+# Filtro de outliers por regras: cada regra produz uma máscara booleana vetorizada (True -> rejeitado) e todas são
+# combinadas em uma única máscara, aplicada de uma só vez (O(n), sem remoções linha a linha).
+# As linhas rejeitadas são gravadas no arquivo de quarentena com os motivos (regras atendidas).
+ARQ_QUARENTENA = 'quarentena_outliers.csv'
+COLUNA_MOTIVO = 'motivo'
+
+
+class RegraLimite:
+    '''
+        Valores fora dos limites da coluna: < minimo ou >= maximo (inclusivo=True) / > maximo (inclusivo=False).
+        Ex.: RegraLimite('inad_2020', maximo=1) -> Inadimplência >= 1 (impossível: DAS Pagos maiores que Optantes).
+    '''
+
+    def __init__(self, coluna, minimo=None, maximo=None, inclusivo=True, nome=None):
+        self.coluna = coluna
+        self.minimo = minimo
+        self.maximo = maximo
+        self.inclusivo = inclusivo
+        self.nome = nome or 'limite_' + coluna
+
+    def mascara(self, base):
+        valores = base[self.coluna]
+        rejeitados = pd.Series(False, index=base.index)
+        if self.minimo is not None:
+            rejeitados |= valores < self.minimo
+        if self.maximo is not None:
+            rejeitados |= (valores >= self.maximo) if self.inclusivo else (valores > self.maximo)
+        return rejeitados
+
+
+class RegraIQR:
+    '''
+        Valores fora de [Q1 - fator * IQR, Q3 + fator * IQR] da coluna.
+        grupo -> colunas de agrupamento (ex.: Ano em painéis de vários anos): quartis calculados por grupo.
+    '''
+
+    def __init__(self, coluna, fator=1.5, grupo=None, nome=None):
+        self.coluna = coluna
+        self.fator = fator
+        self.grupo = grupo
+        self.nome = nome or 'iqr_' + coluna
+
+    def mascara(self, base):
+        valores = base[self.coluna]
+        if self.grupo is None:
+            q1, q3 = valores.quantile(0.25), valores.quantile(0.75)
+        else:
+            agrupados = valores.groupby([base[coluna] for coluna in np.atleast_1d(self.grupo)], observed=True)
+            q1, q3 = agrupados.transform('quantile', 0.25), agrupados.transform('quantile', 0.75)
+        amplitude = self.fator * (q3 - q1)
+        return (valores < q1 - amplitude) | (valores > q3 + amplitude)
+
+
+class RegraZScore:
+    # Valores com |z| > limite na coluna (média e desvio padrão da coluna ou de cada grupo)
+
+    def __init__(self, coluna, limite=3.0, grupo=None, nome=None):
+        self.coluna = coluna
+        self.limite = limite
+        self.grupo = grupo
+        self.nome = nome or 'zscore_' + coluna
+
+    def mascara(self, base):
+        valores = base[self.coluna]
+        if self.grupo is None:
+            media, desvio = valores.mean(), valores.std()
+        else:
+            agrupados = valores.groupby([base[coluna] for coluna in np.atleast_1d(self.grupo)], observed=True)
+            media, desvio = agrupados.transform('mean'), agrupados.transform('std')
+        return ((valores - media) / desvio).abs() > self.limite
+
+
+class RegraTrocaDasOptantes:
+    '''
+        Provável troca das colunas DAS Pagos e Optantes do Simples - MEI.
+        Com as colunas DAS e Optantes (painel da Inadimplência): DAS > Optantes.
+        Somente com a Inadimplência (base consolidada, inad = DAS / Optantes): inad > 1 e a razão invertida (1 / inad)
+        dentro da faixa das Inadimplências válidas da base, ou seja, plausível com as colunas trocadas.
+    '''
+
+    def __init__(self, inad='inad_2020', das='DAS', optantes='Optantes', nome='troca_das_optantes'):
+        self.inad = inad
+        self.das = das
+        self.optantes = optantes
+        self.nome = nome
+
+    def mascara(self, base):
+        if self.das in base.columns and self.optantes in base.columns:
+            return base[self.das] > base[self.optantes]
+        valores = base[self.inad]
+        validos = valores[(valores > 0) & (valores <= 1)]
+        with np.errstate(divide='ignore'):
+            invertidos = 1 / valores
+        return (valores > 1) & invertidos.between(validos.min(), validos.max())
+
+
+def filtra_outliers(base, regras, arquivo_quarentena=None):
+    '''
+        Aplicação das regras à base em uma única máscara booleana.
+        Retorna a base sem os rejeitados e os rejeitados com a coluna motivo (nomes das regras atendidas, separados por ;).
+        arquivo_quarentena -> grava os rejeitados (CSV) para conferência; None não grava.
+    '''
+    mascaras = pd.DataFrame({regra.nome: regra.mascara(base).fillna(False).astype(bool) for regra in regras}, index=base.index)
+    rejeitados_mascara = mascaras.any(axis=1).to_numpy() if len(regras) else np.zeros(len(base), dtype=bool)
+
+    rejeitados = base[rejeitados_mascara].copy()
+    atendidas = mascaras[rejeitados_mascara]
+    nomes = np.array(atendidas.columns, dtype=object)
+    rejeitados[COLUNA_MOTIVO] = [';'.join(nomes[linha]) for linha in atendidas.to_numpy()]
+
+    if arquivo_quarentena:
+        grava_quarentena(rejeitados, arquivo_quarentena)
+    return base[~rejeitados_mascara], rejeitados
+
+
+def grava_quarentena(rejeitados, arquivo=ARQ_QUARENTENA):
+    pasta = os.path.dirname(arquivo)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    rejeitados.to_csv(arquivo, encoding='utf-8')
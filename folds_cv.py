@@ -0,0 +1,172 @@
+# coding=utf-8
+
+import numpy as np
+import hashlib
+import shutil
+import json
+import os
+
+from sklearn.model_selection import KFold
+from sklearn.base import clone
+from catboost import Pool, CatBoostRegressor
+import xgboost as xgb
+
+# Folds da validação cruzada preparados uma única vez e compartilhados entre modelos, configurações e processos:
+# matrizes de treino e validação de cada fold gravadas em .npy e abertas como memória mapeada (sem cópia por tarefa);
+# Pools do CatBoost quantizados uma vez por fold (fronteiras do treino aplicadas à validação) e gravados em disco;
+# QuantileDMatrix do XGBoost construídas uma vez por fold em cada processo.
+# Os arquivos ficam em <diretorio>/<hash dos dados e do cv>: os mesmos dados reaproveitam a preparação.
+DIR_FOLDS = os.path.join('cache', 'folds')
+COMPLETO = 'completo'       # "Fold" com a base inteira (modelos finais e análise de resíduos)
+
+
+class PreparacaoFolds:
+    '''
+        Folds (KFold, como no GridSearchCV cv=5) de X e y preparados em disco.
+        fold(k)            -> X_treino, y_treino, X_validacao, y_validacao (memória mapeada, somente leitura);
+        pool_catboost(k)   -> Pools quantizados de treino e validação (k=None: base inteira e validação None);
+        dmatrix_xgboost(k) -> QuantileDMatrix de treino e validação (mesmas fronteiras).
+        O objeto enviado a outros processos leva somente o diretório: cada processo abre os arquivos já preparados.
+    '''
+
+    def __init__(self, X, y, cv=5, diretorio=DIR_FOLDS):
+        X, y = np.ascontiguousarray(X, dtype='float64'), np.ascontiguousarray(y, dtype='float64').ravel()
+        self.cv = cv
+        self.chave = hash_folds(X, y, cv)
+        self.caminho = os.path.join(diretorio, self.chave)
+        self.memoria = {}
+        if not os.path.exists(self.arquivo('folds.json')):
+            self.prepara(X, y)
+
+    def prepara(self, X, y):
+        # Gravação única dos folds (diretório temporário renomeado ao final: preparação interrompida não é reaproveitada)
+        temporario = self.caminho + '.tmp' + str(os.getpid())
+        os.makedirs(temporario, exist_ok=True)
+        partes = {COMPLETO: (np.arange(len(y)), None)}
+        partes.update({str(k): fold for k, fold in enumerate(KFold(n_splits=self.cv).split(X))})
+        for nome, (treino, validacao) in partes.items():
+            np.save(os.path.join(temporario, nome + '_X_treino.npy'), X[treino])
+            np.save(os.path.join(temporario, nome + '_y_treino.npy'), y[treino])
+            if validacao is not None:
+                np.save(os.path.join(temporario, nome + '_X_validacao.npy'), X[validacao])
+                np.save(os.path.join(temporario, nome + '_y_validacao.npy'), y[validacao])
+                np.save(os.path.join(temporario, nome + '_indices_validacao.npy'), validacao)
+        with open(os.path.join(temporario, 'folds.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump({'cv': self.cv, 'linhas': len(y), 'colunas': X.shape[1]}, arquivo)
+        try:
+            os.replace(temporario, self.caminho)
+        except OSError:     # Preparado por outro processo no mesmo intervalo
+            shutil.rmtree(temporario, ignore_errors=True)
+
+    def arquivo(self, nome):
+        return os.path.join(self.caminho, nome)
+
+    def __getstate__(self):
+        # Processos recebem apenas a referência aos arquivos (sem matrizes, Pools ou DMatrix em memória)
+        estado = self.__dict__.copy()
+        estado['memoria'] = {}
+        return estado
+
+    def nome_fold(self, k):
+        return COMPLETO if k is None else str(k)
+
+    def fold(self, k=None):
+        nome = self.nome_fold(k)
+        dados = [np.load(self.arquivo(nome + '_' + parte + '.npy'), mmap_mode='r') for parte in ('X_treino', 'y_treino')]
+        if k is None:
+            return dados + [None, None]
+        return dados + [np.load(self.arquivo(nome + '_' + parte + '.npy'), mmap_mode='r') for parte in ('X_validacao', 'y_validacao')]
+
+    def indices_validacao(self, k):
+        return np.load(self.arquivo(str(k) + '_indices_validacao.npy'))
+
+    def pool_catboost(self, k=None):
+        '''
+            Pools quantizados do fold (fronteiras padrão do CatBoost, calculadas no treino do fold e aplicadas à validação),
+            gravados na primeira chamada e lidos pelas demais e pelos outros processos.
+        '''
+        nome = self.nome_fold(k)
+        if ('catboost', nome) not in self.memoria:
+            treino = self.arquivo(nome + '_treino.cbp')
+            validacao = self.arquivo(nome + '_validacao.cbp')
+            if not os.path.exists(treino):
+                X_treino, y_treino, X_validacao, y_validacao = self.fold(k)
+                pool = Pool(np.asarray(X_treino), np.asarray(y_treino))
+                pool.quantize()
+                fronteiras = self.arquivo(nome + '_fronteiras.tsv')
+                pool.save_quantization_borders(fronteiras)
+                if k is not None:
+                    pool_validacao = Pool(np.asarray(X_validacao), np.asarray(y_validacao))
+                    pool_validacao.quantize(input_borders=fronteiras)
+                    pool_validacao.save(validacao + '.tmp')
+                    os.replace(validacao + '.tmp', validacao)
+                pool.save(treino + '.tmp')
+                os.replace(treino + '.tmp', treino)
+            self.memoria[('catboost', nome)] = (Pool('quantized://' + treino),
+                                                 None if k is None else Pool('quantized://' + validacao))
+        return self.memoria[('catboost', nome)]
+
+    def dmatrix_xgboost(self, k=None):
+        # QuantileDMatrix do fold (validação com as fronteiras do treino), construídas uma vez por processo
+        nome = self.nome_fold(k)
+        if ('xgboost', nome) not in self.memoria:
+            X_treino, y_treino, X_validacao, y_validacao = self.fold(k)
+            treino = xgb.QuantileDMatrix(X_treino, y_treino)
+            validacao = None if k is None else xgb.QuantileDMatrix(X_validacao, y_validacao, ref=treino)
+            self.memoria[('xgboost', nome)] = (treino, validacao)
+        return self.memoria[('xgboost', nome)]
+
+    def prepara_catboost(self):
+        # Quantização de todos os folds antes de enviar as tarefas aos processos
+        for k in [None] + list(range(self.cv)):
+            self.pool_catboost(k)
+
+
+def ajusta_modelo(modelo, folds, k=None, **parametros_fit):
+    '''
+        Ajuste de um modelo (KNeighborsRegressor, XGBRegressor ou CatBoostRegressor) nos dados preparados do fold.
+        CatBoost: Pool quantizado; XGBoost: QuantileDMatrix (xgboost.train com os parâmetros do modelo);
+        demais: matrizes em memória mapeada. Retorna o modelo ajustado (para o XGBoost, o Booster).
+    '''
+    if isinstance(modelo, CatBoostRegressor):
+        treino, _ = folds.pool_catboost(k)
+        modelo = modelo.copy()
+        modelo.fit(treino, **parametros_fit)
+        return modelo
+    if isinstance(modelo, xgb.XGBRegressor):
+        treino, _ = folds.dmatrix_xgboost(k)
+        parametros = {chave: valor for chave, valor in modelo.get_xgb_params().items() if valor is not None}
+        return xgb.train(parametros, treino, num_boost_round=modelo.n_estimators or 100, **parametros_fit)
+    X_treino, y_treino, _, _ = folds.fold(k)
+    modelo = clone(modelo)
+    modelo.fit(X_treino, y_treino, **parametros_fit)
+    return modelo
+
+
+def prediz(modelo, folds, k):
+    # Predição da validação do fold (Booster do XGBoost com a QuantileDMatrix de validação)
+    if isinstance(modelo, xgb.Booster):
+        return modelo.predict(folds.dmatrix_xgboost(k)[1])
+    return modelo.predict(np.asarray(folds.fold(k)[2]))
+
+
+def avalia_modelos(modelos, folds):
+    '''
+        Validação cruzada dos modelos ({nome: modelo}) nos mesmos folds preparados: MAE médio e desvio por modelo.
+    '''
+    resultados = {}
+    for nome, modelo in modelos.items():
+        erros = []
+        for k in range(folds.cv):
+            ajustado = ajusta_modelo(modelo, folds, k)
+            erros.append(float(np.mean(np.abs(prediz(ajustado, folds, k) - np.asarray(folds.fold(k)[3])))))
+        resultados[nome] = {'mae': float(np.mean(erros)), 'mae_desvio': float(np.std(erros, ddof=1)), 'folds': erros}
+    return resultados
+
+
+def hash_folds(X, y, cv):
+    resumo = hashlib.sha256()
+    resumo.update(np.ascontiguousarray(X).tobytes())
+    resumo.update(np.ascontiguousarray(y).tobytes())
+    resumo.update(str((X.shape, cv)).encode())
+    return resumo.hexdigest()[:16]
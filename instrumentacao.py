@@ -0,0 +1,129 @@
+# coding=utf-8
+
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime
+import cProfile
+import json
+import math
+import time
+import os
+import re
+
+try:
+    import resource
+except ImportError:     # Windows: pico de memória (RSS) não disponível
+    resource = None
+
+# Instrumentação ativada pela variável de ambiente TCC_INSTRUMENTACAO (arquivo do trace JSON-lines, ou 1 para o padrão).
+# TCC_PERFIL_CPROFILE=<diretório> grava também o cProfile (.prof) de cada etapa medida.
+# Desativada, o decorador devolve a própria função e o gerenciador de contexto não mede nada.
+ARQ_TRACE_PADRAO = os.path.join('cache', 'trace.jsonl')
+
+arq_trace = os.environ.get('TCC_INSTRUMENTACAO', '')
+arq_trace = ARQ_TRACE_PADRAO if arq_trace == '1' else arq_trace
+dir_cprofile = os.environ.get('TCC_PERFIL_CPROFILE', '')
+
+perfis_ativos = []      # cProfile em execução: somente a medição mais externa é perfilada
+
+
+@contextmanager
+def medicao(etapa, **contexto):
+    '''
+        Medição de uma etapa: tempo decorrido, tempo de CPU, pico de memória do processo (RSS) e,
+        se informada pela etapa em registro['linhas'], a quantidade de registros processados.
+        Uso: with medicao('carga_inad') as registro: ...; registro['linhas'] = len(df)
+        Cada medição é uma linha do trace (JSON-lines); desativada, não mede nem grava.
+    '''
+    registro = dict(contexto)
+    if not arq_trace:
+        yield registro
+        return
+
+    perfil = cProfile.Profile() if dir_cprofile and not perfis_ativos else None
+    data_inicio = datetime.now().isoformat(timespec='milliseconds')
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    if perfil:
+        perfis_ativos.append(perfil)
+        perfil.enable()
+    try:
+        yield registro
+    finally:
+        if perfil:
+            perfil.disable()
+            perfis_ativos.remove(perfil)
+        registro.update({'etapa': etapa, 'inicio': data_inicio,
+                         'tempo': round(time.perf_counter() - inicio, 6),
+                         'tempo_cpu': round(time.process_time() - inicio_cpu, 6),
+                         'rss_pico_mb': rss_pico(), 'pid': os.getpid()})
+        grava_registro(registro)
+        if perfil:
+            os.makedirs(dir_cprofile, exist_ok=True)
+            nome = re.sub(r'[^0-9A-Za-z_.-]+', '_', etapa)
+            perfil.dump_stats(os.path.join(dir_cprofile, nome + '-' + str(os.getpid()) + '.prof'))
+
+
+def instrumenta(etapa=None):
+    '''
+        Decorador de medição (medicao) de uma função; a quantidade de registros é obtida do retorno
+        (DataFrame, tupla ou dicionário de DataFrames). Desativado, retorna a própria função (custo zero).
+    '''
+    def decorador(funcao):
+        if not arq_trace:
+            return funcao
+        nome = etapa or funcao.__name__
+
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            with medicao(nome) as registro:
+                resultado = funcao(*args, **kwargs)
+                registro['linhas'] = conta_linhas(resultado)
+            return resultado
+        return medida
+    return decorador
+
+
+def registra_busca(etapa, tabela, parametros, **contexto):
+    '''
+        Resultado por candidato de uma busca de hiperparâmetros (tabela da ajuste_hiperparametros.busca_catboost, uma
+        linha por configuração): parâmetros, MAE médio e desvio entre os folds, árvores e tempo total de ajuste.
+    '''
+    if not arq_trace:
+        return
+    for posicao, linha in enumerate(tabela.to_dict('records')):
+        grava_registro(dict(contexto, etapa=etapa, candidato=posicao,
+                            parametros={parametro: linha[parametro] for parametro in parametros},
+                            tempo_ajuste=float(linha['tempo']), mae=float(linha['mae']),
+                            mae_desvio=None if math.isnan(linha['mae_desvio']) else float(linha['mae_desvio']),
+                            n_estimators=float(linha['n_estimators'])))
+
+
+def conta_linhas(resultado):
+    # Quantidade de registros do retorno: DataFrame/Series, primeiro DataFrame da tupla ou soma do dicionário
+    if hasattr(resultado, 'shape') and len(resultado.shape) > 0:
+        return int(resultado.shape[0])
+    if isinstance(resultado, (tuple, list)):
+        for item in resultado:
+            if hasattr(item, 'shape') and len(item.shape) > 0:
+                return int(item.shape[0])
+    if isinstance(resultado, dict):
+        linhas = [int(item.shape[0]) for item in resultado.values() if hasattr(item, 'shape') and len(item.shape) > 0]
+        return sum(linhas) if linhas else None
+    return None
+
+
+def rss_pico():
+    # Pico de memória residente do processo em MB (ru_maxrss em KB no Linux e em bytes no macOS)
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (2 ** 20 if os.uname().sysname == 'Darwin' else 2 ** 10), 2)
+
+
+def grava_registro(registro):
+    # Uma linha por registro; escrita em modo append (processos paralelos gravam no mesmo arquivo)
+    pasta = os.path.dirname(arq_trace)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(arq_trace, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
@@ -0,0 +1,125 @@
+# coding=utf-8
+
+from functools import lru_cache
+import pandas as pd
+import numpy as np
+import unidecode
+import tempfile
+import json
+import os
+import re
+
+VERSAO_REGRAS = 1                                           # Alterar sempre que as regras de normaliza_nome mudarem
+LIMITE_MEMORIA = 20000                                      # Quantidade máxima de nomes mantidos no dicionário em memória
+ARQ_CACHE = os.path.join('cache', 'nomes_municipios.json')  # Cache em disco dos nomes já normalizados
+ARQ_AJUSTES = 'ajustes_municipios.csv'                      # Tabela de ajustes de nome/grafia de Municípios
+
+cache_nomes = {}            # Nome original -> nome normalizado
+cache_carregado = False     # Indica se o cache em disco já foi lido nesta execução
+
+
+def normaliza_nome(nome):
+    '''
+        Regras de normalização do nome de um Município:
+        Eliminação dos acentos, traços e substituição de DA(S), DE, DO(S) por DE.
+    '''
+    nome = unidecode.unidecode(nome)
+    nome = nome.replace('-', ' ')
+    nome = re.sub(r' D[AEO]S? ', ' DE ', nome)
+    return nome
+
+
+def normaliza_municipios(serie):
+    '''
+        Normalização de uma Series de nomes de Municípios.
+        Cada nome distinto é normalizado uma única vez (factorize) e o resultado é mapeado de volta
+        para todas as linhas. Os nomes já normalizados são reaproveitados do cache em memória e em disco.
+        Retorna Series de texto (object), também para entrada categórica: as categorias são definidas pelo esquema.
+    '''
+    carrega_cache_nomes()
+
+    codigos, distintos = pd.factorize(serie)
+    novos = 0
+    normalizados = []
+    for nome in distintos:
+        if nome not in cache_nomes:
+            cache_nomes[nome] = normaliza_nome(nome)
+            novos += 1
+        normalizados.append(cache_nomes[nome])
+
+    # Limita o dicionário em memória, descartando os nomes mais antigos
+    while len(cache_nomes) > LIMITE_MEMORIA:
+        cache_nomes.pop(next(iter(cache_nomes)))
+
+    if novos:
+        grava_cache_nomes()
+
+    # Código -1 (valor ausente) aponta para o último elemento, mantendo o valor ausente
+    valores = np.array(normalizados + [None], dtype=object)
+    return pd.Series(valores[codigos], index=serie.index, name=serie.name, dtype=object)
+
+
+def carrega_cache_nomes():
+    # Leitura do cache em disco, descartado se gerado por outra versão das regras
+    global cache_carregado
+    if cache_carregado:
+        return
+    cache_carregado = True
+    cache_nomes.update(le_cache_nomes(avisar=True))
+
+
+def le_cache_nomes(avisar=False):
+    # Nomes do cache em disco ({} se ausente, ilegível ou de outra versão das regras)
+    if not os.path.exists(ARQ_CACHE):
+        return {}
+    try:
+        with open(ARQ_CACHE, encoding='utf-8') as arquivo:
+            conteudo = json.load(arquivo)
+    except (OSError, ValueError):
+        if avisar:
+            print('*** Atenção **** Cache de nomes de Municípios ilegível, será recriado.')
+        return {}
+    return conteudo.get('nomes', {}) if conteudo.get('versao') == VERSAO_REGRAS else {}
+
+
+def grava_cache_nomes():
+    '''
+        Gravação do cache em disco: arquivo temporário exclusivo do processo e substituição (as etapas da carga executadas
+        em paralelo gravam o mesmo cache). Os nomes gravados por outros processos desde a leitura são mantidos.
+    '''
+    diretorio = os.path.dirname(ARQ_CACHE)
+    os.makedirs(diretorio, exist_ok=True)
+    nomes = le_cache_nomes()
+    nomes.update(cache_nomes)
+    while len(nomes) > LIMITE_MEMORIA:
+        nomes.pop(next(iter(nomes)))
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=diretorio, suffix='.tmp', delete=False) as arquivo:
+        json.dump({'versao': VERSAO_REGRAS, 'nomes': nomes}, arquivo, ensure_ascii=False)
+    os.replace(arquivo.name, ARQ_CACHE)
+
+
+@lru_cache(maxsize=1)
+def carrega_ajustes():
+    '''
+        Carga da tabela de ajustes de nome/grafia de Municípios (ajustes_municipios.csv).
+        Sigla vazia indica ajuste válido para qualquer Estado.
+        Nomes e ajustes passam pelas mesmas regras de normalização dos Municípios.
+    '''
+    ajustes = pd.read_csv(ARQ_AJUSTES, usecols=['Sigla', 'Municipio', 'Ajuste'], dtype=str)
+    ajustes['Municipio'] = ajustes['Municipio'].str.upper().map(normaliza_nome)
+    ajustes['Ajuste'] = ajustes['Ajuste'].str.upper().map(normaliza_nome)
+    return ajustes
+
+
+def aplica_ajustes(tabela):
+    # Ajustes válidos para qualquer Estado
+    ajustes = carrega_ajustes()
+    gerais = ajustes[ajustes['Sigla'].isna()]
+    tabela['Municipio'] = tabela['Municipio'].replace(dict(zip(gerais['Municipio'], gerais['Ajuste'])))
+
+    # Ajustes restritos a um Estado (somente se a tabela já possui a Sigla)
+    if 'Sigla' in tabela.columns:
+        por_estado = ajustes[ajustes['Sigla'].notna()]
+        for sigla, municipio, ajuste in por_estado[['Sigla', 'Municipio', 'Ajuste']].itertuples(index=False):
+            tabela.loc[(tabela['Municipio'] == municipio) & (tabela['Sigla'] == sigla), 'Municipio'] = ajuste
+    return tabela
@@ -0,0 +1,80 @@
+# coding=utf-8
+
+import pandas as pd
+import numpy as np
+import warnings
+import json
+import os
+
+# Configuração do perfil: modo silencioso (sem amostra e resumo impressos) e diretório dos relatórios JSON
+configuracao = {'silencioso': False, 'diretorio': None}
+
+ESTATISTICAS = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+def configura_perfil(silencioso=False, diretorio=None):
+    configuracao['silencioso'] = silencioso
+    configuracao['diretorio'] = diretorio
+
+
+def perfil_df(df, tema):
+    '''
+        Perfil de qualidade de um DataFrame, calculado de forma vetorizada em uma única passagem por grupo de colunas:
+        registros duplicados, valores ausentes (NaN) e Strings vazias por coluna e resumo estatístico das
+        colunas numéricas (contagem, média, desvio padrão, mínimo, quartis e máximo).
+        Retorna o relatório em estrutura serializável (JSON), gravado em <diretorio>/<tema>.json se configurado.
+    '''
+    # Valores ausentes de todas as colunas e Strings vazias das colunas texto
+    nulos = df.isna().sum()
+    texto = df.select_dtypes(include=['object', 'string', 'category'])
+    vazios = (texto == '').sum().reindex(df.columns, fill_value=0)
+
+    # Resumo das colunas numéricas calculado sobre uma única matriz float64
+    numericas = df.select_dtypes(include='number')
+    resumo = {}
+    if not numericas.empty:
+        valores = numericas.to_numpy(dtype='float64', na_value=np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)   # colunas sem nenhum valor
+            quartis = np.nanpercentile(valores, [25, 50, 75], axis=0)
+            estatisticas = [np.sum(~np.isnan(valores), axis=0), np.nanmean(valores, axis=0),
+                            np.nanstd(valores, axis=0, ddof=1), np.nanmin(valores, axis=0),
+                            quartis[0], quartis[1], quartis[2], np.nanmax(valores, axis=0)]
+        for posicao, coluna in enumerate(numericas.columns):
+            resumo[coluna] = {nome: valor_json(estatistica[posicao]) for nome, estatistica in zip(ESTATISTICAS, estatisticas)}
+
+    por_coluna = {}
+    for coluna in df.columns:
+        por_coluna[str(coluna)] = {'tipo': str(df[coluna].dtype), 'nulos': int(nulos[coluna]), 'vazios': int(vazios[coluna])}
+        por_coluna[str(coluna)].update(resumo.get(coluna, {}))
+
+    relatorio = {'tema': tema,
+                 'registros': int(df.shape[0]),
+                 'colunas': int(df.shape[1]),
+                 'duplicados': int(df.duplicated().sum()),
+                 'nulos': int(nulos.sum()),
+                 'vazios': int(vazios.sum()),
+                 'por_coluna': por_coluna}
+
+    if configuracao['diretorio']:
+        grava_perfil(relatorio, configuracao['diretorio'])
+    return relatorio
+
+
+def tabela_perfil(relatorio):
+    # Relatório por coluna em formato tabular (tipo, nulos, vazios e estatísticas das colunas numéricas)
+    tabela = pd.DataFrame.from_dict(relatorio['por_coluna'], orient='index')
+    return tabela.reindex(columns=['tipo', 'nulos', 'vazios'] + [nome for nome in ESTATISTICAS if nome in tabela.columns])
+
+
+def grava_perfil(relatorio, diretorio):
+    os.makedirs(diretorio, exist_ok=True)
+    nome = ''.join(caractere if caractere.isalnum() else '_' for caractere in relatorio['tema'])
+    with open(os.path.join(diretorio, nome + '.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+
+
+def valor_json(valor):
+    # Conversão para tipo nativo do Python; NaN -> None (null no JSON)
+    valor = float(valor)
+    return None if np.isnan(valor) else valor
@@ -0,0 +1,128 @@
+# coding=utf-8
+
+import pandas as pd
+import numpy as np
+import argparse
+import time
+import os
+
+from catboost import CatBoostRegressor
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # Sem pyarrow: somente CSV/Excel
+    pa = pq = None
+
+from preprocessamento import carrega_preprocessamento
+from instrumentacao import medicao
+
+# Predição da Inadimplência com o modelo CatBoost e o pré-processamento já ajustados (sem retreinar), gravados juntos
+# pelo base_aplic_ml.py (seção 8.2):
+# Municípios lidos em blocos (Parquet/CSV), pré-processados, preditos em lote (todas as CPUs) e gravados bloco a bloco,
+# com memória limitada ao tamanho do bloco. A base de entrada segue o leiaute da base consolidada (carga.py).
+ARQ_MODELO = 'modelo_catboost.cbm'
+ARQ_PREPROCESSAMENTO = 'preprocessamento.joblib'
+TAMANHO_BLOCO = 100000
+COLUNAS_IDENTIFICACAO = ['Estado', 'Sigla', 'Municipio', 'Codigo_IBGE']
+
+
+def carrega_modelo(arquivo=ARQ_MODELO):
+    modelo = CatBoostRegressor()
+    modelo.load_model(arquivo)
+    return modelo
+
+
+def le_blocos(arquivo, tamanho=TAMANHO_BLOCO):
+    # Leitura em blocos de até <tamanho> linhas: Parquet (lotes do pyarrow), CSV (chunksize) ou Excel (planilha inteira)
+    extensao = os.path.splitext(arquivo)[1].lower()
+    if extensao == '.parquet':
+        if pq is None:
+            print('*** Atenção **** pyarrow não instalado: leitura de Parquet indisponível.')
+            exit()
+        for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=tamanho):
+            yield lote.to_pandas()
+    elif extensao in ('.xlsx', '.xls'):
+        base = pd.read_excel(arquivo, index_col=0)
+        for inicio in range(0, len(base), tamanho):
+            yield base.iloc[inicio:inicio + tamanho]
+    else:
+        yield from pd.read_csv(arquivo, chunksize=tamanho)
+
+
+def pontua(modelo, preprocessamento, blocos, threads=-1):
+    '''
+        Predição de cada bloco: colunas de identificação presentes (Estado, Sigla, Municipio, Codigo_IBGE),
+        inad_predicao e, se o Label estiver na base, o valor real e o resíduo (|real - predição|, como na análise de resíduos).
+        Gerador: um DataFrame por bloco lido.
+    '''
+    for bloco in blocos:
+        with medicao('pontuacao:bloco', linhas=len(bloco)):
+            X = preprocessamento.transform(bloco)
+            predicao = modelo.predict(X.to_numpy(dtype='float64'), thread_count=threads)
+            resultado = bloco[[coluna for coluna in COLUNAS_IDENTIFICACAO if coluna in bloco.columns]].copy()
+            resultado['inad_predicao'] = predicao
+            if preprocessamento.label in bloco.columns:
+                resultado[preprocessamento.label] = bloco[preprocessamento.label]
+                resultado['residuo'] = np.abs(bloco[preprocessamento.label].to_numpy() - predicao)
+        yield resultado
+
+
+def grava_blocos(blocos, arquivo):
+    '''
+        Gravação incremental dos blocos: Parquet (um row group por bloco) ou CSV (cabeçalho no primeiro bloco).
+        O arquivo final só substitui o existente ao término da gravação (temporário removido em caso de erro). Retorna a quantidade de linhas gravadas.
+    '''
+    temporario = arquivo + '.tmp'
+    parquet = os.path.splitext(arquivo)[1].lower() == '.parquet'
+    if parquet and pq is None:
+        print('*** Atenção **** pyarrow não instalado: gravação de Parquet indisponível.')
+        exit()
+    escritor = None
+    linhas = 0
+    try:
+        try:
+            for bloco in blocos:
+                if parquet:
+                    tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                    if escritor is None:
+                        escritor = pq.ParquetWriter(temporario, tabela.schema)
+                    escritor.write_table(tabela)
+                else:
+                    bloco.to_csv(temporario, mode='a' if linhas else 'w', header=not linhas, index=False)
+                linhas += len(bloco)
+        finally:
+            if escritor is not None:
+                escritor.close()
+    except BaseException:
+        # Gravação interrompida: o arquivo temporário incompleto é descartado
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    os.replace(temporario, arquivo)
+    return linhas
+
+
+def score(entrada, saida, arq_modelo=ARQ_MODELO, arq_preprocessamento=ARQ_PREPROCESSAMENTO, tamanho=TAMANHO_BLOCO, threads=-1):
+    # Predição da base de entrada para o arquivo de saída, com o modelo e o pré-processamento gravados
+    inicio = time.perf_counter()
+    modelo = carrega_modelo(arq_modelo)
+    preprocessamento = carrega_preprocessamento(arq_preprocessamento)
+    linhas = grava_blocos(pontua(modelo, preprocessamento, le_blocos(entrada, tamanho), threads), saida)
+    print('Municípios preditos:', linhas, 'em', round(time.perf_counter() - inicio, 2), 's ->', saida)
+    return linhas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Predição da Inadimplência com o modelo e o pré-processamento gravados.')
+    parser.add_argument('entrada', help='Base de Municípios (Parquet, CSV ou Excel) no leiaute da base consolidada')
+    parser.add_argument('saida', help='Arquivo das predições (Parquet ou CSV)')
+    parser.add_argument('--modelo', default=ARQ_MODELO, help='Modelo CatBoost (padrão: ' + ARQ_MODELO + ')')
+    parser.add_argument('--preprocessamento', default=ARQ_PREPROCESSAMENTO,
+                        help='Pré-processamento ajustado (padrão: ' + ARQ_PREPROCESSAMENTO + ')')
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO,
+                        help='Linhas lidas e preditas por bloco (padrão: ' + str(TAMANHO_BLOCO) + ')')
+    parser.add_argument('--threads', type=int, default=-1, help='Threads da predição do CatBoost (padrão: todas as CPUs)')
+    argumentos = parser.parse_args()
+
+    score(argumentos.entrada, argumentos.saida, argumentos.modelo, argumentos.preprocessamento,
+          argumentos.tamanho_bloco, argumentos.threads)
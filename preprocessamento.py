@@ -0,0 +1,183 @@
+# coding=utf-8
+
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+import pandas as pd
+import numpy as np
+import joblib
+
+from filtro_outliers import RegraLimite, filtra_outliers
+from selecao_variaveis import SelecaoVariaveis, LIMITE_COLINEARIDADE
+
+SINAIS = ('absoluto', 'simetrico')
+
+# Vocabulário fixo dos 27 Estados para o One-Hot-Encoding (colunas Est_AC ... Est_TO, sempre as mesmas)
+SIGLAS_ESTADOS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS', 'MT', 'PA',
+                  'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC', 'SE', 'SP', 'TO']
+
+# Colunas da base consolidada utilizadas pelos modelos e Label
+COLUNAS_BASE = ['Estado', 'Sigla', 'Municipio', 'arrec_2020', 'inad_2020', 'Valor_ab_agro', 'Valor_ab_indu',
+                'Valor_ab_serv', 'Valor_ab_publ', 'Valor_abt', 'Impostos', 'PIB', 'PIB_pc']
+LABEL = 'inad_2020'
+
+# Atributos eliminados após a análise de correlação (baixa correlação com o Label e alta colinearidade)
+COLUNAS_REMOVIDAS = ['Est_GO', 'Valor_ab_indu', 'Valor_ab_serv', 'Valor_abt', 'Impostos']
+
+
+class TransformacaoLog10(BaseEstimator, TransformerMixin):
+    '''
+        Transformação vetorizada para escala logarítmica base 10 das colunas selecionadas.
+        colunas        -> colunas transformadas; None seleciona no fit as colunas dos tipos informados (exceto excluir);
+        tipos          -> tipos das colunas selecionadas automaticamente (padrão: float64);
+        excluir        -> colunas nunca transformadas (ex.: o Label inad_2020);
+        sentinela_zero -> valor atribuído aos zeros (log10 indefinido), padrão -10;
+        sinal          -> 'absoluto': log10(|x|); 'simetrico': sinal(x) * log10(|x|), preservando o sinal dos negativos;
+        copiar         -> False transforma o próprio DataFrame (sem cópia).
+        As colunas definidas no fit são reaplicadas na predição, garantindo as mesmas variáveis no treino e no uso do modelo.
+    '''
+
+    def __init__(self, colunas=None, tipos=('float64',), excluir=(), sentinela_zero=-10.0, sinal='absoluto', copiar=True):
+        self.colunas = colunas
+        self.tipos = tipos
+        self.excluir = excluir
+        self.sentinela_zero = sentinela_zero
+        self.sinal = sinal
+        self.copiar = copiar
+
+    def fit(self, X, y=None):
+        if self.sinal not in SINAIS:
+            raise ValueError('sinal deve ser um de ' + ', '.join(SINAIS) + ': ' + str(self.sinal))
+        if self.colunas is not None:
+            colunas = list(self.colunas)
+        else:
+            colunas = list(X.select_dtypes(include=list(self.tipos)).columns)
+        self.colunas_ = [coluna for coluna in colunas if coluna not in set(self.excluir)]
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        return self
+
+    def transform(self, X):
+        ausentes = [coluna for coluna in self.colunas_ if coluna not in X.columns]
+        if ausentes:
+            raise KeyError('Colunas ausentes para a transformação log10: ' + ', '.join(map(str, ausentes)))
+        dados = X.copy() if self.copiar else X
+        if self.colunas_:
+            dados[self.colunas_] = log10_sentinela(X[self.colunas_].to_numpy(dtype='float64'), self.sentinela_zero, self.sinal)
+        return dados
+
+    def get_feature_names_out(self, input_features=None):
+        return self.feature_names_in_ if input_features is None else np.asarray(input_features, dtype=object)
+
+
+def log10_sentinela(valores, sentinela_zero=-10.0, sinal='absoluto'):
+    # log10 de |x| em uma única operação sobre a matriz; zeros recebem a sentinela e NaN permanece NaN
+    with np.errstate(divide='ignore'):
+        resultado = np.log10(np.abs(valores))
+    if sinal == 'simetrico':
+        resultado = np.where(valores < 0, -resultado, resultado)
+    resultado[valores == 0] = sentinela_zero
+    return resultado
+
+
+class CodificacaoEstados(BaseEstimator, TransformerMixin):
+    '''
+        One-Hot-Encoding da Sigla do Estado com vocabulário fixo (27 Estados): as colunas <prefixo>_<Sigla> são
+        as mesmas no treino e na predição, mesmo que a base não contenha todos os Estados.
+        As colunas de identificação (Sigla, Estado e Município) são removidas.
+    '''
+
+    def __init__(self, coluna='Sigla', prefixo='Est', categorias=SIGLAS_ESTADOS, remover=('Sigla', 'Estado', 'Municipio')):
+        self.coluna = coluna
+        self.prefixo = prefixo
+        self.categorias = categorias
+        self.remover = remover
+
+    def fit(self, X, y=None):
+        self.colunas_estados_ = [self.prefixo + '_' + categoria for categoria in self.categorias]
+        return self
+
+    def transform(self, X):
+        codigos = pd.Categorical(X[self.coluna].astype(object), categories=self.categorias).codes
+        desconhecidas = (codigos == -1) & X[self.coluna].notna().to_numpy()
+        if desconhecidas.any():
+            raise ValueError('Siglas fora do vocabulário de Estados: ' + ', '.join(map(str, pd.unique(X[self.coluna][desconhecidas]))))
+        indicadores = (codigos[:, None] == np.arange(len(self.categorias))).astype('uint8')
+        estados = pd.DataFrame(indicadores, index=X.index, columns=self.colunas_estados_)
+        return pd.concat([X.drop(columns=[coluna for coluna in self.remover if coluna in X.columns]), estados], axis=1)
+
+
+class RemocaoColunas(BaseEstimator, TransformerMixin):
+    # Remoção das colunas informadas (atributos eliminados na seleção de variáveis)
+
+    def __init__(self, colunas=()):
+        self.colunas = colunas
+
+    def fit(self, X, y=None):
+        self.colunas_ = list(self.colunas)
+        return self
+
+    def transform(self, X):
+        ausentes = [coluna for coluna in self.colunas_ if coluna not in X.columns]
+        if ausentes:
+            raise KeyError('Colunas ausentes para remoção: ' + ', '.join(map(str, ausentes)))
+        return X.drop(columns=self.colunas_)
+
+
+class PreProcessamento(BaseEstimator):
+    '''
+        Pré-processamento da base consolidada para os modelos de Machine Learning, ajustado uma única vez e
+        reaplicado na predição (objeto serializável: grava_preprocessamento / carrega_preprocessamento):
+            1) eliminação dos Municípios com Inadimplência >= limite_inad e dos atendidos pelas demais regras
+               (filtro_outliers), somente na base de treinamento;
+            2) One-Hot-Encoding da Sigla com os 27 Estados;
+            3) log10 das colunas float64 (exceto o Label), zeros -> sentinela_zero;
+            4) remoção dos atributos da seleção de variáveis (lista remover ou, com remover='automatico', seleção pela
+               correlação com o Label e colinearidade acima de limite_colinearidade: selecao_variaveis.SelecaoVariaveis).
+        As colunas são selecionadas pelo nome (colunas_entrada), independentemente da posição na planilha.
+    '''
+
+    def __init__(self, colunas_entrada=COLUNAS_BASE, label=LABEL, limite_inad=1, sentinela_zero=-10, remover=COLUNAS_REMOVIDAS,
+                 regras=(), limite_colinearidade=LIMITE_COLINEARIDADE):
+        self.colunas_entrada = colunas_entrada
+        self.label = label
+        self.limite_inad = limite_inad
+        self.sentinela_zero = sentinela_zero
+        self.remover = remover
+        self.regras = regras
+        self.limite_colinearidade = limite_colinearidade
+
+    def filtra(self, base, arquivo_quarentena=None):
+        # Base de treinamento sem os Municípios com Inadimplência impossível (>= limite_inad) e sem os das demais regras
+        regras = [RegraLimite(self.label, maximo=self.limite_inad)] + list(self.regras)
+        treinamento, _ = filtra_outliers(base, regras, arquivo_quarentena)
+        return treinamento
+
+    def fit(self, base, y=None):
+        treinamento = self.filtra(base[list(self.colunas_entrada)])
+        self.etapas_ = Pipeline([
+            ('estados', CodificacaoEstados()),
+            ('log10', TransformacaoLog10(excluir=[self.label], sentinela_zero=self.sentinela_zero)),
+            ('remocao', SelecaoVariaveis(self.label, self.limite_colinearidade) if self.remover == 'automatico'
+                        else RemocaoColunas(self.remover)),
+        ])
+        self.etapas_.fit(treinamento)
+        self.variaveis_ = [coluna for coluna in self.etapas_.transform(treinamento.head(1)).columns if coluna != self.label]
+        return self
+
+    def transform(self, base):
+        # Variáveis preditoras (X) na ordem do ajuste; o Label, se presente na base, não é incluído
+        entrada = base[[coluna for coluna in self.colunas_entrada if coluna != self.label or coluna in base.columns]]
+        return self.etapas_.transform(entrada)[self.variaveis_]
+
+    def fit_transform(self, base, y=None):
+        # Ajuste e aplicação à base de treinamento filtrada: retorna X e y (Label)
+        self.fit(base)
+        treinamento = self.filtra(base)
+        return self.transform(treinamento), treinamento[[self.label]]
+
+
+def grava_preprocessamento(preprocessamento, arquivo='preprocessamento.joblib'):
+    joblib.dump(preprocessamento, arquivo)
+
+
+def carrega_preprocessamento(arquivo='preprocessamento.joblib'):
+    return joblib.load(arquivo)
@@ -0,0 +1,104 @@
+# coding=utf-8
+
+import pandas as pd
+import time
+import os
+
+from cache_excel import le_excel
+
+VERSAO_ESTADOS = '2023.1'                       # Versão da tabela estados_br.csv distribuída com o projeto
+ARQ_ESTADOS = 'estados_br.csv'                  # Tabela dos 27 Estados: Estado, Sigla e Código da UF (IBGE)
+DIR_CACHE = 'cache'
+VALIDADE_CACHE = 30 * 24 * 60 * 60              # Validade (segundos) dos Estados atualizados a partir de fonte externa
+
+
+def estados_tabela():
+    '''
+        Estados a partir da tabela versionada distribuída com o projeto (sem acesso à Internet).
+    '''
+    return pd.read_csv(ARQ_ESTADOS, dtype={'Estado': str, 'Sigla': str, 'Codigo_UF': 'int64'})
+
+
+def estados_dtb():
+    '''
+        Estados a partir do arquivo de Municípios do IBGE (RELATORIO_DTB_BRASIL_MUNICIPIO.xls).
+        O arquivo não traz a Sigla, que é obtida pelo Código da UF da tabela versionada.
+    '''
+    dtb = le_excel('RELATORIO_DTB_BRASIL_MUNICIPIO.xls', usecols=[0,1], header=6)
+    dtb.rename({'UF':'Codigo_UF', 'Nome_UF':'Estado'}, axis=1, inplace=True)
+    dtb = dtb.drop_duplicates().reset_index(drop=True)
+    dtb["Estado"] = dtb["Estado"].str.upper()
+
+    siglas = estados_tabela().set_index('Codigo_UF')['Sigla']
+    dtb['Sigla'] = dtb['Codigo_UF'].map(siglas)
+    return dtb[['Estado', 'Sigla', 'Codigo_UF']]
+
+
+def estados_iso():
+    '''
+        Estados a partir do sítio da ISO (renderização da página com requests_html / Chromium).
+        Tratamento da Sigla BR-XX.
+    '''
+    from requests_html import HTMLSession
+
+    sitio = 'https://www.iso.org/obp/ui/#iso:code:3166:BR'
+    session = HTMLSession()
+
+    pagina = session.get(sitio)
+    pagina.html.render(sleep=2, timeout=45)
+
+    # Testa se a carga da página web ocorreu com sucesso, caso contrário avisa o usuário e retorna sem dados.
+    if pagina.status_code != 200:
+        print(f'Erro ao carregar a página da ISO, código {pagina.status_code}')
+        return pd.DataFrame()
+
+    # Carrega a tabela html, pandas executa a leitura e os campos de Sigla e nome do Estado são renomeados.
+    tabela = pagina.html.find('.tablesorter', first=True).html
+    estados_cheia = pd.read_html(tabela)
+    estados_cheia[0].rename({'3166-2 code':'Sigla', 'Subdivision name':'Estado'}, axis=1, inplace=True)
+
+    # Copia o nome de Estado e a Sigla, retira a entrada BR- da Sigla e inclui o Código da UF
+    estados = estados_cheia[0][['Estado', 'Sigla']].copy()
+    estados["Sigla"] = estados["Sigla"].str.slice(3,5)
+    estados["Estado"] = estados["Estado"].str.upper()
+    codigos = estados_tabela().set_index('Sigla')['Codigo_UF']
+    estados['Codigo_UF'] = estados['Sigla'].map(codigos)
+    return estados
+
+
+FONTES_ESTADOS = {'tabela': estados_tabela, 'dtb': estados_dtb, 'iso': estados_iso}
+
+
+def registro_estados(fonte='tabela', atualizar=False, validade=VALIDADE_CACHE):
+    '''
+        Registro dos Estados a partir da fonte escolhida (tabela, dtb ou iso).
+        A tabela versionada é lida diretamente; as demais fontes são mantidas em cache em disco
+        durante o prazo de validade e só são consultadas novamente quando expiradas ou se atualizar=True.
+        Falha na fonte externa -> cache (mesmo expirado) -> tabela versionada.
+    '''
+    if fonte not in FONTES_ESTADOS:
+        raise ValueError('Fonte de Estados desconhecida: ' + str(fonte) + ' - opções: ' + ', '.join(FONTES_ESTADOS))
+    if fonte == 'tabela':
+        return estados_tabela()
+
+    arq_cache = os.path.join(DIR_CACHE, 'estados_' + fonte + '.csv')
+    cache_existe = os.path.exists(arq_cache)
+    if cache_existe and not atualizar and (time.time() - os.path.getmtime(arq_cache)) < validade:
+        return pd.read_csv(arq_cache, dtype={'Estado': str, 'Sigla': str, 'Codigo_UF': 'Int64'})
+
+    try:
+        estados = FONTES_ESTADOS[fonte]()
+    except Exception as erro:
+        print('*** Atenção **** Falha na atualização dos Estados pela fonte', fonte, '-', erro)
+        estados = pd.DataFrame()
+
+    if estados.empty:
+        if cache_existe:
+            print('*** Atenção **** Utilizando Estados do cache expirado:', arq_cache)
+            return pd.read_csv(arq_cache, dtype={'Estado': str, 'Sigla': str, 'Codigo_UF': 'Int64'})
+        print('*** Atenção **** Utilizando a tabela versionada de Estados', VERSAO_ESTADOS)
+        return estados_tabela()
+
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    estados.to_csv(arq_cache, index=False)
+    return estados
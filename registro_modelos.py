@@ -0,0 +1,144 @@
+# coding=utf-8
+
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import tempfile
+import hashlib
+import joblib
+import json
+import time
+import sys
+import os
+
+from sklearn.metrics import mean_absolute_error, mean_absolute_percentage_error
+from sklearn.metrics import r2_score, mean_squared_error
+
+# Registro local de modelos treinados, endereçado pelo conteúdo: a chave é o hash dos dados de treinamento,
+# da lista de variáveis, da classe, da versão da biblioteca, dos hiperparâmetros do modelo e dos dados do fit (ex.: Pool
+# quantizado do CatBoost e as suas fronteiras). Configurações inalteradas são carregadas do registro em vez de retreinadas.
+# Cada modelo: <diretorio>/<chave>/modelo.joblib e registro.json (métricas e tempo de ajuste).
+DIR_REGISTRO = os.path.join('cache', 'modelos')
+chaves_execucao = []        # Chaves dos modelos ajustados ou carregados na execução atual (tabela_registro)
+
+
+def chave_modelo(modelo, X, y, dados_fit=None):
+    resumo = hashlib.sha256()
+    resumo.update(pd.util.hash_pandas_object(pd.DataFrame(X), index=False).to_numpy().tobytes())
+    resumo.update(pd.util.hash_pandas_object(pd.DataFrame(y), index=False).to_numpy().tobytes())
+    descricao = {'colunas': [str(coluna) for coluna in getattr(X, 'columns', [])],
+                 'classe': type(modelo).__module__ + '.' + type(modelo).__name__,
+                 'versao': versao_biblioteca(modelo),
+                 'parametros': modelo.get_params(),
+                 'dados_fit': descricao_dados_fit(dados_fit)}
+    resumo.update(json.dumps(descricao, sort_keys=True, default=str).encode())
+    return resumo.hexdigest()[:20]
+
+
+def versao_biblioteca(modelo):
+    # Versão da biblioteca do modelo (sklearn, xgboost, catboost...): modelos de outra versão são retreinados
+    return getattr(sys.modules.get(type(modelo).__module__.split('.')[0]), '__version__', None)
+
+
+def descricao_dados_fit(dados_fit):
+    '''
+        Descrição dos argumentos do fit para a chave do modelo. Pool do CatBoost: quantização, dimensões, hash do Label
+        e das fronteiras (Pool quantizado) ou das variáveis; demais argumentos: hash dos dados.
+    '''
+    if dados_fit is None:
+        return None
+    descricao = []
+    for dados in dados_fit:
+        if hasattr(dados, 'is_quantized'):
+            item = {'tipo': 'Pool', 'quantizado': dados.is_quantized(), 'linhas': dados.num_row(), 'colunas': dados.num_col(),
+                    'label': hash_objeto(np.asarray(dados.get_label()).astype(str))}
+            if dados.is_quantized():
+                with tempfile.TemporaryDirectory() as diretorio:
+                    fronteiras = os.path.join(diretorio, 'fronteiras.tsv')
+                    dados.save_quantization_borders(fronteiras)
+                    with open(fronteiras, 'rb') as arquivo:
+                        item['fronteiras'] = hashlib.sha256(arquivo.read()).hexdigest()
+            else:
+                item['variaveis'] = hash_objeto(dados.get_features())
+            descricao.append(item)
+        else:
+            descricao.append({'tipo': type(dados).__name__, 'dados': hash_objeto(dados)})
+    return descricao
+
+
+def hash_objeto(dados):
+    # Hash dos dados tabulares (matriz, série ou DataFrame); outros objetos pela representação textual
+    try:
+        valores = pd.util.hash_pandas_object(pd.DataFrame(dados), index=False).to_numpy()
+    except (ValueError, TypeError):
+        return hashlib.sha256(repr(dados).encode()).hexdigest()
+    return hashlib.sha256(valores.tobytes()).hexdigest()
+
+
+def metricas(real, predicao):
+    # MAE, MAPE, R² e RMSE
+    real, predicao = np.asarray(real).ravel(), np.asarray(predicao).ravel()
+    return {'MAE': float(mean_absolute_error(real, predicao)),
+            'MAPE': float(mean_absolute_percentage_error(real, predicao)),
+            'R2': float(r2_score(real, predicao)),
+            'RMSE': float(np.sqrt(mean_squared_error(real, predicao)))}
+
+
+def ajusta_registrado(modelo, X, y, nome=None, dados_fit=None, X_avaliacao=None, y_avaliacao=None, diretorio=DIR_REGISTRO):
+    '''
+        Modelo ajustado a X e y, carregado do registro quando já treinado com os mesmos dados, variáveis, hiperparâmetros,
+        versão da biblioteca e dados do fit.
+        dados_fit   -> argumentos do fit, se diferentes de (X, y) (ex.: (Pool,) do CatBoost com os mesmos dados);
+        X_avaliacao -> base das métricas (padrão: a própria base de treinamento).
+        Retorna o modelo e o registro (nome, chave, métricas, tempo de ajuste, data e origem: ajustado ou registro).
+    '''
+    chave = chave_modelo(modelo, X, y, dados_fit)
+    chaves_execucao.append(chave)
+    pasta = os.path.join(diretorio, chave)
+    arq_registro = os.path.join(pasta, 'registro.json')
+    if os.path.exists(arq_registro):
+        with open(arq_registro, encoding='utf-8') as arquivo:
+            registro = json.load(arquivo)
+        print('Modelo', nome or registro['nome'], 'carregado do registro:', chave)
+        return joblib.load(os.path.join(pasta, 'modelo.joblib')), dict(registro, origem='registro')
+
+    inicio = time.perf_counter()
+    modelo.fit(*(dados_fit or (X, y)))
+    tempo_ajuste = time.perf_counter() - inicio
+
+    if X_avaliacao is None:
+        X_avaliacao, y_avaliacao = X, y
+    registro = {'nome': nome or type(modelo).__name__, 'chave': chave, 'classe': type(modelo).__name__,
+                'versao': versao_biblioteca(modelo),
+                'parametros': {parametro: str(valor) for parametro, valor in modelo.get_params().items()},
+                'colunas': [str(coluna) for coluna in getattr(X, 'columns', [])], 'linhas': int(len(X)),
+                'metricas': metricas(y_avaliacao, modelo.predict(X_avaliacao)),
+                'tempo_ajuste': round(tempo_ajuste, 6), 'data': datetime.now().isoformat(timespec='seconds')}
+
+    # Modelo gravado antes do registro.json: registro presente indica modelo completo
+    os.makedirs(pasta, exist_ok=True)
+    joblib.dump(modelo, os.path.join(pasta, 'modelo.joblib'))
+    with open(arq_registro + '.tmp', 'w', encoding='utf-8') as arquivo:
+        json.dump(registro, arquivo, ensure_ascii=False, indent=1)
+    os.replace(arq_registro + '.tmp', arq_registro)
+    return modelo, dict(registro, origem='ajustado')
+
+
+def tabela_registro(diretorio=DIR_REGISTRO, chaves=None):
+    '''
+        Modelos registrados: nome, classe, métricas e tempo de ajuste (um por linha, do mais recente ao mais antigo).
+        chaves -> somente os modelos com as chaves informadas (ex.: chaves_execucao, modelos da execução atual).
+    '''
+    linhas = []
+    if os.path.isdir(diretorio):
+        for chave in os.listdir(diretorio) if chaves is None else dict.fromkeys(chaves):
+            arq_registro = os.path.join(diretorio, chave, 'registro.json')
+            if os.path.exists(arq_registro):
+                with open(arq_registro, encoding='utf-8') as arquivo:
+                    registro = json.load(arquivo)
+                linhas.append(dict({chave_registro: registro[chave_registro]
+                                    for chave_registro in ('nome', 'chave', 'classe', 'linhas', 'tempo_ajuste', 'data')},
+                                   **registro['metricas']))
+    if not linhas:
+        return pd.DataFrame()
+    return pd.DataFrame(linhas).sort_values(by='data', ascending=False, ignore_index=True)
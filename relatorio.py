@@ -0,0 +1,171 @@
+# coding=utf-8
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+import numpy as np
+import hashlib
+import html
+import json
+import os
+
+from instrumentacao import medicao
+
+# Relatório estático (HTML + PNG) dos gráficos da análise exploratória, sem backend interativo:
+# figuras renderizadas com o backend Agg (API de objetos do Matplotlib, sem pyplot) em processos paralelos,
+# matriz de dispersão amostrada ou em hexbin para bases grandes e cache das figuras pelo hash dos dados e da definição:
+# reexecuções com os mesmos dados reaproveitam os PNG já gerados.
+DIR_RELATORIO = 'relatorio'
+VERSAO_FIGURAS = 1          # Alterar quando o desenho das figuras mudar (invalida o cache)
+LIMITE_AMOSTRA = 5000       # Acima: dispersão com amostra de LIMITE_AMOSTRA linhas
+LIMITE_HEXBIN = 50000       # Acima: hexbin em vez de dispersão
+DPI = 80
+
+
+def figura(tipo, titulo, dados, colunas, secao, **opcoes):
+    '''
+        Definição de uma figura do relatório:
+        tipo    -> 'histograma', 'boxplot', 'dispersao' (matriz de dispersão, triângulo inferior) ou 'mapa_calor';
+        dados   -> DataFrame com as colunas (somente as colunas da figura são enviadas aos processos);
+        secao   -> título da seção do HTML em que a figura é apresentada.
+    '''
+    return {'tipo': tipo, 'titulo': titulo, 'secao': secao, 'colunas': list(colunas),
+            'dados': dados[list(colunas)], 'opcoes': opcoes}
+
+
+def chave_figura(definicao):
+    resumo = hashlib.sha256()
+    resumo.update(json.dumps([VERSAO_FIGURAS, definicao['tipo'], definicao['titulo'], definicao['colunas'],
+                              definicao['opcoes']], sort_keys=True, default=str).encode())
+    resumo.update(pd.util.hash_pandas_object(definicao['dados'], index=True).to_numpy().tobytes())
+    return definicao['tipo'] + '_' + resumo.hexdigest()[:16]
+
+
+def renderiza(definicao, arquivo):
+    # Renderização de uma figura em PNG com o backend Agg (executada em processo separado)
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    tipo, dados, colunas, opcoes = definicao['tipo'], definicao['dados'], definicao['colunas'], definicao['opcoes']
+    with medicao('relatorio:' + tipo, linhas=len(dados)):
+        if tipo == 'dispersao':
+            quantidade = len(colunas)
+            fig = Figure(figsize=(1.8 * quantidade, 1.8 * quantidade))
+            eixos = fig.subplots(quantidade, quantidade, squeeze=False)
+            valores = dados.to_numpy(dtype='float64')
+            if len(valores) > LIMITE_AMOSTRA and len(valores) <= LIMITE_HEXBIN:
+                valores = valores[np.random.default_rng(0).choice(len(valores), LIMITE_AMOSTRA, replace=False)]
+            for linha in range(quantidade):
+                for coluna in range(quantidade):
+                    eixo = eixos[linha, coluna]
+                    if coluna > linha:
+                        eixo.set_visible(False)
+                        continue
+                    if coluna == linha:
+                        eixo.hist(valores[:, coluna][~np.isnan(valores[:, coluna])], bins=20)
+                    elif len(dados) > LIMITE_HEXBIN:
+                        eixo.hexbin(valores[:, coluna], valores[:, linha], gridsize=30, mincnt=1, cmap='Blues')
+                    else:
+                        eixo.scatter(valores[:, coluna], valores[:, linha], s=3, alpha=0.4)
+                    eixo.tick_params(labelsize=6)
+                    if linha == quantidade - 1:
+                        eixo.set_xlabel(colunas[coluna], fontsize=7)
+                    if coluna == 0:
+                        eixo.set_ylabel(colunas[linha], fontsize=7)
+        elif tipo == 'mapa_calor':
+            quantidade = len(colunas)
+            fig = Figure(figsize=(max(6, 0.6 * quantidade + 2), max(5, 0.6 * quantidade + 1)))
+            eixo = fig.subplots()
+            matriz = dados.to_numpy(dtype='float64').copy()
+            matriz[np.triu_indices(quantidade, k=1)] = np.nan
+            imagem = eixo.imshow(matriz, cmap='RdYlGn', vmin=-1, vmax=1)
+            fig.colorbar(imagem, ax=eixo)
+            eixo.set_xticks(range(quantidade), colunas, rotation=90, fontsize=7)
+            eixo.set_yticks(range(quantidade), colunas, fontsize=7)
+            if opcoes.get('anotar', True):
+                for linha, coluna in zip(*np.tril_indices(quantidade)):
+                    eixo.text(coluna, linha, '%.2f' % matriz[linha, coluna], ha='center', va='center', fontsize=6)
+        else:
+            fig = Figure(figsize=(6, 4))
+            eixo = fig.subplots()
+            serie = dados[colunas[0]].dropna().to_numpy()
+            if tipo == 'boxplot':
+                eixo.boxplot(serie)
+                eixo.set_xticks([1], [colunas[0]])
+            else:
+                eixo.hist(serie, bins=opcoes.get('bins', 5))
+                eixo.set_xlabel(colunas[0])
+        fig.suptitle(definicao['titulo'], fontsize=10)
+        FigureCanvasAgg(fig)
+        temporario = arquivo + '.tmp.png'
+        fig.savefig(temporario, dpi=DPI, bbox_inches='tight')
+        os.replace(temporario, arquivo)
+    return arquivo
+
+
+def gera_relatorio(figuras, diretorio=DIR_RELATORIO, titulo='Relatório', tabelas=None, workers=None):
+    '''
+        Gera <diretorio>/index.html com as figuras (PNG em <diretorio>/figuras) agrupadas por seção e as tabelas
+        ({título: DataFrame}) em HTML. Figuras já renderizadas com os mesmos dados e definição são reaproveitadas.
+        Retorna o caminho do index.html.
+    '''
+    pasta_figuras = os.path.join(diretorio, 'figuras')
+    os.makedirs(pasta_figuras, exist_ok=True)
+    nomes = [chave_figura(definicao) + '.png' for definicao in figuras]
+    pendentes = [(definicao, os.path.join(pasta_figuras, nome)) for definicao, nome in zip(figuras, nomes)
+                 if not os.path.exists(os.path.join(pasta_figuras, nome))]
+    print('Relatório:', len(figuras), 'figuras,', len(figuras) - len(pendentes), 'do cache,', len(pendentes), 'a renderizar')
+    if pendentes:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(renderiza, *zip(*pendentes)))
+
+    partes = ['<!DOCTYPE html>', '<html lang="pt-br"><head><meta charset="utf-8"><title>' + html.escape(titulo) + '</title>',
+              '<style>body{font-family:sans-serif;margin:2em} img{max-width:100%;margin:0.5em;border:1px solid #ddd}'
+              ' table{border-collapse:collapse;font-size:small} td,th{border:1px solid #ddd;padding:2px 6px}</style>',
+              '</head><body>', '<h1>' + html.escape(titulo) + '</h1>',
+              '<p>Gerado em ' + datetime.now().isoformat(timespec='seconds') + '</p>']
+    for titulo_tabela, tabela in (tabelas or {}).items():
+        partes += ['<h2>' + html.escape(titulo_tabela) + '</h2>', tabela.to_html(float_format=lambda valor: '%.3f' % valor)]
+    secao_atual = None
+    for definicao, nome in zip(figuras, nomes):
+        if definicao['secao'] != secao_atual:
+            secao_atual = definicao['secao']
+            partes.append('<h2>' + html.escape(secao_atual) + '</h2>')
+        partes.append('<img src="figuras/' + nome + '" alt="' + html.escape(definicao['titulo']) + '" loading="lazy">')
+    partes.append('</body></html>')
+
+    indice = os.path.join(diretorio, 'index.html')
+    with open(indice, 'w', encoding='utf-8') as arquivo:
+        arquivo.write('\n'.join(partes))
+    remove_figuras_antigas(pasta_figuras, set(nomes))
+    return indice
+
+
+def remove_figuras_antigas(pasta_figuras, utilizadas):
+    # Figuras de execuções anteriores não referenciadas pelo relatório atual
+    for nome in os.listdir(pasta_figuras):
+        if nome.endswith('.png') and nome not in utilizadas:
+            os.remove(os.path.join(pasta_figuras, nome))
+
+
+def figuras_eda(base, base_processamento, base_log10, correlacao):
+    '''
+        Figuras da análise exploratória do base_proc_tratam.py: histogramas das colunas float64 (valores originais e log10),
+        boxplots (originais e log10), matrizes de dispersão e mapa de calor da correlação das colunas float64.
+    '''
+    def flutuantes(dados):
+        return list(dados.dtypes[dados.dtypes == 'float64'].index)
+
+    figuras = [figura('histograma', coluna, base_processamento, [coluna], 'Histogramas - valores originais')
+               for coluna in flutuantes(base_processamento)]
+    figuras += [figura('histograma', coluna + ' (log10)', base_log10, [coluna], 'Histogramas - escala log10')
+                for coluna in flutuantes(base_log10)]
+    figuras += [figura('boxplot', coluna, base, [coluna], 'Boxplots - valores originais') for coluna in flutuantes(base)]
+    figuras += [figura('boxplot', coluna + ' (log10)', base_log10, [coluna], 'Boxplots - escala log10')
+                for coluna in flutuantes(base_log10)]
+    figuras.append(figura('dispersao', 'Matriz de dispersão - escala log10', base_log10, flutuantes(base_log10), 'Correlação'))
+    figuras.append(figura('dispersao', 'Matriz de dispersão - valores originais', base_processamento,
+                          flutuantes(base_processamento), 'Correlação'))
+    colunas_correlacao = [coluna for coluna in flutuantes(base_log10) if coluna in correlacao.columns]
+    figuras.append(figura('mapa_calor', 'Correlação de Pearson', correlacao.loc[colunas_correlacao], colunas_correlacao, 'Correlação'))
+    return figuras
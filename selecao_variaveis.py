@@ -0,0 +1,123 @@
+# coding=utf-8
+
+from sklearn.base import BaseEstimator, TransformerMixin
+import pandas as pd
+import numpy as np
+import hashlib
+import os
+
+# Seleção automática de variáveis pela correlação de Pearson: matriz calculada uma única vez por base (cache pelo hash
+# dos dados), pares colineares obtidos do triângulo superior e seleção gulosa pela correlação com o Label.
+DIR_CORRELACAO = os.path.join('cache', 'correlacao')
+LIMITE_COLINEARIDADE = 0.93
+
+
+def matriz_correlacao(dados, diretorio=DIR_CORRELACAO):
+    '''
+        Matriz de correlação de Pearson das colunas numéricas: produto matricial das colunas padronizadas
+        (uma operação para todas as variáveis). Gravada em <diretorio>/<hash dos dados>.npz e reaproveitada.
+        Com valores nulos, correlação par a par do pandas (sem cache vetorizado).
+    '''
+    numericos = dados.select_dtypes(include='number')
+    chave = hash_dados(numericos)
+    arquivo = os.path.join(diretorio, chave + '.npz') if diretorio else None
+    if arquivo and os.path.exists(arquivo):
+        gravado = np.load(arquivo, allow_pickle=False)
+        return pd.DataFrame(gravado['matriz'], index=gravado['colunas'], columns=gravado['colunas'])
+
+    valores = numericos.to_numpy(dtype='float64')
+    if np.isnan(valores).any():
+        correlacao = numericos.corr()
+    else:
+        centrados = valores - valores.mean(axis=0)
+        normas = np.sqrt((centrados ** 2).sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            padronizados = centrados / normas
+        matriz = np.clip(padronizados.T @ padronizados, -1, 1)
+        correlacao = pd.DataFrame(matriz, index=numericos.columns, columns=numericos.columns)
+
+    if arquivo:
+        os.makedirs(diretorio, exist_ok=True)
+        np.savez(arquivo, matriz=correlacao.to_numpy(), colunas=np.asarray(correlacao.columns, dtype=str))
+    return correlacao
+
+
+def pares_colineares(correlacao, limite=LIMITE_COLINEARIDADE, excluir=()):
+    # Pares de variáveis com |correlação| > limite, somente do triângulo superior (sem diagonal e sem pares repetidos)
+    colunas = [coluna for coluna in correlacao.columns if coluna not in set(excluir)]
+    matriz = correlacao.loc[colunas, colunas].to_numpy()
+    linhas, colunas_pos = np.triu_indices(len(colunas), k=1)
+    valores = matriz[linhas, colunas_pos]
+    acima = np.abs(valores) > limite
+    pares = pd.DataFrame({'variavel_1': np.asarray(colunas, dtype=object)[linhas[acima]],
+                          'variavel_2': np.asarray(colunas, dtype=object)[colunas_pos[acima]],
+                          'correlacao': valores[acima]})
+    return pares.sort_values(by='correlacao', key=np.abs, ascending=False, ignore_index=True)
+
+
+def seleciona_variaveis(correlacao, label, limite=LIMITE_COLINEARIDADE, grupos=(), minimo_label=None):
+    '''
+        Seleção gulosa: variáveis em ordem decrescente de |correlação com o Label|; cada uma é mantida se a sua
+        |correlação| com todas as já mantidas for <= limite (entre variáveis colineares, fica a mais correlacionada ao Label).
+        grupos       -> conjuntos de indicadoras do One-Hot-Encoding: a de menor correlação com o Label é removida
+                        (categoria de referência, evita a colinearidade perfeita das indicadoras);
+        minimo_label -> remove as variáveis com |correlação com o Label| abaixo do mínimo.
+        Retorna as variáveis mantidas e o dicionário das removidas com o motivo.
+    '''
+    com_label = correlacao[label].drop(label).abs()
+    removidas = {}
+    for grupo in grupos:
+        presentes = [coluna for coluna in grupo if coluna in com_label.index]
+        if presentes:
+            removidas[com_label[presentes].idxmin()] = 'referencia do grupo (menor correlação com o Label)'
+    if minimo_label is not None:
+        for coluna in com_label.index[com_label < minimo_label]:
+            removidas.setdefault(coluna, 'baixa correlação com o Label')
+
+    candidatas = com_label.drop(list(removidas)).sort_values(ascending=False, kind='stable').index
+    matriz = correlacao.loc[candidatas, candidatas].abs().to_numpy()
+    mantidas = np.zeros(len(candidatas), dtype=bool)
+    for posicao, coluna in enumerate(candidatas):
+        colineares = matriz[posicao, mantidas] > limite
+        if colineares.any():
+            removidas[coluna] = 'colinear com ' + candidatas[mantidas][np.argmax(matriz[posicao, mantidas])]
+        else:
+            mantidas[posicao] = True
+    return list(candidatas[mantidas]), removidas
+
+
+def grupos_indicadoras(colunas, prefixos):
+    # Grupos de indicadoras pelo prefixo do One-Hot-Encoding (ex.: Est_ -> Est_AC ... Est_TO)
+    return [[coluna for coluna in colunas if str(coluna).startswith(prefixo + '_')] for prefixo in prefixos]
+
+
+class SelecaoVariaveis(BaseEstimator, TransformerMixin):
+    '''
+        Etapa de seleção automática de variáveis (seleciona_variaveis) ajustada na base de treinamento, com o Label.
+        As variáveis removidas no ajuste (colunas_, com os motivos em motivos_) são removidas também na predição.
+    '''
+
+    def __init__(self, label, limite=LIMITE_COLINEARIDADE, prefixos_grupos=('Est',), minimo_label=None, diretorio=DIR_CORRELACAO):
+        self.label = label
+        self.limite = limite
+        self.prefixos_grupos = prefixos_grupos
+        self.minimo_label = minimo_label
+        self.diretorio = diretorio
+
+    def fit(self, X, y=None):
+        dados = X if y is None else X.assign(**{self.label: np.asarray(y).ravel()})
+        self.correlacao_ = matriz_correlacao(dados, self.diretorio)
+        grupos = grupos_indicadoras(self.correlacao_.columns, self.prefixos_grupos)
+        self.variaveis_, self.motivos_ = seleciona_variaveis(self.correlacao_, self.label, self.limite, grupos, self.minimo_label)
+        self.colunas_ = list(self.motivos_)
+        return self
+
+    def transform(self, X):
+        return X.drop(columns=[coluna for coluna in self.colunas_ if coluna in X.columns])
+
+
+def hash_dados(dados):
+    resumo = hashlib.sha256()
+    resumo.update(pd.util.hash_pandas_object(dados, index=False).to_numpy().tobytes())
+    resumo.update('|'.join(map(str, dados.columns)).encode())
+    return resumo.hexdigest()[:20]